@@ -0,0 +1,99 @@
+import io
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+
+from api import scheduler as limits
+from api.scheduler import Scheduler
+
+WORKERS = int(os.getenv("SPOTICLI_WORKERS", 16))  # accounts run at once
+# the rate limit belongs to the app, so every account draws from one budget
+RATE = float(os.getenv("SPOTICLI_FANOUT_RATE", limits.RATE))
+BURST = int(os.getenv("SPOTICLI_FANOUT_BURST", limits.BURST))
+
+Result = namedtuple("Result", "account ok value error output elapsed")
+
+# where the account being run prints to; context variables are copied into
+# the api.aio and paging threads, so their prints reach the same buffer
+_OUTPUT = ContextVar("fanout_output", default=None)
+
+
+class _AccountOutput(io.TextIOBase):
+    """stdout that collects each account's prints separately"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        buffer = _OUTPUT.get()
+        return (buffer or self.stream).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def fan_out(accounts, func, workers=WORKERS, rate=RATE, burst=BURST) -> list:
+    """runs func(account) for every account on a thread pool
+
+    All accounts share one Scheduler, so the whole run stays within a single
+    request budget however wide the pool is, while each keeps its own token
+    and connection pool. A failing account doesn't stop the others.
+
+    Args:
+        accounts (list): Account objects
+        func (callable): work for one account, given the Account
+        workers (int, optional): accounts in flight at once. Defaults to 16.
+        rate (float, optional): requests per second across all accounts.
+        burst (int, optional): bucket size of the shared budget.
+
+    Returns:
+        list[Result]: one per account, in the order given, with what it
+            printed
+    """
+    scheduler = Scheduler(rate=rate, burst=burst)
+    for account in accounts:
+        account.scheduler = scheduler
+    output = _AccountOutput(sys.stdout)
+
+    def run(account):
+        buffer = io.StringIO()
+        token = _OUTPUT.set(buffer)
+        start = time.perf_counter()
+        try:
+            value, ok, error = func(account), True, None
+        except Exception as e:
+            value, ok, error = None, False, f"{type(e).__name__}: {e}"
+        finally:
+            _OUTPUT.reset(token)
+        return Result(
+            account.name,
+            ok,
+            value,
+            error,
+            buffer.getvalue(),
+            time.perf_counter() - start,
+        )
+
+    stdout, sys.stdout = sys.stdout, output
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            return list(executor.map(run, accounts))
+    finally:
+        sys.stdout = stdout
+        for account in accounts:
+            account.close()
+
+
+def summary(results) -> str:
+    """one line per account and a total, for printing after a fan-out"""
+    lines = [
+        f"{r.account:>20}  {'ok' if r.ok else 'FAILED':6} {r.elapsed:7.2f}s  "
+        + (repr(r.value) if r.ok else r.error)
+        for r in results
+    ]
+    failed = sum(1 for r in results if not r.ok)
+    lines.append(f"{len(results)} accounts, {failed} failed")
+    return "\n".join(lines)
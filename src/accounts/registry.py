@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+
+ACCOUNTS_PATH = os.getenv("SPOTICLI_ACCOUNTS", "accounts.json")
+# connections per account, enough for runner.PAGE_WORKERS concurrent page
+# fetches and a player call
+ACCOUNT_POOL_SIZE = 10
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def shared_backend():
+    """one response cache backend for every account, entries namespaced by login"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            from api.cache import backend_from_env
+
+            _backend = backend_from_env() or False
+    return _backend or None
+
+
+class Account:
+    """One Spotify login with its own token, connection pool and database
+
+    Args:
+        name (str): unique account name
+        token_cache (str, optional): token file, written by logging in once
+            interactively. Defaults to .cache-<name>.
+        db_path (str, optional): history database. Defaults to <name>.db.
+        playlist (str, optional): playlist `add` saves tracks to.
+    """
+
+    def __init__(self, name, token_cache=None, db_path=None, playlist=None):
+        self.name = name
+        self.token_cache = token_cache or f".cache-{name}"
+        self.db_path = db_path or f"{name}.db"
+        self.playlist_id = playlist
+        self.scheduler = None
+        self._transport = None
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"Account({self.name!r})"
+
+    def transport(self):
+        """this account's transport, built on first use"""
+        with self._lock:
+            if self._transport is None:
+                from api.auth import TokenProvider
+                from api.cache import ResponseCache
+                from api.memo import RequestMemo
+                from api.transport import Transport
+
+                backend = shared_backend()
+                tokens = TokenProvider(cache_path=self.token_cache, interactive=False)
+                self._transport = Transport(
+                    tokens=tokens,
+                    pool_size=ACCOUNT_POOL_SIZE,
+                    # keyed by the login the token belongs to, not the name,
+                    # so renaming accounts never serves another user's data
+                    cache=(
+                        ResponseCache(backend, namespace=tokens.owner)
+                        if backend
+                        else None
+                    ),
+                    scheduler=self.scheduler,
+                    # memo keys don't carry the token, so accounts can't share one
+                    memo=RequestMemo(),
+                )
+            return self._transport
+
+    def _client(self, cls, **kwargs):
+        if cls not in self._clients:
+            self._clients[cls] = cls(transport=self.transport(), **kwargs)
+        return self._clients[cls]
+
+    def playlist(self):
+        from playlists.playlists import Playlist
+
+        return self._client(Playlist)
+
+    def session(self):
+        from next_track.next_track import CLISpotify
+
+        return self._client(CLISpotify, db_path=self.db_path)
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+
+
+def load_accounts(path=None) -> dict:
+    """reads the account registry
+
+    The file is a JSON list of objects with a `name` and optionally
+    `token_cache`, `db_path` and `playlist`.
+
+    Args:
+        path (str, optional): registry file. Defaults to $SPOTICLI_ACCOUNTS
+            or accounts.json.
+
+    Returns:
+        dict: Account by name, in file order
+    """
+    with open(path or ACCOUNTS_PATH) as f:
+        entries = json.load(f)
+    accounts = {}
+    for entry in entries:
+        if entry["name"] in accounts:
+            raise ValueError(f"account {entry['name']!r} is listed twice")
+        accounts[entry["name"]] = Account(**entry)
+    return accounts
+
+
+def select(accounts: dict, names: str) -> list:
+    """picks accounts by comma separated names, or "all"
+
+    Returns:
+        list[Account]: the selected accounts
+    """
+    if names == "all":
+        return list(accounts.values())
+    wanted = [name.strip() for name in names.split(",") if name.strip()]
+    unknown = [name for name in wanted if name not in accounts]
+    if unknown:
+        raise KeyError(f"unknown accounts: {', '.join(unknown)}")
+    return [accounts[name] for name in wanted]
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from accounts import registry
+from accounts.fanout import fan_out, summary
+from accounts.registry import Account
+from api.aio import AsyncClient
+from api.auth import TokenProvider
+from api.cache import MemoryCache
+
+
+@pytest.fixture(autouse=True)
+def no_shared_cache(monkeypatch):
+    monkeypatch.setattr(registry, "_backend", False)
+
+
+class TestFanOut:
+    def test_results_keep_account_order_and_output(self):
+        accounts = [Account(name) for name in ("ana", "bo", "cy")]
+
+        def work(account):
+            time.sleep(0.01 if account.name == "ana" else 0)
+            print(f"hello from {account.name}")
+            return account.name.upper()
+
+        results = fan_out(accounts, work, workers=3)
+
+        assert [r.account for r in results] == ["ana", "bo", "cy"]
+        assert [r.value for r in results] == ["ANA", "BO", "CY"]
+        assert [r.output for r in results] == [
+            f"hello from {name}\n" for name in ("ana", "bo", "cy")
+        ]
+
+    def test_failures_are_isolated(self):
+        def work(account):
+            if account.name == "bo":
+                raise RuntimeError("not logged in")
+            return 1
+
+        results = fan_out([Account("ana"), Account("bo")], work)
+
+        assert [r.ok for r in results] == [True, False]
+        assert results[1].error == "RuntimeError: not logged in"
+        assert summary(results).endswith("2 accounts, 1 failed")
+
+    def test_accounts_run_concurrently_under_one_budget(self):
+        accounts = [Account(str(i)) for i in range(4)]
+        barrier = threading.Barrier(4, timeout=5)
+
+        def work(account):
+            barrier.wait()  # only passes when all four run at once
+            return account.transport().scheduler
+
+        results = fan_out(accounts, work, workers=4)
+
+        schedulers = {id(r.value) for r in results}
+        assert all(r.ok for r in results) and len(schedulers) == 1
+        assert results[0].value is not None
+
+    def test_output_of_worker_threads_is_kept(self):
+        class Player:
+            def __init__(self, name):
+                self.name = name
+
+            def status(self):
+                print(f"Now Playing for {self.name}")
+
+        def work(account):
+            asyncio.run(AsyncClient(Player(account.name)).status())
+
+        results = fan_out([Account("ana"), Account("bo")], work)
+
+        assert [r.output for r in results] == [
+            "Now Playing for ana\n",
+            "Now Playing for bo\n",
+        ]
+
+
+class TestAccount:
+    def test_pool_fits_the_page_workers(self):
+        import runner
+
+        assert registry.ACCOUNT_POOL_SIZE >= runner.PAGE_WORKERS
+
+    def test_cache_is_keyed_by_login(self, monkeypatch):
+        monkeypatch.setattr(registry, "_backend", MemoryCache())
+        # each token file holds a different login
+        monkeypatch.setattr(TokenProvider, "get_token", lambda self: self.cache_path)
+        ana, bo = Account("ana"), Account("bo")
+        renamed = Account("ana-2", token_cache=".cache-ana")
+
+        prefixes = [a.transport().cache.prefix() for a in (ana, bo, renamed)]
+        assert prefixes[0] != prefixes[1] and prefixes[0] == prefixes[2]
+        assert "ana" not in prefixes[0]
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from accounts import registry
+from accounts.registry import Account, load_accounts, select
+
+
+@pytest.fixture(autouse=True)
+def no_shared_cache(monkeypatch):
+    monkeypatch.setattr(registry, "_backend", False)
+
+
+@pytest.fixture
+def accounts(tmp_path):
+    path = tmp_path / "accounts.json"
+    path.write_text(
+        json.dumps(
+            [
+                {"name": "ana", "playlist": "p1"},
+                {"name": "bo", "db_path": str(tmp_path / "bo.db")},
+                {"name": "cy", "token_cache": ".cache-shared"},
+            ]
+        )
+    )
+    return load_accounts(path)
+
+
+class TestRegistry:
+    def test_load_fills_defaults(self, accounts, tmp_path):
+        assert list(accounts) == ["ana", "bo", "cy"]
+        assert accounts["ana"].token_cache == ".cache-ana"
+        assert accounts["ana"].db_path == "ana.db"
+        assert accounts["ana"].playlist_id == "p1"
+        assert accounts["bo"].db_path == str(tmp_path / "bo.db")
+        assert accounts["cy"].token_cache == ".cache-shared"
+
+    def test_duplicate_names_are_rejected(self, tmp_path):
+        path = tmp_path / "accounts.json"
+        path.write_text(json.dumps([{"name": "ana"}, {"name": "ana"}]))
+        with pytest.raises(ValueError):
+            load_accounts(path)
+
+    def test_select(self, accounts):
+        assert [a.name for a in select(accounts, "all")] == ["ana", "bo", "cy"]
+        assert [a.name for a in select(accounts, "cy, ana")] == ["cy", "ana"]
+        with pytest.raises(KeyError, match="dan"):
+            select(accounts, "ana,dan")
+
+    def test_each_account_has_its_own_transport(self):
+        ana, bo = Account("ana"), Account("bo")
+
+        assert ana.transport() is ana.transport()
+        assert ana.transport() is not bo.transport()
+        assert ana.transport().memo is not bo.transport().memo
+        assert ana.transport().tokens.cache_path == ".cache-ana"
+        assert not ana.transport().tokens.interactive
+        assert ana.playlist().transport is ana.transport()
+        assert ana.session() is ana.session()
@@ -0,0 +1,64 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from api.transport import POOL_SIZE
+
+_EXECUTOR = None
+
+
+def executor() -> ThreadPoolExecutor:
+    """shared executor, sized to the connection pool so calls never queue
+    for a connection"""
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="aio")
+    return _EXECUTOR
+
+
+class AsyncClient:
+    """Asyncio facade with the same surface as the wrapped client
+
+    Every method of the wrapped Playlist or CLISpotify becomes a coroutine
+    that runs on the shared executor over the pooled transport, so caching,
+    throttling and connection reuse behave exactly as in sync code while
+    independent calls can be awaited together with asyncio.gather.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            # the context carries the caller's request priority into the thread
+            context = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(
+                executor(), functools.partial(context.run, attr, *args, **kwargs)
+            )
+
+        return call
+
+
+class AsyncPlaylist(AsyncClient):
+    def __init__(self, transport=None):
+        from playlists.playlists import Playlist
+
+        super().__init__(Playlist(transport=transport))
+
+
+class AsyncCLISpotify(AsyncClient):
+    def __init__(self, transport=None):
+        from next_track.next_track import CLISpotify
+
+        super().__init__(CLISpotify(transport=transport))
+
+
+def run(coro):
+    """sync wrapper: runs a coroutine to completion from regular code"""
+    return asyncio.run(coro)
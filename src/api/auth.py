@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SCOPE = "user-read-playback-state,user-modify-playback-state,playlist-read-private,playlist-modify-private"  # noqa
+CACHE_PATH = os.getenv("SPOTIFY_TOKEN_CACHE", ".cache")
+REFRESH_MARGIN = 60  # seconds before expiry at which the token is refreshed
+
+
+class TokenProvider:
+    """Lazily fetched, cached OAuth access token
+
+    Nothing touches the network until the first request asks for a token.
+    The token is kept in memory and on disk (the same json file spotipy
+    writes) together with its expiry, and is refreshed shortly before it
+    expires.
+    """
+
+    def __init__(
+        self,
+        scope=SCOPE,
+        cache_path=CACHE_PATH,
+        margin=REFRESH_MARGIN,
+        interactive=True,
+    ):
+        self.scope = scope
+        self.cache_path = cache_path
+        self.margin = margin
+        # unattended jobs fail instead of opening a browser to log in
+        self.interactive = interactive
+        self._oauth = None
+        self._token_info = None
+        self._lock = threading.Lock()
+
+    def _auth_manager(self):
+        """builds the spotipy auth manager the first time it is needed"""
+        if self._oauth is None:
+            from spotipy.cache_handler import CacheFileHandler
+            from spotipy.oauth2 import SpotifyOAuth
+
+            self._oauth = SpotifyOAuth(
+                client_id=os.getenv("CLIENT_ID"),
+                client_secret=os.getenv("CLIENT_SECRET"),
+                redirect_uri=os.getenv("CALLBACK_URI"),
+                scope=self.scope,
+                cache_handler=CacheFileHandler(cache_path=self.cache_path),
+            )
+        return self._oauth
+
+    def _read_cache(self) -> dict:
+        """reads the token cached on disk, if any
+
+        Returns:
+            dict: token info, or None when missing or granted for other scopes
+        """
+        try:
+            with open(self.cache_path) as file:
+                token_info = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        granted = set(token_info.get("scope", "").split())
+        if not set(self.scope.replace(",", " ").split()) <= granted:
+            return None
+        return token_info
+
+    def _is_fresh(self, token_info: dict) -> bool:
+        return token_info["expires_at"] - time.time() > self.margin
+
+    def get_token(self) -> str:
+        """returns a valid access token, fetching or refreshing it if needed
+
+        Returns:
+            str: the access token
+        """
+        token_info = self._token_info
+        if token_info is not None and self._is_fresh(token_info):
+            return token_info["access_token"]
+
+        # only one thread fetches or refreshes; the rest reuse its result
+        with self._lock:
+            return self._load_token()
+
+    def _load_token(self) -> str:
+        token_info = self._token_info or self._read_cache()
+
+        if token_info is None:
+            if not self.interactive:
+                raise RuntimeError(f"not logged in: no token in {self.cache_path}")
+            oauth = self._auth_manager()
+            oauth.get_access_token(as_dict=False, check_cache=False)
+            token_info = oauth.cache_handler.get_cached_token()
+        elif not self._is_fresh(token_info):
+            token_info = self._auth_manager().refresh_access_token(
+                token_info["refresh_token"]
+            )
+
+        self._token_info = token_info
+        return token_info["access_token"]
+
+    def invalidate(self, token: str = None):
+        """marks a token the API rejected as expired, so the next call refreshes
+
+        Args:
+            token (str, optional): the rejected access token. Nothing happens
+                when it was already replaced, e.g. by another thread that
+                got the same 401. Defaults to the current token.
+        """
+        with self._lock:
+            token_info = self._token_info or self._read_cache()
+            if token_info is None:
+                return
+            if token is not None and token_info["access_token"] != token:
+                return
+            self._token_info = {**token_info, "expires_at": 0}
+
+    def owner(self) -> str:
+        """stable, opaque id of the login the token belongs to
+
+        Derived from the app's client id and the refresh token, which stays
+        the same across access token refreshes, so it can namespace shared
+        caches without a request to find out who the user is.
+        """
+        token = self.get_token()
+        grant = (self._token_info or {}).get("refresh_token") or token
+        login = f"{os.getenv('CLIENT_ID')}:{grant}".encode()
+        return hashlib.sha256(login).hexdigest()[:16]
+
+    def headers(self) -> dict:
+        """request headers carrying the current bearer token
+
+        Returns:
+            dict: Authorization and Content-Type headers
+        """
+        return {
+            "Authorization": "Bearer " + self.get_token(),
+            "Content-Type": "application/json",
+        }
+
+
+class StaticTokenProvider(TokenProvider):
+    """Token provider for a token obtained elsewhere, e.g. tests or benchmarks"""
+
+    def __init__(self, token: str):
+        super().__init__()
+        self.token = token
+
+    def get_token(self) -> str:
+        return self.token
+
+    def invalidate(self, token: str = None):
+        pass  # there is nothing to refresh it from
+
+
+TOKENS = TokenProvider()
@@ -0,0 +1,78 @@
+MAX_ITEMS = 100  # the most tracks a playlist mutation accepts per call
+
+
+def chunked(items, size=MAX_ITEMS):
+    """splits items into lists of at most `size`
+
+    Args:
+        items (iterable): anything iterable
+        size (int, optional): chunk size. Defaults to MAX_ITEMS.
+
+    Yields:
+        list: consecutive chunks of items
+    """
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def mutate(client, method, endpoint, bodies, snapshot_id=None) -> dict:
+    """sends a series of playlist mutations, chaining their snapshot ids
+
+    Each call is made against the snapshot returned by the previous one.
+    Stops at the first call that fails.
+
+    Args:
+        client (callable): a Playlist.client style method
+        method (str): POST or DELETE
+        endpoint (str): api endpoint, e.g. playlists/{id}/tracks
+        bodies (iterable): json payload of each call
+        snapshot_id (str, optional): snapshot the first call applies to
+
+    Returns:
+        dict: status of the last call, final snapshot_id and request count
+    """
+    status = None
+    requests_made = 0
+    for body in bodies:
+        if snapshot_id and method == "DELETE":
+            body["snapshot_id"] = snapshot_id
+        r = client(method=method, endpoint=endpoint, json=body)
+        requests_made += 1
+        status = r.status_code
+        if not r.ok:
+            break
+        snapshot_id = r.json()["snapshot_id"]
+
+    return {"status": status, "snapshot_id": snapshot_id, "requests": requests_made}
+
+
+def delete_bodies(positions):
+    """builds positional DELETE payloads, highest positions first
+
+    Deleting from the end of the playlist backwards means the positions in
+    later chunks are still valid against the snapshot returned by the
+    earlier ones.
+
+    Args:
+        positions (iterable): (uri, position) pairs to remove
+
+    Yields:
+        dict: DELETE payloads of at most MAX_ITEMS positions
+    """
+    ordered = sorted(positions, key=lambda pair: pair[1], reverse=True)
+    for chunk in chunked(ordered):
+        tracks = {}
+        for uri, position in chunk:
+            tracks.setdefault(uri, []).append(position)
+        yield {
+            "tracks": [
+                {"uri": uri, "positions": sorted(found)}
+                for uri, found in tracks.items()
+            ]
+        }
@@ -0,0 +1,247 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from fnmatch import fnmatch
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+# seconds a response stays fresh, by endpoint; anything else is never cached.
+# 0 keeps the response but revalidates it on every use, for listings whose
+# positions must match the live snapshot.
+CACHE_TTLS = {
+    "search": 24 * 3600,
+    "recommendations": 600,
+    "me/playlists": 60,
+    "playlists/*/tracks": 0,
+}
+RETENTION = 7 * 24 * 3600  # how long stale entries are kept for revalidation
+CACHE_PATH = os.getenv("SPOTIFY_CACHE_PATH", ".spoticli-cache.sqlite")
+KEPT_HEADERS = ("Content-Type", "ETag")
+
+
+class MemoryCache:
+    """In-process LRU backend"""
+
+    def __init__(self, size=512):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+
+class DiskCache:
+    """SQLite backend that persists across CLI runs"""
+
+    def __init__(self, path=CACHE_PATH, retention=RETENTION):
+        self.path = path
+        self.retention = retention
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self):
+        # opened on first use so an unused cache costs nothing at startup
+        if self._conn is None:
+            import sqlite3
+
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses"
+                " (key TEXT PRIMARY KEY, entry TEXT, stored REAL)"
+            )
+        return self._conn
+
+    def get(self, key):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT entry FROM responses WHERE key = ? AND stored > ?",
+                (key, time.time() - self.retention),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, entry):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                (key, json.dumps(entry), time.time()),
+            )
+
+    def delete_prefix(self, prefix):
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        with self._lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM responses WHERE key LIKE ? ESCAPE '\\'", (escaped + "%",)
+            )
+
+
+class RedisCache:
+    """Redis backend, shareable between hosts"""
+
+    def __init__(self, url, retention=RETENTION):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.retention = retention
+
+    def get(self, key):
+        value = self.client.get(key)
+        return json.loads(value) if value else None
+
+    def set(self, key, entry):
+        self.client.setex(key, self.retention, json.dumps(entry))
+
+    def delete_prefix(self, prefix):
+        pattern = "".join("\\" + c if c in "*?[]\\" else c for c in prefix) + "*"
+        for key in self.client.scan_iter(match=pattern):
+            self.client.delete(key)
+
+
+def backend_from_env():
+    """picks a backend from SPOTIFY_CACHE: memory, disk (default), a redis://
+    url, or off"""
+    setting = os.getenv("SPOTIFY_CACHE", "disk")
+    if setting == "off":
+        return None
+    if setting == "memory":
+        return MemoryCache()
+    if setting.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(setting)
+    return DiskCache()
+
+
+class ResponseCache:
+    """TTL cache for read-only GETs with ETag revalidation
+
+    Fresh entries are answered without touching the network. Stale entries
+    that carry an ETag are revalidated with If-None-Match, so an unchanged
+    resource costs a 304 with no body. Mutating calls drop the entries of the
+    resource they touch.
+
+    Keys start with a namespace naming the account the token belongs to, so
+    a backend shared between users (e.g. Redis) never answers one user's
+    me/... reads with another's. `namespace` is a string or a callable
+    returning one, such as TokenProvider.owner.
+    """
+
+    def __init__(self, backend, ttls=CACHE_TTLS, namespace="default"):
+        self.backend = backend
+        self.ttls = ttls
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+    def ttl(self, path: str) -> int:
+        """freshness lifetime of an endpoint, None when it isn't cacheable"""
+        for pattern, ttl in self.ttls.items():
+            if fnmatch(path, pattern):
+                return ttl
+        return None
+
+    def prefix(self) -> str:
+        namespace = self.namespace
+        return namespace() if callable(namespace) else namespace
+
+    def key(self, path: str, params=None) -> str:
+        url = urlsplit(path)
+        query = parse_qsl(url.query) + [
+            (k, str(v)) for k, v in (params or {}).items() if v is not None
+        ]
+        return f"{self.prefix()}:{url.path}?{urlencode(sorted(query))}"
+
+    def fetch(self, path, params, send) -> Response:
+        """answers a GET from the cache, revalidating or fetching as needed
+
+        Args:
+            path (str): endpoint relative to the api base url
+            params (dict): query parameters
+            send (callable): sends the request, taking extra headers
+
+        Returns:
+            requests.models.Response: the live or cached response
+        """
+        ttl = self.ttl(urlsplit(path).path)
+        if ttl is None:
+            return send(None)
+
+        key = self.key(path, params)
+        entry = self.backend.get(key)
+        if entry and entry["expires"] > time.time():
+            self.hits += 1
+            return self._response(entry)
+
+        headers = None
+        if entry and entry["headers"].get("ETag"):
+            headers = {"If-None-Match": entry["headers"]["ETag"]}
+
+        r = send(headers)
+        if r.status_code == 304 and entry:
+            self.revalidated += 1
+            entry["expires"] = time.time() + ttl
+            self.backend.set(key, entry)
+            return self._response(entry)
+
+        self.misses += 1
+        if r.status_code == 200:
+            self.backend.set(
+                key,
+                {
+                    "status": r.status_code,
+                    "headers": {
+                        h: r.headers[h] for h in KEPT_HEADERS if h in r.headers
+                    },
+                    "content": r.text,
+                    "url": r.url,
+                    "expires": time.time() + ttl,
+                },
+            )
+        return r
+
+    def invalidate(self, path: str):
+        """drops cached reads of the resource a mutation touched"""
+        parts = urlsplit(path).path.strip("/").split("/")
+        if parts[0] == "playlists" and len(parts) > 1:
+            prefix = self.prefix()
+            self.backend.delete_prefix(f"{prefix}:playlists/{parts[1]}")
+            self.backend.delete_prefix(f"{prefix}:me/playlists")
+
+    @staticmethod
+    def _response(entry) -> Response:
+        r = Response()
+        r.status_code = entry["status"]
+        r.headers = CaseInsensitiveDict(entry["headers"])
+        r._content = entry["content"].encode("utf-8")
+        r.encoding = "utf-8"
+        r.url = entry["url"]
+        r.from_cache = True
+        return r
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+        }
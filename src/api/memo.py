@@ -0,0 +1,103 @@
+import threading
+import time
+from contextlib import contextmanager
+
+WINDOW = 2.0  # seconds a GET result is reused within a scope
+
+
+class _Pending:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class RequestMemo:
+    """Request-scoped deduplication of identical GETs
+
+    Inside a scope (one CLI command or one daemon command) an identical GET
+    that is already in flight is joined rather than sent again, and one that
+    completed less than WINDOW seconds ago is answered from memory. Any
+    mutating call clears the memo. Outside a scope every request goes out.
+    """
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.saved = 0
+        self._active = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def scope(self):
+        with self._lock:
+            self._active += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._active -= 1
+                if not self._active:
+                    self._entries.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def fetch(self, key, send, fresh=False):
+        """returns the memoized response for `key`, sending it at most once
+
+        Args:
+            key (tuple): identifies the request
+            send (callable): sends the request
+            fresh (bool, optional): skip the lookup, e.g. when polling, but
+                still share the result. Defaults to False.
+
+        Returns:
+            requests.models.Response: the shared response
+        """
+        if not self._active:
+            return send()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            reusable = (
+                not fresh
+                and entry is not None
+                and (
+                    not entry[1].done.is_set()
+                    or time.monotonic() - entry[0] < self.window
+                )
+            )
+            if reusable:
+                self.saved += 1
+                pending = entry[1]
+            else:
+                pending = _Pending()
+                self._entries[key] = (time.monotonic(), pending)
+
+        if reusable:
+            pending.done.wait()
+            if pending.error:
+                raise pending.error
+            return pending.response
+
+        try:
+            pending.response = send()
+        except Exception as e:
+            pending.error = e
+            with self._lock:
+                if self._entries.get(key, (None, None))[1] is pending:
+                    del self._entries[key]
+            raise
+        finally:
+            pending.done.set()
+
+        with self._lock:
+            # the window starts when the response arrives
+            if self._entries.get(key, (None, None))[1] is pending:
+                self._entries[key] = (time.monotonic(), pending)
+        return pending.response
+
+
+MEMO = RequestMemo()
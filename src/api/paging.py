@@ -0,0 +1,161 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+# largest page size each paged endpoint accepts, keyed by endpoint suffix
+PAGE_LIMITS = {
+    "/tracks": 100,
+    "me/playlists": 50,
+    "search": 50,
+}
+DEFAULT_LIMIT = 20
+
+
+def max_limit(endpoint: str) -> int:
+    """largest allowed page size for an endpoint
+
+    Args:
+        endpoint (str): api endpoint, e.g. playlists/{id}/tracks
+
+    Returns:
+        int: the page size to ask for
+    """
+    for suffix, limit in PAGE_LIMITS.items():
+        if endpoint.rstrip("/").endswith(suffix):
+            return limit
+    return DEFAULT_LIMIT
+
+
+def _get_page(client, endpoint, params) -> dict:
+    """fetches one page, raising on an error response
+
+    An error body has no items and no next link, so reading on would end the
+    listing early, or skip a page and shift every later position.
+
+    Raises:
+        requests.HTTPError: the page could not be read
+    """
+    r = client(method="GET", endpoint=endpoint, params=params)
+    r.raise_for_status()
+    return r.json()
+
+
+def _next_request(page: dict, endpoint: str, params: dict):
+    """works out the request for the page after `page`
+
+    Follows the `next` url when the response carries one, otherwise steps the
+    offset forward until `total` is reached.
+
+    Returns:
+        tuple: (endpoint, params) of the next page, or None on the last page
+    """
+    if page.get("next"):
+        return page["next"], None
+    if "next" in page or "total" not in page:
+        return None
+
+    offset = params.get("offset", 0) + params["limit"]
+    if offset >= page["total"]:
+        return None
+    return endpoint, dict(params, offset=offset)
+
+
+def paginate(client, endpoint, params=None, key=None, limit=None, prefetch=False):
+    """lazily yields every item of a paged endpoint
+
+    Only the current page (and the next one, when prefetching) is held in
+    memory, so callers can stream arbitrarily large playlists and stop early
+    by simply breaking out of the loop.
+
+    Args:
+        client (callable): a Playlist.client / CLISpotify.client style method
+        endpoint (str): api endpoint of the first page
+        params (dict, optional): query parameters. Defaults to None.
+        key (str, optional): key wrapping the page object, e.g. "artists" for
+            search results. Defaults to None.
+        limit (int, optional): page size. Defaults to the endpoint maximum.
+        prefetch (bool, optional): fetch the next page in the background while
+            the current one is consumed. Defaults to False.
+
+    Yields:
+        dict: the items of each page, in order
+    """
+    params = dict(params or {})
+    params.setdefault("limit", limit or max_limit(endpoint))
+
+    def fetch(request):
+        page = _get_page(client, *request)
+        return page[key] if key else page
+
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    request = (endpoint, params)
+    try:
+        page = fetch(request)
+        while True:
+            upcoming = _next_request(page, endpoint, request[1] or params)
+            future = None
+            if executor and upcoming:
+                # the context carries the caller's request priority
+                future = executor.submit(
+                    contextvars.copy_context().run, fetch, upcoming
+                )
+
+            yield from page.get("items", [])
+
+            if upcoming is None:
+                return
+            page = future.result() if future else fetch(upcoming)
+            request = upcoming
+    finally:
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def paginate_parallel(client, endpoint, params=None, key=None, limit=None, workers=8):
+    """yields every item of an offset-paged endpoint, fetching pages concurrently
+
+    The first page is fetched on its own to learn `total`; the remaining
+    offsets are then known up front and fetched on a bounded thread pool.
+    At most `workers` requests are in flight at once and pages are yielded
+    back in playlist order.
+
+    Args:
+        client (callable): a Playlist.client / CLISpotify.client style method
+        endpoint (str): api endpoint of the first page
+        params (dict, optional): query parameters. Defaults to None.
+        key (str, optional): key wrapping the page object. Defaults to None.
+        limit (int, optional): page size. Defaults to the endpoint maximum.
+        workers (int, optional): maximum requests in flight. Defaults to 8.
+
+    Yields:
+        dict: the items of each page, in order
+    """
+    params = dict(params or {})
+    params.setdefault("limit", limit or max_limit(endpoint))
+    params.setdefault("offset", 0)
+
+    def fetch(offset):
+        page = _get_page(client, endpoint, dict(params, offset=offset))
+        return page[key] if key else page
+
+    first = fetch(params["offset"])
+    # step by the page size actually served, which may be below the one asked for
+    step = first.get("limit") or params["limit"]
+    offsets = range(params["offset"] + step, first.get("total", 0), step)
+    yield from first.get("items", [])
+
+    # a sliding window of futures keeps memory bounded by `workers` pages
+    pending = iter(offsets)
+    window = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for offset in pending:
+                window.append(
+                    executor.submit(contextvars.copy_context().run, fetch, offset)
+                )
+                if len(window) >= workers:
+                    yield from window.pop(0).result().get("items", [])
+            while window:
+                yield from window.pop(0).result().get("items", [])
+        finally:
+            for future in window:
+                future.cancel()
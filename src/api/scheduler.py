@@ -0,0 +1,171 @@
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+INTERACTIVE, NORMAL, BULK = 0, 1, 2
+# Spotify counts requests over a rolling 30 second window and doesn't publish
+# the budget, so the limiter starts high and learns it from 429s
+RATE = float(os.getenv("SPOTIFY_RATE", 100))  # ceiling, requests per second
+BURST = int(os.getenv("SPOTIFY_BURST", 100))
+MIN_RATE = 1.0
+WINDOW = 30.0  # seconds without a 429 before the rate climbs again
+RECOVERY = 0.25  # share of the ceiling regained per calm window
+RETRIES = 4
+BACKOFF = 0.5  # seconds, doubled on every retry and jittered
+MAX_BACKOFF = 30
+IDEMPOTENT = ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+RETRY_STATUSES = (500, 502, 503, 504)
+
+_priority = contextvars.ContextVar("priority", default=None)
+
+
+@contextmanager
+def priority(level: int):
+    """runs the enclosed requests at a given priority
+
+    Example:
+        with priority(BULK):
+            mirror.sync()
+    """
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def default_priority(endpoint: str) -> int:
+    """player controls are interactive unless a caller says otherwise"""
+    level = _priority.get()
+    if level is not None:
+        return level
+    return INTERACTIVE if endpoint.lstrip("/").startswith("me/player") else NORMAL
+
+
+class Scheduler:
+    """Client-side rate limiter for the Web API
+
+    Requests draw from a token bucket refilled at `rate` per second. Waiting
+    requests are served in priority order, so interactive commands cut ahead
+    of queued bulk work. A 429 pauses every request until its Retry-After has
+    passed and halves the rate (and the burst with it); every WINDOW seconds
+    without another 429 wins back RECOVERY of the ceiling. Idempotent calls
+    are also retried on 5xx and connection errors with jittered exponential
+    backoff.
+    """
+
+    def __init__(self, rate=RATE, burst=BURST, retries=RETRIES, backoff=BACKOFF):
+        self.ceiling = rate
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.throttled = 0
+        self.retried = 0
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._calm_since = self._updated
+        self._blocked_until = 0.0
+        self._waiting = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        if self.rate < self.ceiling and now - self._calm_since >= WINDOW:
+            self.rate = min(self.ceiling, self.rate + self.ceiling * RECOVERY)
+            self._calm_since = now
+        capacity = max(1.0, min(self.burst, self.rate))
+        self._tokens = min(capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, level=NORMAL):
+        """blocks until this request may be sent"""
+        entry = (level, next(self._order))
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if (
+                    self._waiting[0] == entry
+                    and now >= self._blocked_until
+                    and self._tokens >= 1
+                ):
+                    heapq.heappop(self._waiting)
+                    self._tokens -= 1
+                    self._cond.notify_all()
+                    return
+                wait = max(self._blocked_until - now, (1 - self._tokens) / self.rate)
+                self._cond.wait(timeout=max(wait, 0.001))
+
+    def block(self, seconds: float):
+        """holds back every request for `seconds`, e.g. after a 429"""
+        with self._cond:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0
+            self._cond.notify_all()
+
+    def slow_down(self):
+        """halves the rate after a 429, down to MIN_RATE"""
+        with self._cond:
+            self.rate = max(MIN_RATE, self.rate / 2)
+            self._calm_since = max(time.monotonic(), self._blocked_until)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(MAX_BACKOFF, self.backoff * 2**attempt))
+
+    def send(self, method, endpoint, send) -> requests.models.Response:
+        """sends a request through the bucket, retrying when it is safe to
+
+        Args:
+            method (str): HTTP method, decides whether retries are safe
+            endpoint (str): api endpoint, decides the default priority
+            send (callable): performs the request and returns the response
+
+        Returns:
+            requests.models.Response: the final response
+        """
+        level = default_priority(endpoint)
+        idempotent = method.upper() in IDEMPOTENT
+        for attempt in range(self.retries + 1):
+            self.acquire(level)
+            last = attempt == self.retries
+            try:
+                r = send()
+            except (requests.ConnectionError, requests.Timeout):
+                if last or not idempotent:
+                    raise
+                self.retried += 1
+                time.sleep(self._backoff(attempt))
+                continue
+
+            if r.status_code == 429 and not last:
+                # a throttled request was never processed, so any method retries
+                self.throttled += 1
+                self.retried += 1
+                retry_after = r.headers.get("Retry-After")
+                self.block(
+                    float(retry_after) if retry_after else self._backoff(attempt)
+                )
+                self.slow_down()
+                continue
+            if r.status_code in RETRY_STATUSES and idempotent and not last:
+                self.retried += 1
+                time.sleep(self._backoff(attempt))
+                continue
+            return r
+
+    def stats(self) -> dict:
+        return {
+            "throttled": self.throttled,
+            "retried": self.retried,
+            "rate": self.rate,
+        }
@@ -0,0 +1,83 @@
+import os
+import re
+from collections import namedtuple
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib decoder is used instead
+    orjson = None
+
+# a market makes Spotify leave out available_markets, a list of ~185 country
+# codes on every track and album that is usually most of the payload
+MARKET = os.getenv("SPOTIFY_MARKET", "from_token")
+SEARCH_RESULTS = 10  # enough for item_lookup to find an exact name match
+FAST_JSON = os.getenv("SPOTICLI_JSON", "orjson") != "json"
+
+# query parameters each GET endpoint gets unless the caller sets them. Only
+# the playlist endpoints accept a `fields` filter; the rest are trimmed with
+# market and limit.
+PROJECTIONS = (
+    (re.compile(r"me/player(/currently-playing)?"), {"market": MARKET}),
+    (re.compile(r"search"), {"market": MARKET, "limit": SEARCH_RESULTS}),
+    (re.compile(r"recommendations"), {"market": MARKET}),
+    (re.compile(r"playlists/[^/?]+"), {"fields": "id,name,snapshot_id,owner(id)"}),
+)
+
+PlaylistRef = namedtuple("PlaylistRef", "name id")
+Track = namedtuple("Track", "name artist uri duration_ms")
+Player = namedtuple("Player", "is_playing track device context progress_ms")
+
+
+def project(path: str, params: dict = None) -> dict:
+    """adds the endpoint's default projection to the query parameters
+
+    Args:
+        path (str): endpoint relative to the base url. Paths carrying a query
+            string, such as `next` links, already have theirs.
+        params (dict, optional): the caller's parameters, which take
+            precedence. Defaults to None.
+
+    Returns:
+        dict: the parameters to send
+    """
+    for pattern, defaults in PROJECTIONS:
+        if pattern.fullmatch(path):
+            return {**defaults, **(params or {})}
+    return params
+
+
+def decode_json(r, fallback, **kwargs):
+    """decodes a response body, with orjson when it is installed
+
+    Anything orjson rejects goes through `fallback` (requests' own
+    Response.json), so errors are raised the same way either way.
+    """
+    if orjson is None or not FAST_JSON or kwargs:
+        return fallback(**kwargs)
+    try:
+        return orjson.loads(r.content)
+    except orjson.JSONDecodeError:
+        return fallback()
+
+
+def track(item: dict) -> Track:
+    item = item or {}
+    artists = item.get("artists") or [{}]
+    return Track(
+        item.get("name", ""),
+        artists[0].get("name", ""),
+        item.get("uri"),
+        item.get("duration_ms", 0),
+    )
+
+
+def player(payload: dict) -> Player:
+    """the parts of a me/player response this tool reads"""
+    item = payload.get("item")
+    return Player(
+        payload.get("is_playing") is True,
+        track(item) if item else None,
+        (payload.get("device") or {}).get("name"),
+        (payload.get("context") or {}).get("uri"),
+        payload.get("progress_ms") or 0,
+    )
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+import responses
+
+from api.aio import AsyncCLISpotify, AsyncPlaylist, run
+
+BASE_URL = "https://api.spotify.com/v1/"
+LATENCY = 0.2
+
+
+def slow(body):
+    def callback(request):
+        time.sleep(LATENCY)
+        return (200, {}, body)
+
+    return callback
+
+
+class TestAsyncClient:
+    @responses.activate
+    def test_same_surface(self):
+        responses.get(
+            BASE_URL + "me/playlists",
+            json={"items": [{"name": "My Playlist", "id": "123456"}]},
+        )
+        pl = AsyncPlaylist()
+
+        assert run(pl.get_my_playlists()) == [("My Playlist", "123456")]
+        assert pl.transport is pl._client.transport
+
+    @responses.activate
+    def test_gather_runs_concurrently(self):
+        responses.add_callback(
+            responses.GET,
+            BASE_URL + "me/player",
+            callback=slow('{"is_playing": false}'),
+        )
+        responses.add_callback(
+            responses.PUT, BASE_URL + "me/player/shuffle", callback=slow("")
+        )
+        pl, session = AsyncPlaylist(), AsyncCLISpotify()
+
+        async def both():
+            return await asyncio.gather(pl.shuffle(True), session.status())
+
+        start = time.perf_counter()
+        shuffled, status = run(both())
+        elapsed = time.perf_counter() - start
+
+        assert shuffled == {"status": 200, "state": True}
+        assert status == "Not playing anywhere"
+        assert elapsed < 2 * LATENCY
@@ -0,0 +1,113 @@
+import json
+import time
+
+import pytest
+
+from api.auth import TokenProvider
+
+SCOPE = "user-read-playback-state,user-modify-playback-state"
+
+
+@pytest.fixture
+def fake_token():
+    """overrides the conftest stub so the real provider is exercised"""
+
+
+class FakeOAuth:
+    def __init__(self):
+        self.refreshed = []
+
+    def refresh_access_token(self, refresh_token):
+        self.refreshed.append(refresh_token)
+        return {
+            "access_token": "fresh",
+            "refresh_token": refresh_token,
+            "expires_at": int(time.time()) + 3600,
+            "scope": SCOPE.replace(",", " "),
+        }
+
+
+def write_cache(path, expires_at, scope=SCOPE):
+    token_info = {
+        "access_token": "cached",
+        "refresh_token": "refresh-me",
+        "expires_at": expires_at,
+        "scope": scope.replace(",", " "),
+    }
+    path.write_text(json.dumps(token_info))
+
+
+class TestTokenProvider:
+    def test_valid_cache_needs_no_auth_manager(self, tmp_path):
+        cache = tmp_path / ".cache"
+        write_cache(cache, int(time.time()) + 3600)
+        provider = TokenProvider(scope=SCOPE, cache_path=str(cache))
+
+        assert provider.get_token() == "cached"
+        assert provider._oauth is None
+
+    def test_refreshes_before_expiry(self, tmp_path):
+        cache = tmp_path / ".cache"
+        write_cache(cache, int(time.time()) + 30)
+        provider = TokenProvider(scope=SCOPE, cache_path=str(cache), margin=60)
+        provider._oauth = FakeOAuth()
+
+        assert provider.get_token() == "fresh"
+        assert provider._oauth.refreshed == ["refresh-me"]
+
+        # served from memory afterwards
+        assert provider.get_token() == "fresh"
+        assert provider._oauth.refreshed == ["refresh-me"]
+
+    def test_ignores_cache_with_missing_scope(self, tmp_path):
+        cache = tmp_path / ".cache"
+        write_cache(cache, int(time.time()) + 3600, scope="user-read-playback-state")
+        provider = TokenProvider(scope=SCOPE, cache_path=str(cache))
+
+        assert provider._read_cache() is None
+
+    def test_headers(self, tmp_path):
+        cache = tmp_path / ".cache"
+        write_cache(cache, int(time.time()) + 3600)
+        provider = TokenProvider(scope=SCOPE, cache_path=str(cache))
+
+        assert provider.headers()["Authorization"] == "Bearer cached"
+
+    def test_non_interactive_without_token(self, tmp_path):
+        provider = TokenProvider(
+            scope=SCOPE, cache_path=str(tmp_path / "missing"), interactive=False
+        )
+        with pytest.raises(RuntimeError, match="not logged in"):
+            provider.get_token()
+
+    def test_owner_survives_refresh(self, tmp_path):
+        cache = tmp_path / ".cache"
+        write_cache(cache, int(time.time()) + 30)
+        provider = TokenProvider(scope=SCOPE, cache_path=str(cache), margin=60)
+        provider._oauth = FakeOAuth()
+        other = TokenProvider(scope=SCOPE, cache_path=str(cache), margin=0)
+
+        assert provider.owner() == other.owner()
+        assert provider.get_token() == "fresh" and other.get_token() == "cached"
+        assert provider.owner() == other.owner()
+
+        cache.write_text(cache.read_text().replace("refresh-me", "someone-else"))
+        assert (
+            TokenProvider(scope=SCOPE, cache_path=str(cache), margin=0).owner()
+            != other.owner()
+        )
+
+    def test_invalidate_refreshes_a_rejected_token(self, tmp_path):
+        cache = tmp_path / ".cache"
+        write_cache(cache, int(time.time()) + 3600)
+        provider = TokenProvider(scope=SCOPE, cache_path=str(cache))
+        provider._oauth = FakeOAuth()
+        assert provider.get_token() == "cached"
+
+        provider.invalidate(token="cached")
+        assert provider.get_token() == "fresh"
+
+        # a 401 for the token that was already replaced changes nothing
+        provider.invalidate(token="cached")
+        assert provider.get_token() == "fresh"
+        assert provider._oauth.refreshed == ["refresh-me"]
@@ -0,0 +1,26 @@
+from api.batch import chunked, delete_bodies
+
+
+class TestBatch:
+    def test_chunked(self):
+        chunks = list(chunked(range(250)))
+        assert [len(c) for c in chunks] == [100, 100, 50]
+        assert chunks[2][-1] == 249
+
+    def test_delete_bodies_run_backwards(self):
+        positions = [(f"spotify:track:{n % 3}", n) for n in range(150)]
+        bodies = list(delete_bodies(positions))
+
+        assert len(bodies) == 2
+        first = [p for t in bodies[0]["tracks"] for p in t["positions"]]
+        second = [p for t in bodies[1]["tracks"] for p in t["positions"]]
+        assert min(first) == 50 and max(second) == 49
+
+    def test_delete_bodies_group_by_uri(self):
+        body = next(delete_bodies([("a", 4), ("b", 3), ("a", 1)]))
+        assert body == {
+            "tracks": [
+                {"uri": "a", "positions": [1, 4]},
+                {"uri": "b", "positions": [3]},
+            ]
+        }
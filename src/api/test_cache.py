@@ -0,0 +1,101 @@
+import pytest
+import responses
+
+from api.auth import StaticTokenProvider, TokenProvider
+from api.cache import DiskCache, MemoryCache, ResponseCache
+from api.transport import Transport
+
+BASE_URL = "https://api.spotify.com/v1/"
+
+
+@pytest.fixture
+def transport():
+    return Transport(tokens=TokenProvider(), cache=ResponseCache(MemoryCache()))
+
+
+class TestBackends:
+    def test_memory_lru(self):
+        cache = MemoryCache(size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+
+    def test_disk_persists(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite")
+        DiskCache(path).set("default:search?q=x", {"content": "{}"})
+        assert DiskCache(path).get("default:search?q=x") == {"content": "{}"}
+
+    def test_delete_prefix(self, tmp_path):
+        for cache in (MemoryCache(), DiskCache(str(tmp_path / "cache.sqlite"))):
+            cache.set("ns:playlists/a_b/tracks", 1)
+            cache.set("ns:playlists/axb/tracks", 2)
+            cache.delete_prefix("ns:playlists/a_b")
+            assert cache.get("ns:playlists/a_b/tracks") is None
+            assert cache.get("ns:playlists/axb/tracks") == 2
+
+
+class TestResponseCache:
+    @responses.activate
+    def test_fresh_hit_skips_network(self, transport):
+        responses.get(BASE_URL + "search", json={"artists": {"items": []}})
+
+        first = transport.request("GET", "search", params={"q": "x", "type": "artist"})
+        second = transport.request("GET", "search", params={"type": "artist", "q": "x"})
+
+        assert second.json() == first.json()
+        assert second.from_cache
+        assert len(responses.calls) == 1
+        assert transport.cache.stats() == {"hits": 1, "misses": 1, "revalidated": 0}
+
+    @responses.activate
+    def test_users_sharing_a_backend_are_kept_apart(self):
+        backend = MemoryCache()
+        transports = [
+            Transport(
+                tokens=tokens, cache=ResponseCache(backend, namespace=tokens.owner)
+            )
+            for tokens in (StaticTokenProvider("ana"), StaticTokenProvider("bo"))
+        ]
+        for name in ("ana", "bo"):
+            responses.get(BASE_URL + "me/playlists", json={"items": [name]})
+
+        mine = [t.request("GET", "me/playlists").json()["items"] for t in transports]
+
+        assert mine == [["ana"], ["bo"]]
+        assert len(responses.calls) == 2
+
+    @responses.activate
+    def test_revalidates_with_etag(self, transport):
+        url = BASE_URL + "playlists/abc/tracks"
+        responses.get(url, json={"items": [1]}, headers={"ETag": '"v1"'})
+        responses.get(url, status=304)
+
+        transport.request("GET", "playlists/abc/tracks")
+        r = transport.request("GET", "playlists/abc/tracks")
+
+        assert r.json() == {"items": [1]}
+        assert responses.calls[1].request.headers["If-None-Match"] == '"v1"'
+        assert transport.cache.revalidated == 1
+
+    @responses.activate
+    def test_mutation_invalidates(self, transport):
+        responses.get(BASE_URL + "me/playlists", json={"items": []})
+        responses.post(BASE_URL + "playlists/abc/tracks", json={"snapshot_id": "s"})
+
+        transport.request("GET", "me/playlists")
+        transport.request("POST", "playlists/abc/tracks", json={"uris": []})
+        transport.request("GET", "me/playlists")
+
+        assert len(responses.calls) == 3
+
+    @responses.activate
+    def test_player_is_never_cached(self, transport):
+        responses.get(BASE_URL + "me/player", json={})
+
+        transport.request("GET", "me/player")
+        transport.request("GET", "me/player")
+
+        assert len(responses.calls) == 2
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import responses
+
+from api.memo import MEMO, RequestMemo
+from next_track.next_track import CLISpotify
+from playlists.playlists import Playlist
+
+BASE_URL = "https://api.spotify.com/v1/"
+PLAYER = {
+    "is_playing": True,
+    "item": {"name": "Gary", "artists": [{"name": "George"}], "uri": "spotify:track:1"},
+    "device": {"name": "device"},
+}
+
+
+class TestRequestMemo:
+    def test_inactive_outside_scope(self):
+        memo = RequestMemo()
+        calls = []
+        memo.fetch("k", lambda: calls.append(1))
+        memo.fetch("k", lambda: calls.append(1))
+        assert len(calls) == 2
+
+    def test_joins_in_flight_requests(self):
+        memo = RequestMemo()
+        calls = []
+
+        def send():
+            calls.append(1)
+            time.sleep(0.1)
+            return "response"
+
+        with memo.scope():
+            results = []
+            threads = [
+                threading.Thread(target=lambda: results.append(memo.fetch("k", send)))
+                for _ in range(3)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert results == ["response"] * 3
+        assert len(calls) == 1
+        assert memo.saved == 2
+
+    def test_window_expires(self):
+        memo = RequestMemo(window=0)
+        calls = []
+        with memo.scope():
+            memo.fetch("k", lambda: calls.append(1))
+            memo.fetch("k", lambda: calls.append(1))
+        assert len(calls) == 2
+
+    @responses.activate
+    def test_add_fetches_player_once(self):
+        responses.get(BASE_URL + "me/player", json=PLAYER)
+
+        with MEMO.scope():
+            uri = Playlist().get_current_track()
+            status = CLISpotify().status()
+
+        assert uri == "spotify:track:1" and status[2] == uri
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_mutation_clears(self):
+        responses.get(BASE_URL + "me/player", json=PLAYER)
+        responses.post(BASE_URL + "me/player/next", status=204)
+
+        with MEMO.scope():
+            session = CLISpotify()
+            session.status()
+            session.next_track()
+            session.status()
+
+        assert [c.request.method for c in responses.calls] == ["GET", "POST", "GET"]
+
+    @responses.activate
+    def test_body_parsed_once(self):
+        responses.get(BASE_URL + "me/player", json=PLAYER)
+        r = CLISpotify().client(method="GET", endpoint="me/player")
+        assert r.json() is r.json()
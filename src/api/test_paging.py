@@ -0,0 +1,155 @@
+import pytest
+import requests
+import responses
+from responses import matchers
+
+from api.paging import max_limit, paginate, paginate_parallel
+from playlists.playlists import Playlist
+
+BASE_URL = "https://api.spotify.com/v1/"
+
+
+def page(items, next_url=None, total=None):
+    body = {"items": [{"id": i} for i in items], "next": next_url}
+    if total is not None:
+        body["total"] = total
+    return body
+
+
+class TestPaginate:
+    def test_max_limit(self):
+        assert max_limit("playlists/abc/tracks") == 100
+        assert max_limit("me/playlists") == 50
+
+    @responses.activate
+    def test_follows_next(self):
+        responses.get(
+            BASE_URL + "me/playlists",
+            json=page([1, 2], next_url=BASE_URL + "me/playlists?offset=2&limit=2"),
+            match=[matchers.query_param_matcher({"limit": "2"})],
+        )
+        responses.get(
+            BASE_URL + "me/playlists",
+            json=page([3]),
+            match=[matchers.query_param_matcher({"offset": "2", "limit": "2"})],
+        )
+
+        items = paginate(Playlist().client, "me/playlists", limit=2)
+        assert [i["id"] for i in items] == [1, 2, 3]
+
+    @responses.activate
+    def test_steps_offset_without_next(self):
+        for offset, items in ((0, [1, 2]), (2, [3, 4]), (4, [5])):
+            responses.get(
+                BASE_URL + "playlists/abc/tracks",
+                json={"items": [{"id": i} for i in items], "total": 5},
+                match=[
+                    matchers.query_param_matcher(
+                        {"limit": "2", "offset": str(offset)}, strict_match=False
+                    )
+                ],
+            )
+
+        items = paginate(
+            Playlist().client, "playlists/abc/tracks", params={"offset": 0}, limit=2
+        )
+        assert [i["id"] for i in items] == [1, 2, 3, 4, 5]
+
+    @responses.activate
+    def test_stops_early(self):
+        responses.get(
+            BASE_URL + "me/playlists",
+            json=page([1, 2], next_url=BASE_URL + "me/playlists?offset=2"),
+        )
+
+        items = paginate(Playlist().client, "me/playlists")
+        assert next(items) == {"id": 1}
+        items.close()
+
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_prefetch_keeps_order(self):
+        urls = [BASE_URL + f"search?page={n}" for n in range(1, 4)]
+        responses.get(
+            BASE_URL + "search",
+            json={"artists": page([0], urls[0])},
+            match=[matchers.query_param_matcher({"q": "x"}, strict_match=False)],
+        )
+        for n, url in enumerate(urls, start=1):
+            responses.get(
+                url,
+                json={"artists": page([n], urls[n] if n < 3 else None)},
+                match=[matchers.query_param_matcher({"page": str(n)})],
+            )
+
+        items = paginate(
+            Playlist().client,
+            "search",
+            params={"q": "x"},
+            key="artists",
+            prefetch=True,
+        )
+        assert [i["id"] for i in items] == [0, 1, 2, 3]
+
+    @responses.activate
+    def test_parallel_keeps_order(self):
+        for offset in range(0, 10, 2):
+            responses.get(
+                BASE_URL + "playlists/abc/tracks",
+                json={"items": [{"id": offset}, {"id": offset + 1}], "total": 10},
+                match=[
+                    matchers.query_param_matcher({"limit": "2", "offset": str(offset)})
+                ],
+            )
+
+        items = paginate_parallel(
+            Playlist().client, "playlists/abc/tracks", limit=2, workers=3
+        )
+        assert [i["id"] for i in items] == list(range(10))
+        assert len(responses.calls) == 5
+
+    @responses.activate
+    def test_parallel_steps_by_served_limit(self):
+        for offset in range(0, 6, 2):
+            responses.get(
+                BASE_URL + "playlists/abc/tracks",
+                json={
+                    "items": [{"id": offset}, {"id": offset + 1}],
+                    "limit": 2,
+                    "total": 6,
+                },
+                match=[
+                    matchers.query_param_matcher(
+                        {"limit": "100", "offset": str(offset)}
+                    )
+                ],
+            )
+
+        items = paginate_parallel(Playlist().client, "playlists/abc/tracks")
+        assert [i["id"] for i in items] == list(range(6))
+
+    @responses.activate
+    def test_failed_page_raises(self):
+        responses.get(BASE_URL + "me/playlists", status=401, json={"error": {}})
+
+        with pytest.raises(requests.HTTPError):
+            Playlist().get_my_playlists()
+
+    @responses.activate
+    def test_parallel_failed_page_raises(self):
+        for offset in range(0, 6, 2):
+            responses.get(
+                BASE_URL + "playlists/abc/tracks",
+                status=404 if offset == 2 else 200,
+                json={"items": [{"id": offset}, {"id": offset + 1}], "total": 6},
+                match=[
+                    matchers.query_param_matcher({"limit": "2", "offset": str(offset)})
+                ],
+            )
+
+        items = paginate_parallel(
+            Playlist().client, "playlists/abc/tracks", limit=2, workers=2
+        )
+        with pytest.raises(requests.HTTPError):
+            list(items)
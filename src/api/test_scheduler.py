@@ -0,0 +1,124 @@
+import threading
+import time
+
+import pytest
+import requests
+import responses
+
+from api.auth import TokenProvider
+from api.scheduler import (
+    BULK,
+    INTERACTIVE,
+    NORMAL,
+    Scheduler,
+    default_priority,
+    priority,
+)
+from api.transport import Transport
+
+BASE_URL = "https://api.spotify.com/v1/"
+
+
+@pytest.fixture
+def transport():
+    return Transport(tokens=TokenProvider(), scheduler=Scheduler(backoff=0.01))
+
+
+class TestScheduler:
+    def test_bucket_limits_rate(self):
+        scheduler = Scheduler(rate=50, burst=5)
+        start = time.monotonic()
+        for _ in range(15):
+            scheduler.acquire()
+        # 5 from the burst, 10 more at 50/s
+        assert time.monotonic() - start >= 0.18
+
+    def test_interactive_cuts_ahead(self):
+        scheduler = Scheduler(rate=20, burst=1)
+        scheduler.acquire()
+        order = []
+
+        def worker(level, name):
+            scheduler.acquire(level)
+            order.append(name)
+
+        threads = [
+            threading.Thread(target=worker, args=(BULK, f"bulk{n}")) for n in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.01)
+        threads.append(threading.Thread(target=worker, args=(INTERACTIVE, "next")))
+        threads[-1].start()
+        for thread in threads:
+            thread.join()
+
+        assert order[0] == "next"
+
+    def test_default_priority(self):
+        assert default_priority("/me/player/next") == INTERACTIVE
+        assert default_priority("me/playlists") == NORMAL
+        with priority(BULK):
+            assert default_priority("/me/player/next") == BULK
+
+    @responses.activate
+    def test_retries_429_after_retry_after(self, transport):
+        responses.get(
+            BASE_URL + "me/playlists", status=429, headers={"Retry-After": "0"}
+        )
+        responses.get(BASE_URL + "me/playlists", json={"items": []})
+
+        r = transport.request("GET", "me/playlists")
+
+        assert r.status_code == 200
+        stats = transport.scheduler.stats()
+        assert stats == {
+            "throttled": 1,
+            "retried": 1,
+            "rate": transport.scheduler.ceiling / 2,
+        }
+
+    def test_rate_adapts_to_429s(self, monkeypatch):
+        from api import scheduler as module
+
+        scheduler = Scheduler(rate=40, burst=40)
+        scheduler.slow_down()
+        scheduler.slow_down()
+        assert scheduler.rate == 10
+
+        monkeypatch.setattr(module, "WINDOW", 0.0)
+        scheduler.acquire()
+        assert scheduler.rate == 20
+        scheduler.acquire()
+        scheduler.acquire()
+        assert scheduler.rate == 40
+
+    def test_retry_after_blocks_every_request(self):
+        scheduler = Scheduler()
+        scheduler.block(0.2)
+        start = time.monotonic()
+        scheduler.acquire(INTERACTIVE)
+        assert time.monotonic() - start >= 0.19
+
+    @responses.activate
+    def test_retries_idempotent_on_5xx(self, transport):
+        responses.put(BASE_URL + "me/player/pause", status=503)
+        responses.put(BASE_URL + "me/player/pause", status=204)
+
+        assert transport.request("PUT", "me/player/pause").status_code == 204
+
+    @responses.activate
+    def test_does_not_retry_post_on_5xx(self, transport):
+        responses.post(BASE_URL + "playlists/abc/tracks", status=502)
+        responses.post(BASE_URL + "playlists/abc/tracks", status=201)
+
+        assert transport.request("POST", "playlists/abc/tracks").status_code == 502
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_gives_up_on_connection_errors(self, transport):
+        responses.get(BASE_URL + "me/player", body=requests.ConnectionError("down"))
+
+        with pytest.raises(requests.ConnectionError):
+            transport.request("GET", "me/player")
+        assert len(responses.calls) == transport.scheduler.retries + 1
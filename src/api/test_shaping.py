@@ -0,0 +1,96 @@
+import pytest
+import requests
+import responses
+from responses import matchers
+
+from api import shaping
+from api.shaping import PlaylistRef, decode_json, player, project, track
+from api.transport import Transport
+
+BASE_URL = "https://api.spotify.com/v1/"
+
+
+def response(body: bytes) -> requests.models.Response:
+    r = requests.models.Response()
+    r._content, r.status_code, r.encoding = body, 200, "utf-8"
+    return r
+
+
+class TestProject:
+    def test_adds_endpoint_defaults(self):
+        assert project("me/player") == {"market": "from_token"}
+        assert project("search", {"q": "x"}) == {
+            "market": "from_token",
+            "limit": shaping.SEARCH_RESULTS,
+            "q": "x",
+        }
+
+    def test_caller_wins(self):
+        assert project("search", {"limit": 50})["limit"] == 50
+        assert project("playlists/abc", {"fields": "snapshot_id"}) == {
+            "fields": "snapshot_id"
+        }
+
+    def test_other_endpoints_and_next_links_are_untouched(self):
+        assert project("playlists/abc/tracks", {"limit": 100}) == {"limit": 100}
+        assert project("search?offset=10&market=SE") is None
+
+    @responses.activate
+    def test_transport_projects_gets_only(self):
+        responses.get(
+            BASE_URL + "me/player",
+            match=[matchers.query_param_matcher({"market": "from_token"})],
+            json={},
+        )
+        responses.put(
+            BASE_URL + "me/player/play",
+            match=[matchers.query_param_matcher({})],
+            status=204,
+        )
+        transport = Transport()
+
+        assert transport.request("GET", "me/player").status_code == 200
+        assert transport.request("PUT", "me/player/play").status_code == 204
+
+    @responses.activate
+    def test_shaping_can_be_turned_off(self):
+        responses.get(
+            BASE_URL + "me/player", match=[matchers.query_param_matcher({})], json={}
+        )
+        assert Transport(shaping=False).request("GET", "me/player").ok
+
+
+class TestDecode:
+    @pytest.mark.parametrize("fast", [True, False])
+    def test_decodes(self, monkeypatch, fast):
+        monkeypatch.setattr(shaping, "FAST_JSON", fast)
+        r = response('{"name": "Sigur Rós"}'.encode())
+        assert decode_json(r, r.json) == {"name": "Sigur Rós"}
+
+    def test_errors_come_from_requests(self):
+        r = response(b"")
+        with pytest.raises(requests.exceptions.JSONDecodeError):
+            decode_json(r, r.json)
+
+
+class TestRecords:
+    def test_player(self):
+        state = player(
+            {
+                "is_playing": True,
+                "progress_ms": 5,
+                "item": {"name": "Gary", "artists": [{"name": "George"}], "uri": "u"},
+                "device": {"name": "desk"},
+            }
+        )
+        assert state.is_playing and state.device == "desk"
+        assert state.track == track(
+            {"name": "Gary", "artists": [{"name": "George"}], "uri": "u"}
+        )
+        assert state.track.artist == "George" and state.context is None
+
+    def test_empty_player(self):
+        assert player({}) == (False, None, None, None, 0)
+
+    def test_playlist_ref_is_a_tuple(self):
+        assert PlaylistRef("Mix", "abc") == ("Mix", "abc")
@@ -0,0 +1,66 @@
+import responses
+
+from api.tracing import NO_SPAN, Tracer
+from api.transport import TRANSPORT, Transport
+
+BASE_URL = "https://api.spotify.com/v1/"
+
+
+class TestTracer:
+    def test_disabled_records_nothing(self):
+        tracer = Tracer()
+        with tracer.span("noop") as span:
+            span["key"] = "value"
+        assert span is NO_SPAN
+        assert tracer.spans == []
+
+    def test_nested_spans(self):
+        tracer = Tracer()
+        tracer.enable()
+        with tracer.span("outer"):
+            with tracer.span("inner", rows=3):
+                pass
+        with tracer.span("after"):
+            pass
+
+        inner, outer, after = tracer.spans
+        assert inner.parent is outer and after.parent is None
+        lines = tracer.waterfall().splitlines()
+        assert [line.rsplit("| ", 1)[1] for line in lines] == [
+            "outer",
+            "  inner rows=3",
+            "after",
+        ]
+
+    def test_otlp(self):
+        tracer = Tracer()
+        tracer.enable()
+        try:
+            with tracer.span("outer", **{"http.method": "GET"}):
+                raise ValueError
+        except ValueError:
+            pass
+
+        (span,) = tracer.otlp()["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert span["kind"] == 3 and span["status"] == {"code": 2}
+        assert {"key": "http.method", "value": {"stringValue": "GET"}} in span[
+            "attributes"
+        ]
+        assert int(span["endTimeUnixNano"]) >= int(span["startTimeUnixNano"])
+
+    @responses.activate
+    def test_transport_spans(self, monkeypatch):
+        tracer = Tracer()
+        tracer.enable()
+        monkeypatch.setattr("api.transport.TRACER", tracer)
+        responses.get(BASE_URL + "me/player", json={"is_playing": False})
+
+        Transport(tokens=TRANSPORT.tokens).request("GET", "me/player").json()
+
+        names = {span.name: span for span in tracer.spans}
+        assert set(names) == {"GET me/player", "token", "http", "json"}
+        call = names["GET me/player"]
+        assert call.attributes["http.status_code"] == 200
+        assert call.attributes["bytes"] > 0
+        assert call.attributes["cache.hit"] is False
+        assert names["http"].parent is call
@@ -0,0 +1,84 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import responses
+
+from api.auth import StaticTokenProvider, TokenProvider
+from api.transport import Transport
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}/v1/"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class RotatingTokens(StaticTokenProvider):
+    def invalidate(self, token=None):
+        self.rejected = token
+        self.token = "fresh"
+
+
+class TestTransport:
+    def test_url_joins_with_or_without_slash(self):
+        transport = Transport(tokens=TokenProvider())
+        assert transport.url("/me/player") == "https://api.spotify.com/v1/me/player"
+        assert transport.url("search") == "https://api.spotify.com/v1/search"
+
+    @responses.activate
+    def test_rejected_token_is_refreshed_once(self):
+        responses.get("https://api.spotify.com/v1/me/player", status=401)
+        responses.get("https://api.spotify.com/v1/me/player", json={})
+        responses.put("https://api.spotify.com/v1/me/player/pause", status=401)
+        tokens = RotatingTokens("revoked")
+        transport = Transport(tokens=tokens)
+
+        assert transport.request("GET", "me/player").status_code == 200
+        assert tokens.rejected == "revoked"
+        assert [c.request.headers["Authorization"] for c in responses.calls] == [
+            "Bearer revoked",
+            "Bearer fresh",
+        ]
+
+        assert transport.request("PUT", "me/player/pause").status_code == 401
+        assert len(responses.calls) == 4
+
+    @responses.activate
+    def test_request_sends_token_and_records_timing(self):
+        responses.get("https://api.spotify.com/v1/me/player", json={})
+        transport = Transport(tokens=TokenProvider())
+
+        r = transport.request("GET", "me/player")
+
+        assert r.request.headers["Authorization"] == "Bearer test-token"
+        assert transport.timings[-1].endpoint == "me/player"
+        assert transport.stats()["requests"] == 1
+
+    def test_connections_are_reused(self, server):
+        transport = Transport(tokens=TokenProvider(), base_url=server)
+
+        for _ in range(5):
+            assert transport.request("GET", "me/player").json() == {"ok": True}
+
+        assert transport.stats()["connections"] == 1
+        transport.close()
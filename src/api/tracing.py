@@ -0,0 +1,236 @@
+import contextvars
+import os
+import threading
+import time
+
+MAX_SPANS = 10_000  # oldest spans are dropped past this many
+WATERFALL_WIDTH = 40
+ATTRIBUTE_CHARS = 60  # longer attribute values are cut short in the waterfall
+SERVICE_NAME = "spoticli"
+
+_current = contextvars.ContextVar("span", default=None)
+
+
+class Span:
+    """One timed operation: an API call, a token fetch, a query
+
+    Used as a context manager; while it is open, spans started in the same
+    context (or in a copied one, e.g. a worker thread) become its children.
+    Attributes can be set on it like a dict.
+    """
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.span_id = os.urandom(8).hex()
+        self.parent = None
+        self.start = self.end = None
+
+    def __setitem__(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.parent = _current.get()
+        self._token = _current.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        try:
+            _current.reset(self._token)
+        except ValueError:  # closed from another context, e.g. a generator
+            _current.set(self.parent)
+        self.tracer.record(self)
+
+    @property
+    def depth(self) -> int:
+        depth, parent = 0, self.parent
+        while parent is not None:
+            depth, parent = depth + 1, parent.parent
+        return depth
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class _NoSpan:
+    """stand-in returned while tracing is off, so call sites stay unconditional"""
+
+    def __setitem__(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    """Collects spans around API calls and database operations
+
+    Tracing is off by default and costs a single attribute check per call
+    site until enabled, e.g. by `runner --trace`. Recorded spans can be
+    printed as a waterfall or exported as OpenTelemetry (OTLP/JSON) spans.
+    """
+
+    def __init__(self, max_spans=MAX_SPANS):
+        self.enabled = False
+        self.max_spans = max_spans
+        self.spans = []
+        self.trace_id = None
+        self._lock = threading.Lock()
+        self._epoch = (time.time(), time.perf_counter())
+
+    def enable(self):
+        self.trace_id = os.urandom(16).hex()
+        self._epoch = (time.time(), time.perf_counter())
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+
+    def span(self, name: str, **attributes):
+        """times the enclosed block
+
+        Example:
+            with TRACER.span("GET me/player", method="GET") as span:
+                r = send()
+                span["status"] = r.status_code
+        """
+        if not self.enabled:
+            return NO_SPAN
+        return Span(self, name, attributes)
+
+    def record(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+            if len(self.spans) > self.max_spans:
+                del self.spans[: len(self.spans) - self.max_spans]
+
+    def _ordered(self) -> list:
+        """spans in start order with every child right after its parent"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        children = {}
+        for span in spans:
+            children.setdefault(span.parent, []).append(span)
+        known = set(spans)
+
+        ordered = []
+        stack = [s for s in spans if s.parent not in known][::-1]
+        while stack:
+            span = stack.pop()
+            ordered.append(span)
+            stack.extend(children.get(span, [])[::-1])
+        return ordered
+
+    def waterfall(self, width=WATERFALL_WIDTH) -> str:
+        """renders the recorded spans as a text timing waterfall
+
+        Returns:
+            str: one line per span with its offset, duration and attributes
+        """
+        spans = self._ordered()
+        if not spans:
+            return "no spans recorded"
+        origin = min(s.start for s in spans)
+        total = max(s.end for s in spans) - origin or 1e-9
+
+        lines = []
+        for span in spans:
+            offset = int((span.start - origin) / total * width)
+            length = max(1, int(span.duration / total * width))
+            bar = " " * offset + "█" * min(length, width - offset)
+            attributes = " ".join(
+                f"{k}={_short(v)}" for k, v in span.attributes.items()
+            )
+            label = "  " * span.depth + span.name
+            lines.append(
+                f"{(span.start - origin) * 1000:8.1f}ms {span.duration * 1000:8.1f}ms"
+                f" |{bar:<{width}}| {label} {attributes}".rstrip()
+            )
+        return "\n".join(lines)
+
+    def _nanos(self, perf: float) -> str:
+        wall, start = self._epoch
+        return str(int((wall + perf - start) * 1e9))
+
+    def otlp(self) -> dict:
+        """the recorded spans in the OTLP/JSON export format
+
+        Returns:
+            dict: an ExportTraceServiceRequest body
+        """
+        spans = []
+        for span in self._ordered():
+            spans.append(
+                {
+                    "traceId": self.trace_id,
+                    "spanId": span.span_id,
+                    "parentSpanId": span.parent.span_id if span.parent else "",
+                    "name": span.name,
+                    # CLIENT for API calls, INTERNAL for everything else
+                    "kind": 3 if "http.method" in span.attributes else 1,
+                    "startTimeUnixNano": self._nanos(span.start),
+                    "endTimeUnixNano": self._nanos(span.end),
+                    "attributes": [
+                        {"key": key, "value": _otlp_value(value)}
+                        for key, value in span.attributes.items()
+                    ],
+                    "status": {"code": 2 if "error" in span.attributes else 0},
+                }
+            )
+        service = {"key": "service.name", "value": {"stringValue": SERVICE_NAME}}
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [service]},
+                    "scopeSpans": [{"scope": {"name": SERVICE_NAME}, "spans": spans}],
+                }
+            ]
+        }
+
+    def export(self, path: str) -> int:
+        """writes the recorded spans to `path` as OTLP/JSON
+
+        Returns:
+            int: number of spans written
+        """
+        import json
+
+        body = self.otlp()
+        with open(path, "w") as f:
+            json.dump(body, f)
+        return len(body["resourceSpans"][0]["scopeSpans"][0]["spans"])
+
+
+def _short(value, limit=ATTRIBUTE_CHARS) -> str:
+    """one line, truncated rendering of an attribute, e.g. an SQL statement"""
+    value = " ".join(str(value).split())
+    return value if len(value) <= limit else value[: limit - 1] + "…"
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+TRACER = Tracer()
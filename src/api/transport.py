@@ -0,0 +1,216 @@
+import os
+import time
+from collections import deque, namedtuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from api.auth import TOKENS
+from api.cache import ResponseCache, backend_from_env
+from api.memo import MEMO
+from api.scheduler import Scheduler
+from api.shaping import decode_json, project
+from api.tracing import TRACER
+
+BASE_URL = "https://api.spotify.com/v1/"
+POOL_SIZE = int(os.getenv("SPOTIFY_POOL_SIZE", 10))
+TIMEOUT = (3.05, 15)  # (connect, read) seconds
+TIMINGS_KEPT = 256
+
+Timing = namedtuple("Timing", "method endpoint status elapsed")
+
+
+def parse_once(r: requests.models.Response) -> requests.models.Response:
+    """makes r.json() decode the body on the first call only"""
+    if getattr(r, "parsed_once", False):
+        return r
+    r.parsed_once = True
+    fallback = r.json
+    parsed = []
+
+    def json(**kwargs):
+        if not parsed:
+            with TRACER.span("json", bytes=len(r.content)):
+                parsed.append(decode_json(r, fallback, **kwargs))
+        return parsed[0]
+
+    r.json = json
+    return r
+
+
+class Transport:
+    """Pooled, keep-alive HTTP transport for the Spotify Web API
+
+    A single requests.Session is shared by every client so connections (and
+    their TLS handshakes) are reused across calls instead of being opened for
+    each request.
+    """
+
+    def __init__(
+        self,
+        tokens=TOKENS,
+        base_url=BASE_URL,
+        pool_size=POOL_SIZE,
+        timeout=TIMEOUT,
+        cache=None,
+        scheduler=None,
+        memo=MEMO,
+        shaping=True,
+    ):
+        self.tokens = tokens
+        self.base_url = base_url
+        self.timeout = timeout
+        self.cache = cache
+        self.scheduler = scheduler
+        self.memo = memo
+        self.shaping = shaping
+        self.timings = deque(maxlen=TIMINGS_KEPT)
+
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.session.headers.update(
+            {"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"}
+        )
+
+    def url(self, endpoint: str) -> str:
+        """joins an endpoint onto the base url, with or without a leading slash
+
+        Absolute urls, such as the `next` links of paged responses, are
+        returned untouched.
+        """
+        if endpoint.startswith(("https://", "http://")):
+            return endpoint
+        return self.base_url + endpoint.lstrip("/")
+
+    def request(
+        self, method, endpoint, params=None, json=None, headers=None
+    ) -> requests.models.Response:
+        """sends a request over the pooled session
+
+        Args:
+            method (str): HTTP methods (GET|PUT|PATCH|POST|DELETE|etc)
+            endpoint (str): api endpoint of the request
+            params (dict, optional): Dict of query parameters. Defaults to None.
+            json (dict, optional): Dict of payload for requests. Defaults to None.
+            headers (dict, optional): extra headers for this request only.
+                "Cache-Control: no-cache" skips the memo and response cache,
+                e.g. when polling.
+
+        GETs get the endpoint's default projection (api.shaping.PROJECTIONS)
+        added to their query when `shaping` is on. A 401 refreshes the token
+        and sends the request once more.
+
+        Returns:
+            requests.models.Response: the response of the request
+        """
+
+        def send(extra_headers):
+            def attempt():
+                with TRACER.span("token"):
+                    request_headers = self.tokens.headers()
+                if headers:
+                    request_headers.update(headers)
+                if extra_headers:
+                    request_headers.update(extra_headers)
+
+                with TRACER.span("http") as span:
+                    r = self.session.request(
+                        method=method,
+                        url=self.url(endpoint),
+                        params=params,
+                        json=json,
+                        headers=request_headers,
+                        timeout=self.timeout,
+                    )
+                    # connect, send and wait for the headers; the rest is body
+                    span["ttfb_ms"] = round(r.elapsed.total_seconds() * 1000, 1)
+                    span["http.status_code"] = r.status_code
+                return r
+
+            def scheduled():
+                if self.scheduler is None:
+                    return attempt()
+                return self.scheduler.send(method, endpoint, attempt)
+
+            r = scheduled()
+            if r.status_code == 401:
+                # revoked or expired early: refresh the token and try once more
+                rejected = r.request.headers.get("Authorization", "")
+                self.tokens.invalidate(token=rejected.removeprefix("Bearer "))
+                r = scheduled()
+            return parse_once(r)
+
+        def get():
+            if self.cache is None or fresh:
+                return send(None)
+            return parse_once(self.cache.fetch(self.path(endpoint), params, send))
+
+        fresh = bool(headers) and headers.get("Cache-Control") == "no-cache"
+        if method == "GET" and self.shaping:
+            params = project(self.path(endpoint), params)
+        start = time.perf_counter()
+        with TRACER.span(
+            f"{method} {self.path(endpoint).split('?')[0]}", **{"http.method": method}
+        ) as span:
+            if method == "GET":
+                path = self.path(endpoint)
+                key = (id(self), path, repr(sorted((params or {}).items())))
+                r = self.memo.fetch(key, get, fresh=fresh) if self.memo else get()
+            else:
+                r = send(None)
+                if self.memo:
+                    self.memo.clear()
+                if self.cache and r.ok:
+                    self.cache.invalidate(self.path(endpoint))
+            span["http.status_code"] = r.status_code
+            span["bytes"] = len(r.content or b"")
+            span["cache.hit"] = getattr(r, "from_cache", False)
+        self.timings.append(
+            Timing(method, endpoint, r.status_code, time.perf_counter() - start)
+        )
+        return r
+
+    def path(self, endpoint: str) -> str:
+        """endpoint relative to the base url, e.g. for absolute `next` links"""
+        url = self.url(endpoint)
+        if url.startswith(self.base_url):
+            return url[len(self.base_url) :]
+        return endpoint.lstrip("/")
+
+    def connections_opened(self) -> int:
+        """number of connections the pool has opened so far"""
+        pools = self.adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def stats(self) -> dict:
+        """summary of the recorded request timings
+
+        Returns:
+            dict: request count, total and mean latency, connections opened
+                and, when enabled, cache and throttling counters
+        """
+        elapsed = [t.elapsed for t in self.timings]
+        stats = {
+            "requests": len(elapsed),
+            "total_s": sum(elapsed),
+            "mean_s": sum(elapsed) / len(elapsed) if elapsed else 0.0,
+            "connections": self.connections_opened(),
+        }
+        if self.cache:
+            stats.update(self.cache.stats())
+        if self.scheduler:
+            stats.update(self.scheduler.stats())
+        return stats
+
+    def close(self):
+        self.session.close()
+
+
+def default_cache(tokens=TOKENS):
+    backend = backend_from_env()
+    return ResponseCache(backend, namespace=tokens.owner) if backend else None
+
+
+TRANSPORT = Transport(cache=default_cache(), scheduler=Scheduler())
@@ -0,0 +1,46 @@
+"""Sequential vs concurrent full-playlist reads against a local mock server
+
+python -m bench.bench_paging [tracks] [latency_seconds]
+"""
+
+import sys
+import time
+
+from api.auth import StaticTokenProvider
+from api.transport import Transport
+from bench.mock_server import MockSpotify
+from playlists.playlists import Playlist
+
+
+def run(tracks=10_000, latency=0.05, workers=8) -> dict:
+    results = {}
+    with MockSpotify(tracks=tracks, latency=latency) as mock:
+        transport = Transport(
+            tokens=StaticTokenProvider("bench"), base_url=mock.base_url
+        )
+        pl = Playlist(transport=transport)
+
+        for mode, kwargs in (
+            ("sequential", {"prefetch": False}),
+            ("prefetch", {"prefetch": True}),
+            ("parallel", {"workers": workers}),
+        ):
+            mock.requests = 0
+            start = time.perf_counter()
+            count = sum(
+                1 for _ in pl.iter_tracks("bench", fields="track(id)", **kwargs)
+            )
+            results[mode] = {
+                "items": count,
+                "requests": mock.requests,
+                "wall_s": round(time.perf_counter() - start, 3),
+            }
+        transport.close()
+    return results
+
+
+if __name__ == "__main__":
+    tracks = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    for mode, result in run(tracks=tracks, latency=latency).items():
+        print(f"{mode:>10}: {result}")
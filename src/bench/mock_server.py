@@ -0,0 +1,316 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+# largest page the real API serves for each paged endpoint
+PAGE_SIZES = {"me/playlists": 50, "tracks": 100}
+# stands in for the ~185 country codes the API lists when no market is given
+MARKETS = [a + b for a in "ABCDEFGHIJKLMNOPQR" for b in "ABCDEFGHIJ"]
+
+
+def parse_fields(spec: str) -> dict:
+    """parses a `fields` filter such as "next,items(track(uri,name))"
+
+    Returns:
+        dict: field name -> nested filter, None for the whole field
+    """
+    fields, i = {}, 0
+    while i < len(spec):
+        j = i
+        while j < len(spec) and spec[j] not in ",()":
+            j += 1
+        name = spec[i:j].strip()
+        if j < len(spec) and spec[j] == "(":
+            depth, k = 1, j + 1
+            while depth:
+                depth += {"(": 1, ")": -1}.get(spec[k], 0)
+                k += 1
+            fields[name] = parse_fields(spec[j + 1 : k - 1])
+            j = k
+        else:
+            fields[name] = None
+        i = j + 1
+    return fields
+
+
+def select(value, fields):
+    """keeps only the parsed `fields` of a payload, through lists"""
+    if fields is None:
+        return value
+    if isinstance(value, list):
+        return [select(v, fields) for v in value]
+    if isinstance(value, dict):
+        return {k: select(value[k], sub) for k, sub in fields.items() if k in value}
+    return value
+
+
+class MockSpotify:
+    """Local stand-in for the Spotify Web API
+
+    Serves a synthetic library (playlists of tracks, a playing device,
+    recommendations) with a configurable per-request latency so the client
+    code paths can be timed without touching the network.
+
+    Args:
+        tracks (int, optional): tracks in every playlist. Defaults to 10_000.
+        latency (float, optional): seconds added to each request.
+        playlists (int, optional): playlists in the library. Defaults to 1.
+        page_size (int, optional): cap on the page size served, below the
+            endpoint maximum. Defaults to None (the maximum).
+        throttle_every (int, optional): answer every nth request with a 429.
+            Defaults to None (never).
+        retry_after (int, optional): Retry-After of injected 429s, seconds.
+    """
+
+    def __init__(
+        self,
+        tracks=10_000,
+        latency=0.05,
+        playlists=1,
+        page_size=None,
+        throttle_every=None,
+        retry_after=0,
+    ):
+        self.tracks = tracks
+        self.latency = latency
+        self.playlists = playlists
+        self.page_size = page_size
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.reset()
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def origin(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_port}"
+
+    @property
+    def base_url(self) -> str:
+        return self.origin + "/v1/"
+
+    def reset(self):
+        """zeroes the request counters"""
+        self.requests = 0
+        self.throttled = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.snapshots = 0
+
+    def counters(self) -> dict:
+        return {
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+        }
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def handle_one(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                with mock._lock:
+                    mock.requests += 1
+                    mock.bytes_received += len(self.requestline) + length
+                    throttle = (
+                        mock.throttle_every and mock.requests % mock.throttle_every == 0
+                    )
+                    if throttle:
+                        mock.throttled += 1
+                time.sleep(mock.latency)
+
+                if throttle:
+                    self.reply(429, {"error": {"status": 429}}, mock.retry_after)
+                    return
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                status, payload = mock.route(method, url.path, query, body)
+                self.reply(status, payload)
+
+            def do_GET(self):
+                self.handle_one("GET")
+
+            def do_POST(self):
+                self.handle_one("POST")
+
+            def do_PUT(self):
+                self.handle_one("PUT")
+
+            def do_DELETE(self):
+                self.handle_one("DELETE")
+
+            def reply(self, status, payload, retry_after=None):
+                body = b"" if payload is None else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if retry_after is not None:
+                    self.send_header("Retry-After", str(retry_after))
+                self.end_headers()
+                self.wfile.write(body)
+                with mock._lock:
+                    mock.bytes_sent += len(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def route(self, method, path, query, body) -> tuple:
+        """answers one request
+
+        Returns:
+            tuple: status code, JSON payload (None for an empty body)
+        """
+        parts = path.strip("/").split("/")[1:]  # without the v1 prefix
+        market = query.get("market")
+        if method == "GET":
+            if parts == ["me", "playlists"]:
+                return 200, self.playlists_page(path, query)
+            if parts == ["me", "player"]:
+                return 200, self.player(market)
+            if parts == ["recommendations"]:
+                limit = int(query.get("limit", 20))
+                return 200, {"tracks": [self.track(n, market) for n in range(limit)]}
+            if parts == ["search"]:
+                return 200, self.search(query)
+            if parts[:1] == ["playlists"] and len(parts) == 2:
+                return 200, select(self.playlist(parts[1]), self.fields(query))
+            if parts[:1] == ["playlists"] and parts[2:] == ["tracks"]:
+                page = self.tracks_page(path, query)
+                return 200, select(page, self.fields(query))
+        elif parts[:1] == ["playlists"] and parts[2:] == ["tracks"]:
+            self.snapshots += 1
+            return (201 if method == "POST" else 200), {
+                "snapshot_id": f"snap{self.snapshots}"
+            }
+        elif parts[:2] == ["me", "player"]:
+            return 204, None
+        return 404, {"error": {"status": 404}}
+
+    @staticmethod
+    def fields(query):
+        return parse_fields(query["fields"]) if "fields" in query else None
+
+    def page(self, path, query, total, item, maximum) -> dict:
+        offset = int(query.get("offset", 0))
+        limit = min(int(query.get("limit", maximum)), self.page_size or maximum)
+        end = min(offset + limit, total)
+        next_url = None
+        if end < total:
+            # like the real API, next links keep the rest of the query
+            next_query = urlencode(dict(query, offset=end, limit=limit))
+            next_url = f"{self.origin}{path}?{next_query}"
+        return {
+            "items": [item(n) for n in range(offset, end)],
+            "limit": limit,
+            "offset": offset,
+            "total": total,
+            "next": next_url,
+        }
+
+    def playlists_page(self, path, query) -> dict:
+        return self.page(
+            path,
+            query,
+            self.playlists,
+            lambda n: {
+                "id": f"pl{n}",
+                "name": f"Playlist {n}",
+                "snapshot_id": "snap0",
+                "tracks": {"total": self.tracks},
+            },
+            PAGE_SIZES["me/playlists"],
+        )
+
+    def tracks_page(self, path, query) -> dict:
+        return self.page(
+            path,
+            query,
+            self.tracks,
+            # every tenth track repeats so dedupe has something to find
+            lambda n: {"track": self.track(n - n % 10 if n % 10 == 9 else n)},
+            PAGE_SIZES["tracks"],
+        )
+
+    def playlist(self, playlist_id) -> dict:
+        return {
+            "id": playlist_id,
+            "name": f"Playlist {playlist_id}",
+            "snapshot_id": "snap0",
+            "owner": {"id": "bench", "display_name": "Bench"},
+            "images": self.images(playlist_id),
+            "tracks": self.tracks_page(
+                f"/v1/playlists/{playlist_id}/tracks", {"limit": 100}
+            ),
+        }
+
+    def search(self, query) -> dict:
+        kind = query.get("type", "track")
+        limit = int(query.get("limit", 20))
+        items = [self.track(n, query.get("market")) for n in range(limit)]
+        if items:
+            items[-1]["name"] = query.get("q", "")  # an exact match, ranked last
+        return {f"{kind}s": {"items": items, "limit": limit, "total": 1000}}
+
+    @staticmethod
+    def images(key) -> list:
+        return [
+            {"url": f"https://i.scdn.co/image/{key}-{size}", "height": size}
+            for size in (640, 300, 64)
+        ]
+
+    @staticmethod
+    def track(n, market=None) -> dict:
+        """a full track object, without available_markets when a market is
+        given, as the real API does"""
+        album_id = f"album{n // 10}"
+        track = {
+            "id": f"track{n}",
+            "uri": f"spotify:track:track{n}",
+            "name": f"Song {n}",
+            "duration_ms": 180_000 + n % 120_000,
+            "artists": [{"name": f"Artist {n % 500}"}],
+            "external_ids": {"isrc": f"ZZ{n:010d}"},
+            "album": {
+                "id": album_id,
+                "uri": f"spotify:album:{album_id}",
+                "name": f"Album {n // 10}",
+                "release_date": "2020-01-01",
+                "images": MockSpotify.images(album_id),
+            },
+            "href": f"https://api.spotify.com/v1/tracks/track{n}",
+            "popularity": n % 100,
+        }
+        if market:
+            track["is_playable"] = True
+        else:
+            track["available_markets"] = MARKETS
+            track["album"]["available_markets"] = MARKETS
+        return track
+
+    def player(self, market=None) -> dict:
+        return {
+            "is_playing": True,
+            "item": self.track(1, market),
+            "device": {"name": "bench"},
+            "context": {"uri": "spotify:playlist:pl0"},
+        }
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._httpd.shutdown()
+        self._httpd.server_close()
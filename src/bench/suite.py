@@ -0,0 +1,301 @@
+"""Benchmarks of the real client code paths against a local mock API
+
+python -m bench.suite [scenario ...] [--save] [--baseline FILE]
+
+Each scenario runs in a fresh interpreter against its own MockSpotify and
+records wall time, request count, bytes transferred and peak RSS. Results
+are compared with the JSON baseline and the run fails on a regression;
+--save records them as the new baseline instead.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from collections import namedtuple
+from contextlib import redirect_stdout
+
+from bench.mock_server import MockSpotify
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baselines.json")
+# allowed growth over the baseline before a metric counts as a regression
+TOLERANCES = {
+    "wall_s": 0.5,
+    "peak_rss_kb": 0.25,
+    "requests": 0.0,
+    "bytes_sent": 0.05,
+    "bytes_received": 0.05,
+}
+# the scheduler's bucket would dominate the timings, so it is opened up,
+# except in the scenarios that measure what users run
+CHILD_ENV = {"SPOTIFY_CACHE": "off", "SPOTIFY_RATE": "10000", "SPOTIFY_BURST": "1000"}
+LIMITS_ENV = ("SPOTIFY_RATE", "SPOTIFY_BURST")
+
+Scenario = namedtuple("Scenario", "func mock default_limits")
+SCENARIOS = {}
+
+
+def scenario(name, default_limits=False, **mock):
+    """registers a benchmark and the MockSpotify settings it runs against
+
+    Args:
+        default_limits (bool, optional): run with the scheduler's shipped
+            rate and burst instead of opening them up. Defaults to False.
+    """
+
+    def register(func):
+        SCENARIOS[name] = Scenario(func, mock, default_limits)
+        return func
+
+    return register
+
+
+@scenario("iter_tracks", tracks=10_000, latency=0.02)
+def iter_tracks():
+    from playlists.playlists import Playlist
+
+    return sum(1 for _ in Playlist().iter_tracks("pl0", fields="track(uri)"))
+
+
+@scenario("iter_tracks_parallel", tracks=10_000, latency=0.02)
+def iter_tracks_parallel():
+    from playlists.playlists import Playlist
+
+    items = Playlist().iter_tracks("pl0", fields="track(uri)", workers=8)
+    return sum(1 for _ in items)
+
+
+@scenario("default_limits", default_limits=True, tracks=30_000, latency=0.02)
+def default_limits():
+    return iter_tracks()
+
+
+@scenario("default_limits_parallel", default_limits=True, tracks=30_000, latency=0.02)
+def default_limits_parallel():
+    return iter_tracks_parallel()
+
+
+@scenario("small_pages", tracks=2_000, latency=0.01, page_size=20)
+def small_pages():
+    from playlists.playlists import Playlist
+
+    return sum(1 for _ in Playlist().iter_tracks("pl0", workers=8))
+
+
+@scenario("throttled", tracks=2_000, latency=0.01, throttle_every=4)
+def throttled():
+    from playlists.playlists import Playlist
+
+    return sum(1 for _ in Playlist().iter_tracks("pl0", workers=4))
+
+
+@scenario("fuzzy_dedupe", tracks=10_000, latency=0.02)
+def fuzzy_dedupe():
+    from playlists.playlists import Playlist
+
+    _, extras = Playlist().find_duplicate_positions("pl0", workers=8, fuzzy=True)
+    return len(extras)
+
+
+@scenario("my_playlists", playlists=2_000, tracks=0, latency=0.01)
+def my_playlists():
+    from playlists.playlists import Playlist
+
+    return len(Playlist().get_my_playlists())
+
+
+@scenario("status", latency=0.005)
+def status():
+    from next_track.next_track import CLISpotify
+
+    session = CLISpotify()
+    return sum(1 for _ in range(50) if session.status())
+
+
+def player_calls(shaping=True, fast_json=True):
+    """the calls that read a few keys of big payloads: status, current track,
+    recommendations and search"""
+    from api import shaping as shapes
+    from api.transport import TRANSPORT
+    from next_track.next_track import CLISpotify
+    from playlists.playlists import Playlist
+
+    TRANSPORT.shaping, shapes.FAST_JSON = shaping, fast_json
+    session, pl = CLISpotify(), Playlist()
+    found = 0
+    for n in range(20):
+        found += bool(session.status())
+        found += bool(pl.get_current_track())
+        found += len(pl.recommend("track1")["tracks"])
+        found += bool(session.item_lookup("track", f"Song {n}"))
+    return found
+
+
+@scenario("shaped_calls", latency=0.002)
+def shaped_calls():
+    return player_calls()
+
+
+@scenario("unshaped_calls", latency=0.002)
+def unshaped_calls():
+    return player_calls(shaping=False, fast_json=False)
+
+
+def decode_pages(fast_json) -> int:
+    """decodes one unfiltered 100 track page over and over"""
+    from api import shaping as shapes
+    from api.transport import TRANSPORT, parse_once
+
+    shapes.FAST_JSON = fast_json
+    r = TRANSPORT.request("GET", "playlists/pl0/tracks", params={"limit": 100})
+    items = 0
+    for _ in range(300):
+        r.parsed_once, r.json = False, type(r).json.__get__(r)
+        items += len(parse_once(r).json()["items"])
+    return items
+
+
+@scenario("json_decode", tracks=100, latency=0)
+def json_decode():
+    return decode_pages(fast_json=True)
+
+
+@scenario("json_decode_stdlib", tracks=100, latency=0)
+def json_decode_stdlib():
+    return decode_pages(fast_json=False)
+
+
+@scenario("runner_current", latency=0.005)
+def runner_current():
+    import runner
+
+    return 1 if runner.main(["current"]) else 0
+
+
+@scenario("runner_next", latency=0.005)
+def runner_next():
+    import runner
+
+    return 1 if runner.main(["next"]) else 0
+
+
+@scenario("runner_sync", playlists=50, tracks=300, latency=0.005)
+def runner_sync():
+    import runner
+
+    with tempfile.TemporaryDirectory() as tmp:
+        runner.DB_PATH = os.path.join(tmp, "bench.db")
+        return runner.main(["sync"])["refreshed"]
+
+
+def peak_rss_kb() -> int:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # bytes on macOS
+
+
+def run_child(name, base_url):
+    """runs one scenario in this process and prints its measurements"""
+    import time
+
+    from api.auth import StaticTokenProvider
+    from api.transport import TRANSPORT
+
+    TRANSPORT.base_url = base_url
+    TRANSPORT.tokens = StaticTokenProvider("bench")
+
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        items = SCENARIOS[name].func()
+    wall = time.perf_counter() - start
+    print(
+        json.dumps(
+            {"items": items, "wall_s": round(wall, 3), "peak_rss_kb": peak_rss_kb()}
+        )
+    )
+
+
+def measure(name) -> dict:
+    """runs one scenario in a fresh interpreter against its own mock server
+
+    Returns:
+        dict: items, wall_s, peak_rss_kb and the mock's request counters
+    """
+    with MockSpotify(
+        **SCENARIOS[name].mock
+    ) as mock, tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, SPOTICLI_SOCKET=os.path.join(tmp, "none.sock"))
+        env.update({k: v for k, v in CHILD_ENV.items() if k not in os.environ})
+        if SCENARIOS[name].default_limits:
+            for key in LIMITS_ENV:
+                env.pop(key, None)
+        child = subprocess.run(
+            [sys.executable, "-m", "bench.suite", "--child", name, mock.base_url],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        result = json.loads(child.stdout.splitlines()[-1])
+        result.update(mock.counters())
+    return result
+
+
+def regressions(results, baseline) -> list:
+    """metrics that grew past their tolerance
+
+    Returns:
+        list[str]: one line per regression
+    """
+    found = []
+    for name, result in results.items():
+        for metric, tolerance in TOLERANCES.items():
+            before = baseline.get(name, {}).get(metric)
+            if before is not None and result[metric] > before * (1 + tolerance):
+                found.append(f"{name}.{metric}: {before} -> {result[metric]}")
+    return found
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", help="default: all")
+    parser.add_argument("--save", action="store_true", help="write the baseline")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(*args.child)
+        return 0
+
+    names = args.scenarios or list(SCENARIOS)
+    results = {}
+    for name in names:
+        results[name] = measure(name)
+        print(f"{name:>22}: {results[name]}")
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    else:
+        baseline = {}
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        return 0
+
+    found = regressions(results, baseline)
+    for line in found:
+        print(f"regression {line}")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+from api.auth import StaticTokenProvider
+from api.scheduler import Scheduler
+from api.transport import Transport
+from bench.mock_server import MockSpotify
+from bench.suite import regressions
+from playlists.playlists import Playlist
+
+
+class TestMockSpotify:
+    def test_throttled_paging_retries(self):
+        with MockSpotify(tracks=250, latency=0, throttle_every=2) as mock:
+            transport = Transport(
+                tokens=StaticTokenProvider("bench"),
+                base_url=mock.base_url,
+                scheduler=Scheduler(rate=1000, burst=100),
+            )
+            items = list(Playlist(transport=transport).iter_tracks("pl0"))
+            transport.close()
+
+        assert len(items) == 250
+        assert mock.throttled == 2 and mock.requests == 5
+        assert mock.bytes_sent > 0
+
+    def test_small_pages(self):
+        with MockSpotify(tracks=50, latency=0, page_size=20) as mock:
+            transport = Transport(
+                tokens=StaticTokenProvider("bench"), base_url=mock.base_url
+            )
+            items = list(Playlist(transport=transport).iter_tracks("pl0", workers=4))
+            transport.close()
+
+        assert [i["track"]["id"] for i in items][:3] == ["track0", "track1", "track2"]
+        assert len(items) == 50 and mock.requests == 3
+
+    def test_regressions(self):
+        baseline = {"status": {"wall_s": 1.0, "requests": 50}}
+        results = {"status": {"wall_s": 1.4, "requests": 51}}
+        results["status"].update(peak_rss_kb=0, bytes_sent=0, bytes_received=0)
+        assert regressions(results, baseline) == ["status.requests: 50 -> 51"]
+
+    def test_fields_and_market_shape_payloads(self):
+        with MockSpotify(tracks=150, latency=0) as mock:
+            transport = Transport(
+                tokens=StaticTokenProvider("bench"), base_url=mock.base_url
+            )
+            items = list(Playlist(transport=transport).iter_tracks("pl0", "track(uri)"))
+            player = transport.request("GET", "me/player").json()
+            transport.shaping = False
+            full = transport.request("GET", "me/player").json()
+            transport.close()
+
+        assert items[0] == {"track": {"uri": "spotify:track:track0"}}
+        assert len(items) == 150 and mock.requests == 4
+        assert "available_markets" not in player["item"]
+        assert "available_markets" in full["item"]
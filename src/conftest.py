@@ -0,0 +1,17 @@
+import pytest
+
+from api.auth import TokenProvider
+
+
+@pytest.fixture(autouse=True)
+def fake_token(monkeypatch):
+    """keeps tests off the OAuth flow"""
+    monkeypatch.setattr(TokenProvider, "get_token", lambda self: "test-token")
+
+
+@pytest.fixture(autouse=True)
+def no_response_cache(monkeypatch):
+    """keeps mocked responses from leaking between tests through the cache"""
+    from api.transport import TRANSPORT
+
+    monkeypatch.setattr(TRANSPORT, "cache", None)
@@ -0,0 +1,66 @@
+import json
+import os
+import socket
+
+SOCKET_PATH = os.getenv(
+    "SPOTICLI_SOCKET",
+    os.path.join(os.getenv("XDG_RUNTIME_DIR", "/tmp"), f"spoticli-{os.getuid()}.sock"),
+)
+# commands the daemon answers; anything interactive (pick menus) runs locally
+REMOTE_COMMANDS = ("next", "pause", "current", "status", "stats", "stop")
+TIMEOUT = 10
+
+
+def call(command, args=(), path=SOCKET_PATH, timeout=TIMEOUT) -> dict:
+    """sends one command to the daemon
+
+    Args:
+        command (str): command name
+        args (list, optional): command arguments. Defaults to ().
+        path (str, optional): daemon socket. Defaults to SOCKET_PATH.
+        timeout (float, optional): seconds to wait for the reply.
+
+    Returns:
+        dict: the daemon's reply, or None when no daemon is listening. Once
+            the command has been sent, a failure is an error reply rather
+            than None: the daemon may already be running it, so falling back
+            to direct mode could run it twice.
+    """
+    if not os.path.exists(path):
+        return None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(path)
+            sock.sendall(json.dumps({"command": command, "args": list(args)}).encode())
+            sock.sendall(b"\n")
+        except OSError:
+            return None
+        try:
+            with sock.makefile("rb") as reply:
+                return json.loads(reply.readline())
+        except (OSError, ValueError) as e:
+            error = "timed out" if isinstance(e, socket.timeout) else str(e)
+            return {"ok": False, "output": "", "error": f"daemon: {error}"}
+
+
+def run_remote(argv, path=SOCKET_PATH) -> bool:
+    """runs a CLI command through the daemon if one is running
+
+    Args:
+        argv (list): command line arguments, without the program name
+        path (str, optional): daemon socket. Defaults to SOCKET_PATH.
+
+    Returns:
+        bool: True if the daemon handled it, False to fall back to direct mode
+    """
+    if not argv or argv[0] not in REMOTE_COMMANDS:
+        return False
+    reply = call(argv[0], argv[1:], path=path)
+    if reply is None:
+        return False
+
+    print(reply.get("output", ""), end="")
+    if not reply["ok"]:
+        print(reply["error"])
+    return True
@@ -0,0 +1,129 @@
+import io
+import json
+import os
+import socketserver
+import threading
+import time
+from contextlib import redirect_stdout
+
+from api.memo import MEMO
+from daemon.client import SOCKET_PATH, call
+from next_track.next_track import CLISpotify
+from playlists.playlists import Playlist
+
+PLAYER_FRESH = 1.0  # seconds the last-known player state answers `current`
+
+
+class Daemon:
+    """Long-running process holding the token, connection pool and caches
+
+    Commands run one at a time; their printed output is captured and sent
+    back to the thin client.
+    """
+
+    def __init__(self, session=None, pl=None):
+        self.session = session or CLISpotify()
+        self.pl = pl or Playlist()
+        self.player = None
+        self.player_at = 0.0
+        self._lock = threading.Lock()
+        self.commands = {
+            "next": self.next_track,
+            "pause": self.pause,
+            "current": self.current,
+            "status": self.status,
+            "stats": self.stats,
+            "ping": lambda: "pong",
+        }
+
+    def _forget_player(self):
+        self.player = None
+
+    def next_track(self):
+        self._forget_player()
+        return self.session.next_track()
+
+    def pause(self):
+        self._forget_player()
+        return self.session.pause_track()
+
+    def current(self):
+        if self.player is None or time.monotonic() - self.player_at > PLAYER_FRESH:
+            self.player = self.pl.get_current_track()
+            self.player_at = time.monotonic()
+        print(self.player)
+        return self.player
+
+    def status(self):
+        return self.session.status()
+
+    def stats(self):
+        stats = self.session.transport.stats()
+        print(json.dumps(stats, indent=2))
+        return stats
+
+    def run(self, command, args=()) -> dict:
+        """runs one command and captures what it prints
+
+        Returns:
+            dict: ok, captured output and result, or the error
+        """
+        handler = self.commands.get(command)
+        if handler is None:
+            return {"ok": False, "output": "", "error": f"unknown command {command}"}
+
+        output = io.StringIO()
+        with self._lock, MEMO.scope(), redirect_stdout(output):
+            try:
+                result = handler(*args)
+            except Exception as e:
+                return {"ok": False, "output": output.getvalue(), "error": repr(e)}
+        return {"ok": True, "output": output.getvalue(), "result": result}
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            request = json.loads(line)
+            if request["command"] == "stop":
+                # shutdown() blocks until serve_forever returns, so not here
+                threading.Thread(target=self.server.shutdown).start()
+                reply = {"ok": True, "output": "stopping\n"}
+            else:
+                reply = self.server.daemon.run(
+                    request["command"], request.get("args", [])
+                )
+            self.wfile.write(json.dumps(reply, default=str).encode() + b"\n")
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, daemon, path=SOCKET_PATH):
+        if os.path.exists(path):
+            if call("ping", path=path, timeout=1) is not None:
+                raise RuntimeError(f"a daemon is already listening on {path}")
+            os.unlink(path)  # left behind by a daemon that died
+
+        old_umask = os.umask(0o177)  # only the owner may drive the account
+        try:
+            super().__init__(path, Handler)
+        finally:
+            os.umask(old_umask)
+        self.daemon = daemon
+        self.path = path
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def serve(path=SOCKET_PATH):
+    """runs the daemon in the foreground until interrupted"""
+    with Server(Daemon(), path=path) as server:
+        print(f"listening on {path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,80 @@
+import socket
+import threading
+
+import pytest
+import responses
+
+from daemon.client import call, run_remote
+from daemon.server import Daemon, Server
+
+STATUS = {
+    "is_playing": True,
+    "item": {"name": "Gary", "artists": [{"name": "George"}], "uri": "spotify:track:1"},
+    "device": {"name": "device"},
+}
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    path = str(tmp_path / "spoticli.sock")
+    server = Server(Daemon(), path=path)
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+
+
+class TestDaemon:
+    @responses.activate
+    def test_status_over_socket(self, socket_path):
+        responses.get("https://api.spotify.com/v1/me/player", json=STATUS)
+
+        reply = call("status", path=socket_path)
+
+        assert reply["ok"]
+        assert reply["result"] == ["George", "Gary", "spotify:track:1"]
+        assert reply["output"].startswith("Now Playing: Gary by George")
+
+    @responses.activate
+    def test_current_reuses_player_state(self, socket_path):
+        responses.get("https://api.spotify.com/v1/me/player", json=STATUS)
+
+        call("current", path=socket_path)
+        reply = call("current", path=socket_path)
+
+        assert reply["result"] == "spotify:track:1"
+        assert len(responses.calls) == 1
+
+    def test_unknown_command(self, socket_path):
+        assert not call("dance", path=socket_path)["ok"]
+
+    def test_refuses_second_daemon(self, socket_path):
+        with pytest.raises(RuntimeError):
+            Server(Daemon(), path=socket_path)
+
+    def test_run_remote(self, socket_path, capsys):
+        assert not run_remote(["play"], path=socket_path)
+        assert run_remote(["stats"], path=socket_path)
+        assert '"requests"' in capsys.readouterr().out
+
+    def test_falls_back_without_daemon(self, tmp_path):
+        assert call("status", path=str(tmp_path / "missing.sock")) is None
+        assert not run_remote(["next"], path=str(tmp_path / "missing.sock"))
+
+    def test_falls_back_on_stale_socket(self, tmp_path):
+        path = str(tmp_path / "stale.sock")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(path)  # the file exists but nothing accepts
+        assert call("status", path=path) is None
+
+    def test_timeout_after_sending_is_an_error(self, tmp_path):
+        path = str(tmp_path / "slow.sock")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(path)
+            server.listen()
+            reply = call("next", path=path, timeout=0.1)
+
+        assert reply == {"ok": False, "output": "", "error": "daemon: timed out"}
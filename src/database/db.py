@@ -1,5 +1,135 @@
+import csv
 import sqlite3
-from next_track import next_track
+import time
+
+from api.tracing import TRACER
+
+FETCH_SIZE = 1000  # rows pulled per round when streaming large reads
+BATCH_SIZE = 5000  # rows per buffered insert transaction
+FLUSH_INTERVAL = 2.0  # seconds a buffered row may wait before being written
+HISTORY_COLUMNS = ("artist", "track", "track_uri")
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",  # readers don't block the writer
+    "PRAGMA synchronous = NORMAL",  # safe with WAL, far fewer fsyncs
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -8000",  # 8MB page cache
+)
+
+# each entry upgrades the schema by one version, tracked in PRAGMA user_version
+MIGRATIONS = (
+    # 1: the original untyped listening history table
+    ("CREATE TABLE IF NOT EXISTS spotify (artist, track, track_uri)",),
+    # 2: typed columns, a primary key and a timestamp (unknown for older rows)
+    (
+        """CREATE TABLE spotify_v2 (
+            id INTEGER PRIMARY KEY,
+            artist TEXT NOT NULL,
+            track TEXT NOT NULL,
+            track_uri TEXT NOT NULL,
+            played_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ', 'now'))
+        )""",
+        """INSERT INTO spotify_v2 (id, artist, track, track_uri, played_at)
+            SELECT rowid, artist, track, track_uri, NULL FROM spotify""",
+        "DROP TABLE spotify",
+        "ALTER TABLE spotify_v2 RENAME TO spotify",
+    ),
+    # 3: indexes for history lookups
+    (
+        "CREATE INDEX IF NOT EXISTS spotify_track_uri ON spotify (track_uri)",
+        "CREATE INDEX IF NOT EXISTS spotify_artist ON spotify (artist)",
+        "CREATE INDEX IF NOT EXISTS spotify_played_at ON spotify (played_at)",
+    ),
+)
+
+
+def quote(identifier: str) -> str:
+    """quotes a table or column name so it can be used safely in SQL
+
+    Identifiers can't be bound as query parameters, so they are quoted
+    instead of being formatted into the statement as-is.
+    """
+    if identifier == "*":
+        return identifier
+    return '"' + identifier.strip().strip('"').replace('"', '""') + '"'
+
+
+def column_names(columns) -> list:
+    """column names from "a, b" or ["a", "b"]"""
+    if isinstance(columns, str):
+        columns = columns.split(",")
+    return [c.strip() for c in columns]
+
+
+def column_list(columns) -> str:
+    """quoted, comma separated column list from "a, b" or ["a", "b"]"""
+    return ", ".join(quote(c) for c in column_names(columns))
+
+
+class BufferedWriter:
+    """Collects rows and inserts them in batches
+
+    Rows are written with executemany inside one transaction per batch,
+    either when `batch_size` rows are waiting or when the oldest one has
+    waited `interval` seconds. Use Database.writer to create one.
+    """
+
+    def __init__(self, db, table, columns, batch_size, interval):
+        self.db = db
+        self.sql = (
+            f"INSERT INTO {quote(table)} ({column_list(columns)}) VALUES"
+            f" ({', '.join('?' * len(columns))})"
+        )
+        self.batch_size = batch_size
+        self.interval = interval
+        self.rows = []
+        self.written = 0
+        self.elapsed = 0.0
+        self._oldest = None
+
+    def write(self, row):
+        if not self.rows:
+            self._oldest = time.monotonic()
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size or self.due:
+            self.flush()
+
+    @property
+    def due(self) -> bool:
+        """whether the oldest buffered row has waited `interval` seconds"""
+        return bool(self.rows) and time.monotonic() - self._oldest >= self.interval
+
+    def writemany(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def flush(self) -> int:
+        """writes out whatever is buffered
+
+        Returns:
+            int: number of rows written
+        """
+        if not self.rows:
+            return 0
+        start = time.perf_counter()
+        with TRACER.span("db.flush", rows=len(self.rows)), self.db.conn:
+            self.db.cursor.executemany(self.sql, self.rows)
+        self.elapsed += time.perf_counter() - start
+
+        count = len(self.rows)
+        self.written += count
+        self.rows = []
+        return count
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.written / self.elapsed if self.elapsed else 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
 
 
 class Database:
@@ -14,6 +144,8 @@ class Database:
         try:
             self.conn = sqlite3.connect(name)
             self.cursor = self.conn.cursor()
+            for pragma in PRAGMAS:
+                self.cursor.execute(pragma)
 
         except sqlite3.Error as e:
             print("Error connecting to database!")
@@ -24,6 +156,28 @@ class Database:
             self.cursor.close()
             self.conn.close()
 
+    @property
+    def version(self) -> int:
+        return self.cursor.execute("PRAGMA user_version").fetchone()[0]
+
+    def migrate(self) -> int:
+        """brings the schema up to date, one version per transaction
+
+        Returns:
+            int: the schema version after migrating
+        """
+        self.conn.commit()
+        for version in range(self.version, len(MIGRATIONS)):
+            statements = MIGRATIONS[version] + (f"PRAGMA user_version = {version + 1}",)
+            try:
+                self.cursor.executescript(
+                    "BEGIN;\n" + ";\n".join(statements) + ";\nCOMMIT;"
+                )
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
+        return self.version
+
     def __enter__(self):
         return self
 
@@ -31,27 +185,122 @@ class Database:
         self.close()
 
     def get(self, table, columns, limit=None):
-        query = "SELECT {0} from {1};".format(columns, table)
-        self.cursor.execute(query)
+        """returns rows in insertion order; with a limit, only the last `limit`
+
+        The limit is applied by SQLite walking the rowid index backwards, so
+        reading the newest rows costs the same whatever the table size.
+        """
+        query = f"SELECT {column_list(columns)} FROM {quote(table)}"
+        if not limit:
+            return self.cursor.execute(query).fetchall()
+
+        rows = self.cursor.execute(
+            query + " ORDER BY rowid DESC LIMIT ?", (limit,)
+        ).fetchall()
+        rows.reverse()
+        return rows
+
+    def chunks(self, table, columns, size=FETCH_SIZE, where=None, params=()):
+        """streams the rows of a table in insertion order, `size` at a time
+
+        Rows are fetched on a dedicated cursor, so memory stays bounded and
+        other queries can run while iterating.
 
-        # fetch data
-        rows = self.cursor.fetchall()
+        Args:
+            table (str): table name
+            columns (str|list): columns to select
+            size (int, optional): rows per chunk. Defaults to FETCH_SIZE.
+            where (str, optional): SQL condition, e.g. "played_at >= ?"
+            params (tuple, optional): parameters bound to `where`
 
-        return rows[len(rows) - limit if limit else 0 :]
+        Yields:
+            list: up to `size` rows
+        """
+        query = f"SELECT {column_list(columns)} FROM {quote(table)}"
+        if where:
+            query += f" WHERE {where}"
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(query + " ORDER BY rowid", params)
+            while True:
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            cursor.close()
+
+    def iterate(self, table, columns, size=FETCH_SIZE, where=None, params=()):
+        """streams every row of a table in insertion order, see chunks"""
+        for rows in self.chunks(table, columns, size, where, params):
+            yield from rows
+
+    def columns(self, table) -> list:
+        """column names of a table, in order"""
+        return [
+            row[1] for row in self.cursor.execute(f"PRAGMA table_info({quote(table)})")
+        ]
+
+    def column_types(self, table) -> dict:
+        """declared type of each column of a table, "" when untyped"""
+        return {
+            row[1]: row[2].upper()
+            for row in self.cursor.execute(f"PRAGMA table_info({quote(table)})")
+        }
 
     def execute(self, sql, params=None or ()):
-        return self.cursor.execute(sql, params)
+        with TRACER.span("db.execute", statement=sql):
+            return self.cursor.execute(sql, params)
+
+    def executemany(self, sql, rows):
+        with TRACER.span("db.executemany", statement=sql) as span:
+            cursor = self.cursor.executemany(sql, rows)
+            span["rows"] = cursor.rowcount
+            return cursor
+
+    def commit(self):
+        self.conn.commit()
+
+    def write(self, table, data, columns=HISTORY_COLUMNS):
+        with TRACER.span("db.write", table=table):
+            return self.cursor.execute(
+                f"INSERT INTO {quote(table)} ({column_list(columns)}) VALUES"
+                f" ({', '.join('?' * len(columns))})",
+                data,
+            )
+
+    def writer(
+        self,
+        table,
+        columns=HISTORY_COLUMNS,
+        batch_size=BATCH_SIZE,
+        interval=FLUSH_INTERVAL,
+    ) -> BufferedWriter:
+        """buffered writer for bulk inserts into `table`
+
+        Example:
+            with db.writer("spotify") as w:
+                w.writemany(rows)
+            print(f"{w.rows_per_second:.0f} rows/s")
+        """
+        return BufferedWriter(self, table, columns, batch_size, interval)
 
-    def write(self, table, data):
-        return self.cursor.execute(f"INSERT INTO {table} VALUES(?, ?, ?)", data)
+    def exists(self, table, column, value) -> bool:
+        """whether any row has `value` in `column`, e.g. a saved track_uri"""
+        row = self.cursor.execute(
+            f"SELECT 1 FROM {quote(table)} WHERE {quote(column)} = ? LIMIT 1",
+            (value,),
+        ).fetchone()
+        return row is not None
 
     def getLast(self, table, columns):
         return self.get(table, columns, limit=1)[0]
 
     @staticmethod
     def toCSV(data, fname="output.csv"):
-        with open(fname, "a") as file:
-            file.write(",".join([str(j) for i in data for j in i]))
+        with open(fname, "a", newline="") as file:
+            csv.writer(file).writerows(data)
 
 
 # table = "spotify"
@@ -0,0 +1,102 @@
+import csv
+import json
+
+from database.db import FETCH_SIZE, column_names
+
+FORMATS = ("csv", "ndjson", "parquet")
+
+
+def write_csv(file, header, chunks):
+    writer = csv.writer(file)
+    writer.writerow(header)
+    for rows in chunks:
+        writer.writerows(rows)
+
+
+def write_ndjson(file, header, chunks):
+    for rows in chunks:
+        file.writelines(
+            json.dumps(dict(zip(header, row)), ensure_ascii=False) + "\n"
+            for row in rows
+        )
+
+
+def arrow_type(pa, declared: str):
+    """arrow type for a declared SQLite column type, by SQLite's affinity rules"""
+    if "INT" in declared:
+        return pa.int64()
+    if any(name in declared for name in ("REAL", "FLOA", "DOUB")):
+        return pa.float64()
+    if "BLOB" in declared:
+        return pa.binary()
+    return pa.string()
+
+
+def write_parquet(fname, header, chunks, types=None):
+    """writes one parquet row group per chunk (needs pyarrow)
+
+    The schema comes from the declared column types rather than the first
+    chunk, which may hold only NULLs for a column (e.g. played_at of rows
+    from before it was recorded).
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("parquet export needs pyarrow: pip install pyarrow")
+
+    types = types or {}
+    schema = pa.schema([(name, arrow_type(pa, types.get(name, ""))) for name in header])
+    with pq.ParquetWriter(fname, schema, compression="zstd") as writer:
+        for rows in chunks:
+            writer.write_table(
+                pa.Table.from_arrays(
+                    [
+                        pa.array(list(column), type=field.type)
+                        for column, field in zip(zip(*rows), schema)
+                    ],
+                    schema=schema,
+                )
+            )
+
+
+def export(
+    db, fname, fmt="csv", table="spotify", columns="*", since=None, size=FETCH_SIZE
+) -> int:
+    """streams a table to a file, `size` rows at a time
+
+    Args:
+        db (Database): open database
+        fname (str): output file
+        fmt (str, optional): csv, ndjson or parquet. Defaults to "csv".
+        table (str, optional): table to export. Defaults to "spotify".
+        columns (str|list, optional): columns to export. Defaults to all.
+        since (str, optional): only rows played at or after this ISO date
+        size (int, optional): rows held in memory at once. Defaults to FETCH_SIZE.
+
+    Returns:
+        int: number of rows exported
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format {fmt!r}, expected one of {FORMATS}")
+
+    header = db.columns(table) if columns == "*" else column_names(columns)
+    where, params = (None, ())
+    if since:
+        where, params = ("played_at >= ?", (since,))
+
+    exported = 0
+
+    def counted(chunks):
+        nonlocal exported
+        for rows in chunks:
+            exported += len(rows)
+            yield rows
+
+    chunks = counted(db.chunks(table, header, size, where, params))
+    if fmt == "parquet":
+        write_parquet(fname, header, chunks, db.column_types(table))
+    else:
+        with open(fname, "w", newline="", encoding="utf-8") as file:
+            (write_csv if fmt == "csv" else write_ndjson)(file, header, chunks)
+    return exported
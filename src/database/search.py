@@ -0,0 +1,249 @@
+import re
+import sqlite3
+from collections import namedtuple
+
+SEARCH_LIMIT = 10
+CANDIDATES = 200  # closest fuzzy matches that are scored
+FUZZY_MIN = 0.3  # trigram similarity a fuzzy match needs
+KINDS = ("playlist", "album", "artist", "track")
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS library (
+        id INTEGER PRIMARY KEY,
+        uri TEXT UNIQUE NOT NULL,
+        kind TEXT NOT NULL,
+        name TEXT NOT NULL,
+        artist TEXT NOT NULL DEFAULT '',
+        plays INTEGER NOT NULL DEFAULT 0
+    )""",
+    # word index with prefix indexes, for matching as you type
+    """CREATE VIRTUAL TABLE IF NOT EXISTS library_words USING fts5(
+        name, artist, content='library', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS library_insert AFTER INSERT ON library BEGIN
+        INSERT INTO library_words (rowid, name, artist)
+            VALUES (new.id, new.name, new.artist);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS library_delete AFTER DELETE ON library BEGIN
+        INSERT INTO library_words (library_words, rowid, name, artist)
+            VALUES ('delete', old.id, old.name, old.artist);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS library_update
+        AFTER UPDATE OF name, artist ON library BEGIN
+        INSERT INTO library_words (library_words, rowid, name, artist)
+            VALUES ('delete', old.id, old.name, old.artist);
+        INSERT INTO library_words (rowid, name, artist)
+            VALUES (new.id, new.name, new.artist);
+    END""",
+)
+# trigram index for typo tolerant matching; needs SQLite 3.34+
+FUZZY_SCHEMA = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS library_trigrams USING fts5(
+        name, artist, content='library', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS library_trigrams_insert AFTER INSERT ON library
+    BEGIN
+        INSERT INTO library_trigrams (rowid, name, artist)
+            VALUES (new.id, new.name, new.artist);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS library_trigrams_delete AFTER DELETE ON library
+    BEGIN
+        INSERT INTO library_trigrams (library_trigrams, rowid, name, artist)
+            VALUES ('delete', old.id, old.name, old.artist);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS library_trigrams_update
+        AFTER UPDATE OF name, artist ON library BEGIN
+        INSERT INTO library_trigrams (library_trigrams, rowid, name, artist)
+            VALUES ('delete', old.id, old.name, old.artist);
+        INSERT INTO library_trigrams (rowid, name, artist)
+            VALUES (new.id, new.name, new.artist);
+    END""",
+)
+
+WORDS = re.compile(r"\w+")
+
+Match = namedtuple("Match", "kind uri name artist plays")
+
+
+def trigrams(text: str) -> set:
+    text = " ".join(WORDS.findall(text.casefold()))
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def similarity(a: str, b: str) -> float:
+    """trigram overlap of two strings, from 0 to 1"""
+    a, b = trigrams(a), trigrams(b)
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def quote_terms(terms) -> list:
+    return ['"' + term.replace('"', '""') + '"' for term in terms]
+
+
+class SearchIndex:
+    """Local full-text index of playlists, albums, artists and tracks
+
+    Items come from the playlist mirror, the listening history and network
+    searches that were played. Lookups match word prefixes as you type,
+    fall back to trigram matching for typos, and rank by play count.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        for statement in SCHEMA:
+            self.db.execute(statement)
+        try:
+            for statement in FUZZY_SCHEMA:
+                self.db.execute(statement)
+            self.fuzzy = True
+        except sqlite3.OperationalError:  # no trigram tokenizer
+            self.fuzzy = False
+
+    def add(self, kind: str, uri: str, name: str, artist: str = "", plays: int = 0):
+        """adds or renames an item, keeping its play count"""
+        self.db.execute(
+            """INSERT INTO library (uri, kind, name, artist, plays)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (uri) DO UPDATE SET
+                name = excluded.name,
+                artist = excluded.artist,
+                plays = max(plays, excluded.plays)""",
+            (uri, kind, name, artist or "", plays),
+        )
+
+    def played(self, uri: str):
+        self.db.execute("UPDATE library SET plays = plays + 1 WHERE uri = ?", (uri,))
+
+    def rebuild(self) -> int:
+        """indexes the mirror's playlists, tracks, albums and artists and the history
+
+        Albums and artists count the plays of their tracks in the history.
+        Playlists no longer in the mirror, and tracks in neither the mirror
+        nor the history, are dropped; the rows that stay keep their plays.
+
+        Returns:
+            int: number of items in the index
+        """
+        tables = {
+            row[0]
+            for row in self.db.execute("SELECT name FROM sqlite_master")
+            if row[0] in ("playlists", "playlist_tracks", "spotify")
+        }
+        if "playlists" in tables:
+            self.db.execute("""DELETE FROM library WHERE kind = 'playlist'
+                AND uri NOT IN (SELECT 'spotify:playlist:' || id FROM playlists)""")
+        sources = [
+            select
+            for table, select in (
+                ("playlist_tracks", "SELECT uri FROM playlist_tracks"),
+                ("spotify", "SELECT track_uri FROM spotify"),
+            )
+            if table in tables
+        ]
+        if sources:
+            self.db.execute(f"""DELETE FROM library WHERE kind = 'track'
+                AND uri NOT IN ({" UNION ".join(sources)})""")
+        if "playlists" in tables:
+            self.db.execute("""INSERT INTO library (uri, kind, name)
+                SELECT 'spotify:playlist:' || id, 'playlist', name FROM playlists
+                WHERE name IS NOT NULL
+                ON CONFLICT (uri) DO UPDATE SET name = excluded.name""")
+        if "playlist_tracks" in tables:
+            self.db.execute("""INSERT INTO library (uri, kind, name, artist)
+                SELECT uri, 'track', name, artist FROM playlist_tracks
+                WHERE uri LIKE 'spotify:track:%' GROUP BY uri
+                ON CONFLICT (uri) DO NOTHING""")
+            history = "spotify" in tables
+            # tracks count once per album, however many playlists hold them
+            track_plays = (
+                "(SELECT count(*) FROM spotify WHERE track_uri = t.uri)"
+                if history
+                else "0"
+            )
+            self.db.execute(f"""INSERT INTO library (uri, kind, name, artist, plays)
+                SELECT album_uri, 'album', album, lead_artist, sum(plays) FROM (
+                    SELECT album_uri, album, lead_artist, {track_plays} AS plays
+                    FROM playlist_tracks AS t
+                    WHERE album_uri LIKE 'spotify:album:%' GROUP BY album_uri, uri
+                ) GROUP BY album_uri
+                ON CONFLICT (uri) DO UPDATE SET
+                    name = excluded.name,
+                    artist = excluded.artist,
+                    plays = max(plays, excluded.plays)""")
+            # the history stores the lead artist's name, as the mirror does
+            artist_plays = (
+                "(SELECT count(*) FROM spotify WHERE artist = t.lead_artist)"
+                if history
+                else "0"
+            )
+            self.db.execute(f"""INSERT INTO library (uri, kind, name, plays)
+                SELECT lead_artist_uri, 'artist', lead_artist, {artist_plays}
+                FROM playlist_tracks AS t
+                WHERE lead_artist_uri LIKE 'spotify:artist:%' GROUP BY lead_artist_uri
+                ON CONFLICT (uri) DO UPDATE SET
+                    name = excluded.name,
+                    plays = max(plays, excluded.plays)""")
+        if "spotify" in tables:
+            self.db.execute("""INSERT INTO library (uri, kind, name, artist, plays)
+                SELECT track_uri, 'track', track, artist, count(*) FROM spotify
+                WHERE track_uri IS NOT NULL GROUP BY track_uri
+                ON CONFLICT (uri) DO UPDATE SET plays = excluded.plays""")
+        self.db.commit()
+        return self.db.execute("SELECT count(*) FROM library").fetchone()[0]
+
+    def search(self, text: str, kind: str = None, limit: int = SEARCH_LIMIT) -> list:
+        """finds items whose name or artist starts with the typed words
+
+        Typos are tolerated through trigram matching when no word matches.
+
+        Args:
+            text (str): what has been typed so far
+            kind (str, optional): playlist, album, artist or track only
+            limit (int, optional): most matches returned. Defaults to 10.
+
+        Returns:
+            list[Match]: best matches, most played first
+        """
+        words = WORDS.findall(text)
+        if not words:
+            return []
+        query = " ".join(term + "*" for term in quote_terms(words))
+        matches = self._matches(query, kind, limit)
+        if matches or not self.fuzzy:
+            return matches
+
+        grams = sorted(trigrams(text))
+        if not grams:
+            return []
+        candidates = self._fuzzy_matches(" OR ".join(quote_terms(grams)), kind)
+        scored = [
+            (similarity(text, f"{m.name} {m.artist}"), m)
+            for m in candidates
+            if max(similarity(text, m.name), similarity(text, m.artist)) >= FUZZY_MIN
+        ]
+        scored.sort(key=lambda s: (-round(s[0], 1), -s[1].plays))
+        return [m for _, m in scored[:limit]]
+
+    def _matches(self, query, kind, limit) -> list:
+        rows = self.db.execute(
+            """SELECT library.kind, library.uri, library.name, library.artist,
+                library.plays FROM library_words
+            JOIN library ON library.id = library_words.rowid
+            WHERE library_words MATCH ? AND (? IS NULL OR library.kind = ?)
+            ORDER BY library.plays DESC, library.name LIMIT ?""",
+            (query, kind, kind, limit),
+        )
+        return [Match(*row) for row in rows]
+
+    def _fuzzy_matches(self, query, kind) -> list:
+        # the trigrams shared with the query pick the candidates
+        rows = self.db.execute(
+            f"""SELECT library.kind, library.uri, library.name, library.artist,
+                library.plays FROM library_trigrams
+            JOIN library ON library.id = library_trigrams.rowid
+            WHERE library_trigrams MATCH ? AND (? IS NULL OR library.kind = ?)
+            ORDER BY rank LIMIT {CANDIDATES}""",
+            (query, kind, kind),
+        )
+        return [Match(*row) for row in rows]
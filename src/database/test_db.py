@@ -0,0 +1,102 @@
+import pytest
+
+from database.db import MIGRATIONS, Database, column_list, quote
+
+
+class TestDatabase:
+    @pytest.fixture
+    def db(self):
+        with Database(":memory:") as db:
+            db.execute("CREATE TABLE spotify (artist, track, track_uri)")
+            for n in range(5):
+                db.write(table="spotify", data=(f"artist{n}", f"track{n}", f"uri{n}"))
+            yield db
+
+    def test_quote(self):
+        assert quote("spotify") == '"spotify"'
+        assert quote('bad"; DROP TABLE x; --') == '"bad""; DROP TABLE x; --"'
+        assert column_list("track, artist") == '"track", "artist"'
+        assert column_list(["*"]) == "*"
+
+    def test_get(self, db):
+        assert len(db.get(table="spotify", columns="track")) == 5
+        assert db.get(table="spotify", columns="track", limit=2) == [
+            ("track3",),
+            ("track4",),
+        ]
+
+    def test_get_last(self, db):
+        assert db.getLast(table="spotify", columns="track, artist") == (
+            "track4",
+            "artist4",
+        )
+
+    def test_iterate(self, db):
+        rows = db.iterate(table="spotify", columns=["track"], size=2)
+        assert [r[0] for r in rows] == [f"track{n}" for n in range(5)]
+
+
+class TestMigrations:
+    def test_fresh_database(self, tmp_path):
+        with Database(str(tmp_path / "history.db")) as db:
+            assert db.migrate() == len(MIGRATIONS)
+            assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+            db.write(table="spotify", data=("artist", "track", "spotify:track:1"))
+            row = db.getLast(table="spotify", columns="track_uri, played_at")
+            assert row[0] == "spotify:track:1" and row[1] is not None
+            assert db.exists("spotify", "track_uri", "spotify:track:1")
+            assert not db.exists("spotify", "track_uri", "spotify:track:2")
+
+    def test_upgrades_legacy_table(self):
+        with Database(":memory:") as db:
+            db.execute("CREATE TABLE spotify (artist, track, track_uri)")
+            db.write(table="spotify", data=("a", "t", "spotify:track:1"))
+
+            db.migrate()
+
+            assert db.get(table="spotify", columns="id, track, played_at") == [
+                (1, "t", None)
+            ]
+            indexes = {
+                row[1] for row in db.execute("PRAGMA index_list(spotify)").fetchall()
+            }
+            assert {"spotify_track_uri", "spotify_artist"} <= indexes
+
+    def test_migrate_is_idempotent(self):
+        with Database(":memory:") as db:
+            db.migrate()
+            assert db.migrate() == len(MIGRATIONS)
+
+
+class TestBufferedWriter:
+    def test_flushes_in_batches(self):
+        with Database(":memory:") as db:
+            db.migrate()
+            with db.writer("spotify", batch_size=100, interval=60) as w:
+                for n in range(250):
+                    w.write(("artist", f"track{n}", f"spotify:track:{n}"))
+                assert w.written == 200
+                assert len(w.rows) == 50
+
+            assert w.written == 250
+            assert w.rows_per_second > 0
+            assert db.getLast(table="spotify", columns="track") == ("track249",)
+
+    def test_flushes_after_interval(self):
+        with Database(":memory:") as db:
+            db.migrate()
+            w = db.writer("spotify", batch_size=100, interval=0)
+            w.write(("artist", "track", "spotify:track:1"))
+            assert w.written == 1
+
+    def test_bulk_import_speed(self):
+        with Database(":memory:") as db:
+            db.migrate()
+            with db.writer("spotify") as w:
+                w.writemany(
+                    ("artist", f"track{n}", f"spotify:track:{n}")
+                    for n in range(100_000)
+                )
+            assert db.execute("SELECT count(*) FROM spotify").fetchone()[0] == 100_000
+            assert w.elapsed < 10
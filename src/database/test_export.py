@@ -0,0 +1,80 @@
+import csv
+import json
+
+import pytest
+
+from database.db import Database
+from database.export import export
+
+
+@pytest.fixture
+def db():
+    with Database(":memory:") as db:
+        db.migrate()
+        db.executemany(
+            "INSERT INTO spotify (artist, track, track_uri, played_at) VALUES (?, ?, ?, ?)",
+            [
+                (
+                    "Radiohead",
+                    "Airbag, live",
+                    "spotify:track:1",
+                    "2023-12-31T23:00:00Z",
+                ),
+                ("Björk", "Hyperballad", "spotify:track:2", "2024-01-02T10:00:00Z"),
+                ("Low", "Words", "spotify:track:3", "2024-02-01T10:00:00Z"),
+            ],
+        )
+        yield db
+
+
+class TestExport:
+    def test_csv(self, db, tmp_path):
+        fname = tmp_path / "history.csv"
+        assert export(db, fname, size=2) == 3
+
+        with open(fname, newline="") as file:
+            rows = list(csv.reader(file))
+        assert rows[0] == ["id", "artist", "track", "track_uri", "played_at"]
+        assert rows[1][2] == "Airbag, live"
+        assert len(rows) == 4
+
+    def test_ndjson_since(self, db, tmp_path):
+        fname = tmp_path / "history.ndjson"
+        assert export(db, fname, fmt="ndjson", since="2024-01-01") == 2
+
+        with open(fname, encoding="utf-8") as file:
+            rows = [json.loads(line) for line in file]
+        assert [r["artist"] for r in rows] == ["Björk", "Low"]
+
+    def test_unknown_format(self, db, tmp_path):
+        with pytest.raises(ValueError):
+            export(db, tmp_path / "history.xml", fmt="xml")
+
+    def test_parquet(self, db, tmp_path):
+        pq = pytest.importorskip("pyarrow.parquet")
+        fname = tmp_path / "history.parquet"
+        assert export(db, fname, fmt="parquet", size=2) == 3
+        assert pq.read_table(fname).num_rows == 3
+
+    def test_parquet_null_first_chunk(self, db, tmp_path):
+        pq = pytest.importorskip("pyarrow.parquet")
+        db.execute("UPDATE spotify SET played_at = NULL WHERE id < 3")
+        fname = tmp_path / "history.parquet"
+
+        assert export(db, fname, fmt="parquet", size=2) == 3
+        table = pq.read_table(fname)
+        assert str(table.schema.field("played_at").type) == "string"
+        assert str(table.schema.field("id").type) == "int64"
+
+    def test_column_string(self, db, tmp_path):
+        fname = tmp_path / "history.csv"
+        export(db, fname, columns="track, artist")
+
+        with open(fname, newline="") as file:
+            rows = list(csv.reader(file))
+        assert rows[:2] == [["track", "artist"], ["Airbag, live", "Radiohead"]]
+
+    def test_to_csv(self, tmp_path):
+        fname = tmp_path / "out.csv"
+        Database.toCSV([("a", "b"), ("c", "d")], fname=fname)
+        assert fname.read_text().splitlines() == ["a,b", "c,d"]
@@ -0,0 +1,175 @@
+import pytest
+import responses
+
+from database.db import Database
+from database.search import SearchIndex, similarity
+from next_track.next_track import CLISpotify
+from playlists.mirror import Mirror
+
+
+@pytest.fixture
+def index():
+    with Database(":memory:") as db:
+        db.migrate()
+        db.executemany(
+            "INSERT INTO spotify (artist, track, track_uri) VALUES (?, ?, ?)",
+            [
+                ("Radiohead", "Airbag", "spotify:track:1"),
+                ("Radiohead", "Airbag", "spotify:track:1"),
+                ("Björk", "Hyperballad", "spotify:track:2"),
+                ("Radiohead", "Airbag - Remastered", "spotify:track:3"),
+            ],
+        )
+        db.execute("CREATE TABLE playlists (id TEXT, name TEXT)")
+        db.execute("INSERT INTO playlists VALUES ('p1', 'Rainy Day')")
+        index = SearchIndex(db)
+        index.rebuild()
+        yield index
+
+
+class TestSearchIndex:
+    def test_rebuild(self, index):
+        assert index.rebuild() == 4
+
+    def test_prefix_ranked_by_plays(self, index):
+        matches = index.search("airb")
+        assert [(m.uri, m.plays) for m in matches] == [
+            ("spotify:track:1", 2),
+            ("spotify:track:3", 1),
+        ]
+
+    def test_diacritics_and_artist(self, index):
+        assert [m.name for m in index.search("bjork")] == ["Hyperballad"]
+        assert len(index.search("radio air")) == 2
+
+    def test_kind(self, index):
+        assert [m.uri for m in index.search("ra", kind="playlist")] == [
+            "spotify:playlist:p1"
+        ]
+
+    def test_fuzzy(self, index):
+        if not index.fuzzy:
+            pytest.skip("SQLite without the trigram tokenizer")
+        assert index.search("hyperbalad")[0].uri == "spotify:track:2"
+        assert index.search("qqqqq") == []
+
+    def test_rebuild_albums_and_artists(self, index):
+        Mirror(index.db, pl=None)
+        ok = ("OK Computer", "spotify:album:ok", "Radiohead", "spotify:artist:rh")
+        index.db.executemany(
+            """INSERT INTO playlist_tracks (playlist_id, position, uri, name, artist,
+                album, album_uri, lead_artist, lead_artist_uri)
+            VALUES ('p1', ?, ?, ?, ?, ?, ?, ?, ?)""",
+            [
+                (0, "spotify:track:1", "Airbag", "Radiohead", *ok),
+                (1, "spotify:track:4", "Lucky", "Radiohead", *ok),
+                (2, "spotify:track:1", "Airbag", "Radiohead", *ok),
+            ],
+        )
+
+        assert index.rebuild() == 7
+        assert index.search("ok comp", kind="album") == [
+            ("album", "spotify:album:ok", "OK Computer", "Radiohead", 2)
+        ]
+        assert index.search("radio", kind="artist") == [
+            ("artist", "spotify:artist:rh", "Radiohead", "", 3)
+        ]
+
+    def test_rebuild_drops_what_is_gone(self, index):
+        index.db.execute("DELETE FROM playlists")
+        index.db.execute("DELETE FROM spotify WHERE track_uri = 'spotify:track:3'")
+
+        assert index.rebuild() == 2
+        assert index.search("rainy") == []
+        assert [(m.uri, m.plays) for m in index.search("airbag")] == [
+            ("spotify:track:1", 2)
+        ]
+
+    def test_played_and_add(self, index):
+        index.add("album", "spotify:album:a", "Kid A", "Radiohead")
+        index.played("spotify:album:a")
+        index.add("album", "spotify:album:a", "Kid A", "Radiohead")
+        assert index.search("kid")[0].plays == 1
+
+    def test_quotes_are_escaped(self, index):
+        assert index.search('air"bag') == []
+
+    def test_similarity(self):
+        assert similarity("hyperballad", "hyperballad") == 1.0
+        assert similarity("abc", "xyz") == 0.0
+
+
+class TestLookup:
+    @responses.activate
+    def test_local_before_network(self, index):
+        session = CLISpotify(index=index)
+        assert session.item_lookup("track", "hyperballad") == "2"
+        assert len(responses.calls) == 0
+
+    @responses.activate
+    def test_local_match_must_be_exact(self, index):
+        index.add("artist", "spotify:artist:qotsa", "Queens of the Stone Age")
+        responses.get(
+            "https://api.spotify.com/v1/search",
+            json={
+                "artists": {
+                    "items": [{"id": "q", "uri": "spotify:artist:q", "name": "Queen"}]
+                }
+            },
+        )
+        session = CLISpotify(index=index)
+
+        assert session.item_lookup("artist", "Queen") == "q"
+        assert session.item_lookup("artist", "queen") == "q"
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_missing_database_uses_the_network(self, tmp_path):
+        responses.get(
+            "https://api.spotify.com/v1/search",
+            json={"artists": {"items": [{"id": "q", "name": "Queen"}]}},
+        )
+        for path in ("/nonexistent/x.db", str(tmp_path / "missing.db")):
+            assert CLISpotify(db_path=path).item_lookup("artist", "Queen") == "q"
+        (tmp_path / "empty.db").touch()
+        session = CLISpotify(db_path=str(tmp_path / "empty.db"))
+        assert session.item_lookup("artist", "Queen") == "q"
+        assert not (tmp_path / "missing.db").exists()
+
+    @responses.activate
+    def test_network_result_is_indexed(self, index):
+        responses.get(
+            "https://api.spotify.com/v1/search",
+            json={
+                "artists": {
+                    "items": [
+                        {"id": "x", "uri": "spotify:artist:x", "name": "Low Roar"},
+                        {"id": "y", "uri": "spotify:artist:y", "name": "Low"},
+                    ]
+                }
+            },
+        )
+        session = CLISpotify(index=index)
+
+        assert session.item_lookup("artist", "low") == "y"
+        assert session.item_lookup("artist", "low") == "y"
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_database_index_is_kept(self, tmp_path):
+        responses.get(
+            "https://api.spotify.com/v1/search",
+            json={
+                "albums": {
+                    "items": [{"id": "k", "uri": "spotify:album:k", "name": "Kid A"}]
+                }
+            },
+        )
+        responses.put("https://api.spotify.com/v1/me/player/shuffle")
+        path = str(tmp_path / "history.db")
+        with Database(path) as db:
+            SearchIndex(db)  # created by sync
+
+        assert CLISpotify(db_path=path).item_lookup("album", "kid a") == "k"
+        assert CLISpotify(db_path=path).item_lookup("album", "Kid A") == "k"
+        assert len(responses.calls) == 3
@@ -2,37 +2,36 @@ import json
 import os
 import sys
 import time
+from contextlib import contextmanager
 
-import requests
-from dotenv import load_dotenv
-from spotipy.oauth2 import SpotifyOAuth
+if __name__ == "__main__" and not __package__:
+    # run as `python next_track/next_track.py`: src/ holds the api package
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-load_dotenv()
+from api.shaping import player as player_state  # noqa: E402
+from api.transport import TRANSPORT  # noqa: E402
 
-BASE_URL = "https://api.spotify.com/v1"
-SCOPE = "user-read-playback-state,user-modify-playback-state"
-CREDS = SpotifyOAuth(
-    client_id=os.getenv("CLIENT_ID"),
-    client_secret=os.getenv("CLIENT_SECRET"),
-    redirect_uri=os.getenv("CALLBACK_URI"),
-    scope=SCOPE,
-)
-
-TOKEN = CREDS.get_access_token(as_dict=False)
-HEADERS = {
-    "Authorization": "Bearer " + TOKEN,
-    "Content-Type": "application/json",
-}
+WAIT_TIMEOUT = 5.0  # seconds to wait for playback to switch
+POLL_START = 0.05  # first poll interval, grown by POLL_GROWTH up to POLL_MAX
+POLL_GROWTH = 1.5
+POLL_MAX = 0.5
 
 
 class CLISpotify:
+    def __init__(self, transport=None, index=None, db_path=None):
+        self.transport = transport or TRANSPORT
+        # optional database.search.SearchIndex, consulted before the network.
+        # Without one, the index in the database at db_path is opened for
+        # each lookup, so next/pause/status never import sqlite
+        self.index = index
+        self.db_path = db_path
+
     def client(self, method, endpoint, params=None, json=None):
-        r = requests.request(
+        r = self.transport.request(
             method=method,
-            url=BASE_URL + endpoint,
+            endpoint=endpoint,
             params=params,
             json=json,
-            headers=HEADERS,
         )
         return r
 
@@ -51,17 +50,68 @@ class CLISpotify:
             return "paused"
         return "no session to pause"
 
+    @contextmanager
+    def search_index(self):
+        """the search index for one lookup, None when there is none
+
+        A database that can't be opened or was never indexed by `sync`
+        counts as no index, so lookups still go to the network search.
+        """
+        if self.index is not None or not self.db_path:
+            yield self.index
+            return
+        if not os.path.exists(self.db_path):
+            yield None
+            return
+
+        import sqlite3
+
+        from database.db import Database
+        from database.search import SearchIndex
+
+        with Database(self.db_path) as db:
+            try:
+                indexed = db.cursor is not None and bool(db.columns("library"))
+            except sqlite3.Error:
+                indexed = False
+            yield SearchIndex(db) if indexed else None
+
     def item_lookup(self, search_type: str, q: str):
-        search = self.client(
-            method="GET", endpoint="search", params={"q": q, "type": search_type}
-        )
         if search_type == "album":
             # I don't want shuffle on for albums, so this turns it off
             self.client(
                 method="PUT", endpoint="/me/player/shuffle", params={"state": False}
             )
-        # take the first one for now, iterate later
-        return search.json()[f"{search_type}s"]["items"][0]["id"]
+        with self.search_index() as index:
+            if index is not None:
+                # only an exact name is trusted; "Queen" mustn't play
+                # Queens of the Stone Age because it is the only prefix match
+                local = next(
+                    (
+                        m
+                        for m in index.search(q, kind=search_type)
+                        if m.name.casefold() == q.casefold()
+                    ),
+                    None,
+                )
+                if local:
+                    return local.uri.split(":")[-1]
+
+            search = self.client(
+                method="GET", endpoint="search", params={"q": q, "type": search_type}
+            )
+            items = search.json()[f"{search_type}s"]["items"]
+            # an exact name match beats whatever the API ranked first
+            item = next(
+                (i for i in items if (i.get("name") or "").casefold() == q.casefold()),
+                items[0],
+            )
+            if index is not None and item.get("uri"):
+                artists = item.get("artists") or [{}]
+                index.add(
+                    search_type, item["uri"], item["name"], artists[0].get("name", "")
+                )
+        return item["id"]
 
     def search_play(self, search_type: str, name: str):
         # Look up item
@@ -77,17 +127,45 @@ class CLISpotify:
 
     def status(self):
         r = self.client(method="GET", endpoint="/me/player")
-        if r.status_code == 200 and r.json()["is_playing"] is True:
-            item = r.json()["item"]
-            message = f"Now Playing: {item['name']} by {item['artists'][0]['name']} on {r.json()['device']['name']}" # noqa
+        player = player_state(r.json() if r.status_code == 200 else {})
+        if player.is_playing and player.track:
+            track = player.track
+            message = f"Now Playing: {track.name} by {track.artist} on {player.device}"  # noqa
             print(message)
-            return [item["artists"][0]["name"], item["name"], item["uri"]]
+            return [track.artist, track.name, track.uri]
 
         else:
             message = "Not playing anywhere"
             print(message)
             return message
 
+    def wait_for_playback(self, context_uri=None, track_uri=None, timeout=WAIT_TIMEOUT):
+        # Polls the player until the expected context or track is active,
+        # starting with short intervals that grow while nothing has changed.
+        # Returns the player state, or None if it didn't switch in time.
+        deadline = time.monotonic() + timeout
+        interval = POLL_START
+        while True:
+            r = self.transport.request(
+                method="GET",
+                endpoint="/me/player",
+                headers={"Cache-Control": "no-cache"},
+            )
+            if r.status_code == 200:
+                player = r.json()
+                context = (player.get("context") or {}).get("uri")
+                item = (player.get("item") or {}).get("uri")
+                if (context_uri is None or context == context_uri) and (
+                    track_uri is None or item == track_uri
+                ):
+                    return player
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            time.sleep(min(interval, remaining))
+            interval = min(interval * POLL_GROWTH, POLL_MAX)
+
     def help(self):
         print(
             """
@@ -102,7 +180,9 @@ or album name for the query
 
 
 if __name__ == "__main__":
-    session = CLISpotify()
+    from runner import default_session
+
+    session = default_session()
     if sys.argv[1] == "help" or sys.argv is None:
         session.help()
     elif sys.argv[1] == "next":
@@ -112,8 +192,12 @@ if __name__ == "__main__":
         print("pausing...")
         session.pause_track()
     elif sys.argv[1] == "play":
-        session.search_play(search_type=sys.argv[2], name=sys.argv[3])
-        time.sleep(1)  # avoids a race condition with the status call below
+        played = json.loads(
+            session.search_play(search_type=sys.argv[2], name=sys.argv[3])
+        )
+        session.wait_for_playback(
+            context_uri=f"spotify:{sys.argv[2]}:{played['item_id']}"
+        )
         session.status()
     elif sys.argv[1] == "status":
         session.status()
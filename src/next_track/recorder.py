@@ -0,0 +1,100 @@
+import threading
+import time
+
+import requests
+
+from database.db import HISTORY_COLUMNS
+from next_track.next_track import CLISpotify
+
+RECORD_COLUMNS = HISTORY_COLUMNS + ("played_at",)
+RECORD_BATCH = 20  # plays buffered before they are written
+RECORD_FLUSH = 300.0  # seconds a buffered play may wait before being written
+POLL_MIN = 2.0  # never poll faster than this while playing
+POLL_MAX = 30.0  # a skip is noticed within this many seconds
+TRACK_END_SLACK = 1.0  # poll just after the track should have ended
+IDLE_START = 15.0  # first poll interval while paused, doubled up to IDLE_MAX
+IDLE_MAX = 300.0
+RESTART_MS = 10_000  # a track that jumps back below this has been replayed
+
+
+class Recorder:
+    """Listening history recorder
+
+    Polls me/player and writes one row to the `spotify` table each time a new
+    track starts (or the same one is played again). While playing, the next
+    poll is timed for just after the current track should end, capped at
+    POLL_MAX so skips are still noticed; while paused or idle the interval
+    doubles up to IDLE_MAX. Rows go through a BufferedWriter, so hours of
+    listening cost a handful of transactions.
+    """
+
+    def __init__(
+        self, db, session=None, batch_size=RECORD_BATCH, flush_interval=RECORD_FLUSH
+    ):
+        self.session = session or CLISpotify()
+        self.writer = db.writer(
+            "spotify", RECORD_COLUMNS, batch_size=batch_size, interval=flush_interval
+        )
+        self.polls = 0
+        self.recorded = 0
+        self._uri = None
+        self._progress = 0
+        self._idle = 0
+
+    def player(self) -> dict:
+        """current player state, empty when nothing is active"""
+        r = self.session.transport.request(
+            method="GET", endpoint="me/player", headers={"Cache-Control": "no-cache"}
+        )
+        return r.json() if r.status_code == 200 else {}
+
+    def poll(self) -> float:
+        """checks the player once, recording a newly started track
+
+        Returns:
+            float: seconds to wait before the next poll
+        """
+        self.polls += 1
+        try:
+            player = self.player()
+        except requests.RequestException:
+            player = {}  # offline: back off like an idle player
+        item = player.get("item")
+        if not player.get("is_playing") or not item or not item.get("uri"):
+            self._idle += 1
+            return min(IDLE_START * 2 ** (self._idle - 1), IDLE_MAX)
+        self._idle = 0
+
+        progress = player.get("progress_ms") or 0
+        replayed = progress < self._progress and progress < RESTART_MS
+        if item["uri"] != self._uri or replayed:
+            self.record(item, progress)
+        self._uri, self._progress = item["uri"], progress
+
+        remaining = (item.get("duration_ms", 0) - progress) / 1000
+        return min(max(remaining + TRACK_END_SLACK, POLL_MIN), POLL_MAX)
+
+    def record(self, item: dict, progress: int):
+        started = time.time() - progress / 1000
+        played_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(started))
+        artist = item["artists"][0]["name"] if item.get("artists") else ""
+        self.writer.write((artist, item["name"], item["uri"], played_at))
+        self.recorded += 1
+
+    def run(self, stop=None, max_polls=None):
+        """records until `stop` is set or `max_polls` polls have been made
+
+        Args:
+            stop (threading.Event, optional): ends recording when set, e.g.
+                from a signal handler. Defaults to recording forever.
+            max_polls (int, optional): stop after this many polls.
+        """
+        stop = stop or threading.Event()
+        with self.writer:
+            while not stop.is_set():
+                interval = self.poll()
+                if self.writer.due:
+                    self.writer.flush()
+                if max_polls is not None and self.polls >= max_polls:
+                    break
+                stop.wait(interval)
@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+import responses
+
+from database.db import Database
+from next_track.recorder import IDLE_MAX, IDLE_START, POLL_MAX, POLL_MIN, Recorder
+
+PLAYER_URL = "https://api.spotify.com/v1/me/player"
+
+
+def playing(uri, progress, duration=180_000):
+    return {
+        "is_playing": True,
+        "progress_ms": progress,
+        "item": {
+            "uri": uri,
+            "name": uri[-1],
+            "duration_ms": duration,
+            "artists": [{"name": "Artist"}],
+        },
+    }
+
+
+class NoWait(threading.Event):
+    """a stop event whose waits return at once"""
+
+    def wait(self, timeout=None):
+        return self.is_set()
+
+
+@pytest.fixture
+def db():
+    with Database(":memory:") as db:
+        db.migrate()
+        yield db
+
+
+class TestRecorder:
+    @responses.activate
+    def test_records_only_changes(self, db):
+        for state in (
+            playing("spotify:track:a", 1_000),
+            playing("spotify:track:a", 60_000),
+            playing("spotify:track:b", 2_000),
+            playing("spotify:track:b", 3_000),
+            playing("spotify:track:b", 500),  # played again
+        ):
+            responses.get(PLAYER_URL, json=state)
+
+        recorder = Recorder(db, batch_size=10)
+        recorder.run(NoWait(), max_polls=5)
+
+        rows = db.execute("SELECT track_uri, played_at FROM spotify").fetchall()
+        assert [r[0] for r in rows] == [
+            "spotify:track:a",
+            "spotify:track:b",
+            "spotify:track:b",
+        ]
+        assert all(r[1].endswith("Z") for r in rows)
+        assert recorder.polls == 5
+
+    @responses.activate
+    def test_polls_at_track_end(self, db):
+        responses.get(PLAYER_URL, json=playing("spotify:track:a", 170_000))
+        responses.get(PLAYER_URL, json=playing("spotify:track:a", 179_500))
+        responses.get(PLAYER_URL, json=playing("spotify:track:b", 0))
+
+        recorder = Recorder(db)
+        assert recorder.poll() == pytest.approx(11.0)
+        assert recorder.poll() == POLL_MIN
+        assert recorder.poll() == POLL_MAX
+
+    @responses.activate
+    def test_backs_off_while_paused(self, db):
+        responses.get(PLAYER_URL, json={"is_playing": False})
+
+        recorder = Recorder(db)
+        intervals = [recorder.poll() for _ in range(8)]
+
+        assert intervals[:3] == [IDLE_START, IDLE_START * 2, IDLE_START * 4]
+        assert intervals[-1] == IDLE_MAX
+
+    @responses.activate
+    def test_batches_writes(self, db):
+        responses.get(PLAYER_URL, json=playing("spotify:track:a", 0))
+        responses.get(PLAYER_URL, json=playing("spotify:track:b", 0))
+
+        recorder = Recorder(db, batch_size=10)
+        recorder.poll()
+        recorder.poll()
+
+        assert db.execute("SELECT count(*) FROM spotify").fetchone() == (0,)
+        recorder.writer.flush()
+        assert db.execute("SELECT count(*) FROM spotify").fetchone() == (2,)
@@ -1,6 +1,9 @@
 from next_track import next_track
 import responses
 import json
+import subprocess
+import sys
+import time
 
 STATUS = {
     "is_playing": True,
@@ -34,7 +37,8 @@ class TestCLISpotify:
         responses.get("https://api.spotify.com/v1/me/player")
         responses.put("https://api.spotify.com/v1/me/player/play", status=200)
         responses.get(
-            "https://api.spotify.com/v1/search?q=radiohead&type=artist",
+            "https://api.spotify.com/v1/search"
+            "?q=radiohead&type=artist&market=from_token&limit=10",
             status=204,
             json={"artists": {"items": [{"id": 12345}]}},
         )
@@ -71,3 +75,41 @@ class TestCLISpotify:
         )
 
         assert session.pause_track() == "paused"
+
+    @responses.activate
+    def test_wait_for_playback(self):
+        session = next_track.CLISpotify()
+        old = dict(STATUS, context={"uri": "spotify:playlist:old"})
+        new = dict(STATUS, context={"uri": "spotify:playlist:new"})
+
+        responses.get("https://api.spotify.com/v1/me/player", status=204)
+        responses.get("https://api.spotify.com/v1/me/player", json=old)
+        responses.get("https://api.spotify.com/v1/me/player", json=new)
+
+        player = session.wait_for_playback(context_uri="spotify:playlist:new")
+
+        assert player["context"]["uri"] == "spotify:playlist:new"
+        assert len(responses.calls) == 3
+
+    @responses.activate
+    def test_wait_for_playback_times_out(self):
+        session = next_track.CLISpotify()
+
+        responses.get("https://api.spotify.com/v1/me/player", json=STATUS)
+
+        start = time.monotonic()
+        player = session.wait_for_playback(track_uri="spotify:track:x", timeout=0.2)
+        assert player is None
+        assert time.monotonic() - start < 1
+
+    def test_runs_as_a_script(self, tmp_path):
+        # python next_track/next_track.py works from anywhere, as before api/
+        done = subprocess.run(
+            [sys.executable, next_track.__file__, "help"],
+            capture_output=True,
+            text=True,
+            cwd=tmp_path,
+            timeout=60,
+        )
+        assert done.returncode == 0, done.stderr
+        assert "Options:" in done.stdout
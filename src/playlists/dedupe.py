@@ -0,0 +1,123 @@
+import re
+import unicodedata
+from collections import namedtuple
+
+DURATION_BUCKET = 3000  # ms; neighbouring buckets match too, so ~±3s tolerance
+FUZZY_FIELDS = "track(uri,name,duration_ms,external_ids(isrc),artists(name))"
+EXACT_FIELDS = "track(uri)"
+
+# suffixes that mark another release of the same recording, e.g.
+# "Song - Remastered 2011", "Song (Single Version)", "Song [feat. X]". Only
+# whole words count, and other versions such as "Live Version" or
+# "Acoustic Version" are different recordings
+VERSION = (
+    r"\b(?:remaster(?:ed)?|mono|stereo|single|(?:album|radio) version|feat\.?|ft\.?)"
+    r"(?!\w)"
+)
+BRACKETED = re.compile(r"[\(\[][^\)\]]*(" + VERSION + r")[^\)\]]*[\)\]]")
+DASHED = re.compile(r"\s-\s.*(" + VERSION + r").*$")
+FEATURING = re.compile(r"\s(feat\.?|ft\.?)\s.*$")
+PUNCTUATION = re.compile(r"[^\w\s]")
+SPACES = re.compile(r"\s+")
+
+Duplicate = namedtuple("Duplicate", "playlist_id position uri original")
+
+
+def normalize(text: str) -> str:
+    """folds case, accents, punctuation and whitespace"""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    text = PUNCTUATION.sub(" ", text.replace("&", " and "))
+    return SPACES.sub(" ", text).strip()
+
+
+def normalize_title(title: str) -> str:
+    """strips version markers so every release of a song gets the same title"""
+    title = (title or "").casefold()
+    title = BRACKETED.sub(" ", title)
+    title = DASHED.sub("", title)
+    title = FEATURING.sub("", title)
+    return normalize(title)
+
+
+def song_key(track: dict) -> tuple:
+    """(artist, title, duration bucket) of a track, None if it lacks any"""
+    artists = track.get("artists") or []
+    duration = track.get("duration_ms")
+    if not artists or not track.get("name") or duration is None:
+        return None
+    artist = normalize(artists[0].get("name"))
+    return (artist, normalize_title(track["name"]), duration // DURATION_BUCKET)
+
+
+class Deduper:
+    """Streaming duplicate finder
+
+    Tracks are fed one at a time; the first copy of a song is kept and every
+    later copy reports it. Matching goes through hash indexes on the uri and,
+    when fuzzy, on the ISRC and on a normalized (artist, title, duration
+    bucket) key, so a scan is O(n) and only the keys are kept in memory. The
+    same Deduper can be fed several playlists to dedupe across them.
+    """
+
+    def __init__(self, fuzzy=True):
+        self.fuzzy = fuzzy
+        self.uris = {}
+        self.isrcs = {}
+        self.songs = {}
+
+    def check(self, track: dict, playlist_id=None, position=None) -> tuple:
+        """indexes a track and finds the copy it duplicates
+
+        Args:
+            track (dict): track object with at least a uri
+            playlist_id (str, optional): playlist the track is in
+            position (int, optional): position of the track in the playlist
+
+        Returns:
+            tuple: (playlist_id, position, uri) of the kept copy, None if this
+                is the first copy
+        """
+        uri = track["uri"]
+        isrc = song = None
+        original = self.uris.get(uri)
+        if self.fuzzy:
+            isrc = (track.get("external_ids") or {}).get("isrc")
+            isrc = isrc.upper() if isrc else None
+            song = song_key(track)
+            if original is None and isrc:
+                original = self.isrcs.get(isrc)
+            if original is None and song:
+                artist, title, bucket = song
+                for near in (bucket, bucket - 1, bucket + 1):
+                    original = self.songs.get((artist, title, near))
+                    if original is not None:
+                        break
+
+        # index every key of a copy too, so a later release matching only
+        # one of them still finds the first copy
+        kept = original or (playlist_id, position, uri)
+        self.uris.setdefault(uri, kept)
+        if isrc:
+            self.isrcs.setdefault(isrc, kept)
+        if song:
+            self.songs.setdefault(song, kept)
+        return original
+
+    def scan(self, items, playlist_id=None):
+        """streams the duplicates out of a playlist's items
+
+        Args:
+            items (iterable): playlist track items in playlist order
+            playlist_id (str, optional): playlist the items belong to
+
+        Yields:
+            Duplicate: each extra copy with the copy that is kept
+        """
+        for position, item in enumerate(items):
+            track = item.get("track")
+            if not track or not track.get("uri"):
+                continue
+            original = self.check(track, playlist_id, position)
+            if original is not None:
+                yield Duplicate(playlist_id, position, track["uri"], original)
@@ -0,0 +1,215 @@
+from api.paging import paginate
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS playlists (
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        snapshot_id TEXT,
+        total INTEGER,
+        position INTEGER
+    )""",
+    """CREATE TABLE IF NOT EXISTS playlist_tracks (
+        playlist_id TEXT,
+        position INTEGER,
+        uri TEXT,
+        name TEXT,
+        artist TEXT,
+        album TEXT,
+        album_uri TEXT,
+        lead_artist TEXT,
+        lead_artist_uri TEXT,
+        PRIMARY KEY (playlist_id, position)
+    )""",
+    "CREATE INDEX IF NOT EXISTS playlist_tracks_uri ON playlist_tracks (uri)",
+)
+# columns added after the first release, for mirrors created before them
+ADDED_COLUMNS = ("album", "album_uri", "lead_artist", "lead_artist_uri")
+TRACK_FIELDS = "track(uri,name,artists(name,uri),album(name,uri))"
+
+
+def track_row(track: dict) -> tuple:
+    """the stored columns of a track, from uri to lead_artist_uri"""
+    artists = track.get("artists") or []
+    album = track.get("album") or {}
+    lead = artists[0] if artists else {}
+    return (
+        track["uri"],
+        track["name"],
+        ", ".join(a["name"] for a in artists),
+        album.get("name"),
+        album.get("uri"),
+        lead.get("name"),
+        lead.get("uri"),
+    )
+
+
+class Mirror:
+    """Local SQLite copy of the user's playlists and their tracks
+
+    Each playlist is stored with its snapshot_id; a sync only downloads the
+    tracks of playlists whose snapshot changed since the last one.
+    """
+
+    def __init__(self, db, pl, workers=None):
+        self.db = db
+        self.pl = pl
+        self.workers = workers
+        for statement in SCHEMA:
+            self.db.execute(statement)
+        self._add_columns()
+
+    def _add_columns(self):
+        existing = self.db.column_types("playlist_tracks")
+        missing = [c for c in ADDED_COLUMNS if c not in existing]
+        for column in missing:
+            self.db.execute(f"ALTER TABLE playlist_tracks ADD COLUMN {column} TEXT")
+        if missing:
+            # the stored tracks lack the new columns; the next sync downloads
+            # every playlist again to fill them
+            self.db.execute("UPDATE playlists SET snapshot_id = NULL")
+            self.db.commit()
+
+    def snapshot_id(self, playlist_id: str) -> str:
+        """snapshot_id of the mirrored copy, None if not mirrored"""
+        row = self.db.execute(
+            "SELECT snapshot_id FROM playlists WHERE id = ?", (playlist_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def sync(self) -> dict:
+        """refreshes the mirror with as few requests as possible
+
+        A failed read raises before anything is pruned, so an error from the
+        API never empties the mirror.
+
+        Returns:
+            dict: number of playlists seen, refreshed and removed
+        """
+        seen = []
+        refreshed = 0
+        for position, item in enumerate(paginate(self.pl.client, "me/playlists")):
+            seen.append(item["id"])
+            if self.snapshot_id(item["id"]) == item["snapshot_id"]:
+                self.db.execute(
+                    "UPDATE playlists SET name = ?, position = ? WHERE id = ?",
+                    (item["name"], position, item["id"]),
+                )
+                continue
+
+            self.sync_playlist(item["id"], item["snapshot_id"], name=item["name"])
+            self.db.execute(
+                "UPDATE playlists SET position = ?, total = ? WHERE id = ?",
+                (position, item["tracks"]["total"], item["id"]),
+            )
+            refreshed += 1
+
+        removed = self.prune(seen)
+        self.db.commit()
+        return {"playlists": len(seen), "refreshed": refreshed, "removed": removed}
+
+    def sync_playlist(self, playlist_id: str, snapshot_id: str, name=None):
+        """re-downloads one playlist's tracks and stores them with its snapshot
+
+        The whole playlist is downloaded before the stored copy is touched;
+        if a page fails, the old tracks and snapshot_id are kept.
+
+        Args:
+            playlist_id (str): spotify playlist id
+            snapshot_id (str): the snapshot being downloaded
+            name (str, optional): playlist name. Defaults to the stored one.
+        """
+        rows = [
+            (playlist_id, position, *track_row(item["track"]))
+            for position, item in enumerate(
+                self.pl.iter_tracks(playlist_id, TRACK_FIELDS, workers=self.workers)
+            )
+            if item.get("track")
+        ]
+
+        self.db.execute(
+            "DELETE FROM playlist_tracks WHERE playlist_id = ?", (playlist_id,)
+        )
+        self.db.executemany(
+            """INSERT INTO playlist_tracks (playlist_id, position, uri, name, artist,
+                album, album_uri, lead_artist, lead_artist_uri)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            rows,
+        )
+        self.db.execute(
+            """INSERT INTO playlists (id, name, snapshot_id) VALUES (?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET
+                name = coalesce(excluded.name, name),
+                snapshot_id = excluded.snapshot_id""",
+            (playlist_id, name, snapshot_id),
+        )
+        self.db.commit()
+
+    def prune(self, keep: list) -> int:
+        """drops playlists that are no longer in the library
+
+        Returns:
+            int: number of playlists removed
+        """
+        placeholders = ",".join("?" * len(keep))
+        gone = [
+            row[0]
+            for row in self.db.execute(
+                f"SELECT id FROM playlists WHERE id NOT IN ({placeholders})", keep
+            )
+        ]
+        for playlist_id in gone:
+            self.db.execute("DELETE FROM playlists WHERE id = ?", (playlist_id,))
+            self.db.execute(
+                "DELETE FROM playlist_tracks WHERE playlist_id = ?", (playlist_id,)
+            )
+        return len(gone)
+
+    def playlists(self) -> list:
+        """mirrored playlists in library order
+
+        Returns:
+            list[tuples]: List of playlists tuples (name, id), like
+                Playlist.get_my_playlists
+        """
+        return self.db.execute(
+            "SELECT name, id FROM playlists WHERE position IS NOT NULL ORDER BY position"
+        ).fetchall()
+
+    def tracks(self, playlist_id: str):
+        """streams the mirrored tracks of a playlist in order
+
+        Yields:
+            tuple: (position, uri, name, artist)
+        """
+        yield from self.db.execute(
+            """SELECT position, uri, name, artist FROM playlist_tracks
+            WHERE playlist_id = ? ORDER BY position""",
+            (playlist_id,),
+        )
+
+    def find_duplicate_positions(self, playlist_id: str) -> tuple:
+        """finds the extra copies of duplicated tracks from the mirror
+
+        One request checks the live snapshot_id; the playlist is re-synced
+        first only if it changed.
+
+        Args:
+            playlist_id (str): spotify playlist id
+
+        Returns:
+            tuple: snapshot_id the positions refer to, list of (uri, position)
+        """
+        snapshot_id = self.pl.get_snapshot_id(playlist_id)
+        if self.snapshot_id(playlist_id) != snapshot_id:
+            self.sync_playlist(playlist_id, snapshot_id)
+
+        extras = self.db.execute(
+            """SELECT uri, position FROM playlist_tracks AS t
+            WHERE playlist_id = ? AND position > (
+                SELECT min(position) FROM playlist_tracks
+                WHERE playlist_id = t.playlist_id AND uri = t.uri
+            )
+            ORDER BY position""",
+            (playlist_id,),
+        ).fetchall()
+        return snapshot_id, extras
@@ -1,40 +1,25 @@
 # import json
-import os
 import sys
-import time
 
 import requests
-from dotenv import load_dotenv
-from pick import pick
-from spotipy.oauth2 import SpotifyOAuth
 
-from database.db import Database
+from api.batch import chunked, delete_bodies, mutate
+from api.paging import paginate, paginate_parallel
+from api.shaping import PlaylistRef
+from api.transport import TRANSPORT
+from playlists.dedupe import EXACT_FIELDS, FUZZY_FIELDS, Deduper
 from next_track.next_track import CLISpotify
 from collections import Counter
 
-load_dotenv()
-
-BASE_URL = "https://api.spotify.com/v1/"
-SCOPE = "user-read-playback-state,user-modify-playback-state,playlist-read-private,playlist-modify-private"  # noqa
-CREDS = SpotifyOAuth(
-    client_id=os.getenv("CLIENT_ID"),
-    client_secret=os.getenv("CLIENT_SECRET"),
-    redirect_uri=os.getenv("CALLBACK_URI"),
-    scope=SCOPE,
-)
-
-TOKEN = CREDS.get_access_token(as_dict=False)
-HEADERS = {
-    "Authorization": "Bearer " + TOKEN,
-    "Content-Type": "application/json",
-}
-
 SESSION = CLISpotify()
 
 
 class Playlist:
     """Main playlist class"""
 
+    def __init__(self, transport=None):
+        self.transport = transport or TRANSPORT
+
     def client(
         self, method, endpoint, json=None, params=None
     ) -> requests.models.Response:
@@ -49,10 +34,9 @@ class Playlist:
         Returns:
             requests.models.Response: the response of the request
         """
-        r = requests.request(
+        r = self.transport.request(
             method=method,
-            url=BASE_URL + endpoint,
-            headers=HEADERS,
+            endpoint=endpoint,
             json=json,
             params=params,
         )
@@ -62,20 +46,54 @@ class Playlist:
         """gets playlists for the authenticated account
 
         Returns:
-            list[tuples]: List of playlists tuples (name, id)
+            list[PlaylistRef]: List of playlists tuples (name, id)
         """
         pl_list = []
-        playlists = self.client(method="GET", endpoint="me/playlists")
-        for item in playlists.json()["items"]:
-            pl_list.append((item["name"], item["id"]))
+        for item in paginate(self.client, "me/playlists", prefetch=True):
+            pl_list.append(PlaylistRef(item["name"], item["id"]))
 
         return pl_list
 
-    def play_playlist(self, playlist_id: str) -> dict:
+    def iter_tracks(
+        self, playlist_id: str, fields: str = None, prefetch=True, workers=None
+    ):
+        """streams the items of a playlist, page by page
+
+        Args:
+            playlist_id (str): spotify playlist id
+            fields (str, optional): field filter for each item. Defaults to None.
+            prefetch (bool, optional): fetch the next page in the background.
+            workers (int, optional): fetch pages concurrently with up to this
+                many requests in flight. Defaults to None (sequential).
+
+        Yields:
+            dict: playlist track items in playlist order
+        """
+        params = {}
+        if fields:
+            # limit is kept so parallel paging steps by the page size served
+            params["fields"] = f"next,total,limit,items({fields})"
+        if workers:
+            yield from paginate_parallel(
+                self.client,
+                f"playlists/{playlist_id}/tracks",
+                params=params,
+                workers=workers,
+            )
+            return
+        yield from paginate(
+            self.client,
+            f"playlists/{playlist_id}/tracks",
+            params=params,
+            prefetch=prefetch,
+        )
+
+    def play_playlist(self, playlist_id: str, shuffle=True) -> dict:
         """plays playlist by playlist_id
 
         Args:
             playlist_id (str): the spotify id of the playlist
+            shuffle (bool, optional): turn shuffle on afterwards. Defaults to True.
 
         Returns:
             dict: status - response code, context_uri of the playlist
@@ -87,7 +105,8 @@ class Playlist:
         print(r.text)
 
         # I just like to shuffle my playlists
-        self.shuffle(True)
+        if shuffle:
+            self.shuffle(True)
 
         return {"status": r.status_code, "context_uri": context_uri}
 
@@ -114,12 +133,29 @@ class Playlist:
             dict: status and snapshot_id
         """
         uri = self.get_current_track()
-        r = self.client(
-            method="POST",
-            endpoint=f"playlists/{playlist_id}/tracks",
-            json={"uris": [uri]},
-        )
-        return {"status": r.status_code, "snapshot_id": r.json()["snapshot_id"]}
+        r = self.add_tracks(playlist_id=playlist_id, uris=[uri])
+        return {"status": r["status"], "snapshot_id": r["snapshot_id"]}
+
+    def add_tracks(self, playlist_id: str, uris: list, position: int = None) -> dict:
+        """adds tracks to a playlist, 100 per request
+
+        Args:
+            playlist_id (str): the id of the playlist to add the tracks to
+            uris (list): spotify uris of the tracks, in the order to add them
+            position (int, optional): where to insert them. Defaults to the end.
+
+        Returns:
+            dict: status, final snapshot_id and number of requests made
+        """
+        bodies = []
+        for chunk in chunked(uris):
+            body = {"uris": chunk}
+            if position is not None:
+                body["position"] = position
+                position += len(chunk)
+            bodies.append(body)
+
+        return mutate(self.client, "POST", f"playlists/{playlist_id}/tracks", bodies)
 
     def get_current_track(self) -> str:
         """gets the currenly playing track id
@@ -130,31 +166,113 @@ class Playlist:
         r = self.client(method="GET", endpoint="me/player")
         return r.json()["item"]["uri"]
 
-    def find_duplicates(self, playlist_id: str) -> list:
+    def find_duplicates(self, playlist_id: str, workers=None) -> list:
         """Returns a list of duplicates
 
         Args:
             playlist_id (str): spotify playlist id
+            workers (int, optional): concurrent page fetches. Defaults to None.
 
         Returns:
             list: list of the found ids
         """
+        seen = Counter(
+            i["track"]["id"]
+            for i in self.iter_tracks(
+                playlist_id, fields="track(name,id)", workers=workers
+            )
+        )
+        dupes = []
+
+        # black magic list comprehension
+        [dupes.append(k) for k, v in seen.items() if v > 1]
+        return dupes
+
+    def get_snapshot_id(self, playlist_id: str) -> str:
+        """gets the current snapshot id of a playlist
+
+        Args:
+            playlist_id (str): spotify playlist id
+
+        Returns:
+            str: the playlist's snapshot_id
+        """
         r = self.client(
             method="GET",
-            endpoint=f"playlists/{playlist_id}/tracks",
-            params={"fields": "items(track(name,id))"},
+            endpoint=f"playlists/{playlist_id}",
+            params={"fields": "snapshot_id"},
         )
-        seen = []
+        return r.json()["snapshot_id"]
 
-        for i in r.json()["items"]:
-            # print(i["track"]["id"])
-            seen.append(i["track"]["id"])
+    def find_duplicate_positions(
+        self, playlist_id: str, workers=None, fuzzy=False, deduper=None
+    ) -> tuple:
+        """finds the extra copies of duplicated tracks, by position
 
-        dupes = []
+        The first copy of each track is kept; every later copy is reported.
 
-        # black magic list comprehension
-        [dupes.append(k) for k, v in Counter(seen).items() if v > 1]
-        return dupes
+        Args:
+            playlist_id (str): spotify playlist id
+            workers (int, optional): concurrent page fetches. Defaults to None.
+            fuzzy (bool, optional): also match other releases of the same song
+                by ISRC or artist, title and duration. Defaults to False.
+            deduper (Deduper, optional): shared index, to dedupe across
+                playlists. Defaults to a new one.
+
+        Returns:
+            tuple: snapshot_id the positions refer to, list of (uri, position)
+        """
+        deduper = deduper or Deduper(fuzzy=fuzzy)
+        snapshot_id = self.get_snapshot_id(playlist_id)
+        fields = FUZZY_FIELDS if deduper.fuzzy else EXACT_FIELDS
+        items = self.iter_tracks(playlist_id, fields=fields, workers=workers)
+        extras = [(d.uri, d.position) for d in deduper.scan(items, playlist_id)]
+        return snapshot_id, extras
+
+    def find_duplicates_across(
+        self, playlist_ids: list, workers=None, fuzzy=True
+    ) -> list:
+        """finds tracks repeated within or across playlists
+
+        A song is kept where it first appears, in the order the playlists are
+        given; copies in later positions or playlists are reported.
+
+        Args:
+            playlist_ids (list): spotify playlist ids, most important first
+            workers (int, optional): concurrent page fetches. Defaults to None.
+            fuzzy (bool, optional): also match other releases of the same song.
+                Defaults to True.
+
+        Returns:
+            list[tuples]: (playlist_id, snapshot_id, list of (uri, position))
+        """
+        deduper = Deduper(fuzzy=fuzzy)
+        return [
+            (playlist_id,)
+            + self.find_duplicate_positions(playlist_id, workers, deduper=deduper)
+            for playlist_id in playlist_ids
+        ]
+
+    def delete_positions(
+        self, playlist_id: str, positions: list, snapshot_id: str
+    ) -> dict:
+        """deletes tracks at specific positions, 100 per request
+
+        Args:
+            playlist_id (str): spotify playlist id
+            positions (list): (uri, position) pairs to remove
+            snapshot_id (str): snapshot the positions refer to
+
+        Returns:
+            dict: status, final snapshot_id and number of requests made
+        """
+        return mutate(
+            self.client,
+            "DELETE",
+            f"playlists/{playlist_id}/tracks",
+            delete_bodies(positions),
+            snapshot_id=snapshot_id,
+        )
 
     def delete_tracks(self, track_list: list, playlist_id: str) -> dict:
         """deletes track from playlist
@@ -166,14 +284,12 @@ class Playlist:
         Returns:
             dict: response with snapshot id of delete action
         """
-        uris = {"tracks": []}
-        for i in track_list:
-            uris["tracks"].append({"uri": f"spotify:track:{i}"})
-        print(uris)
-        r = self.client(
-            method="DELETE", endpoint=f"playlists/{playlist_id}/tracks", json=uris
+        bodies = (
+            {"tracks": [{"uri": f"spotify:track:{i}"} for i in chunk]}
+            for chunk in chunked(track_list)
         )
-        return r.json()
+        r = mutate(self.client, "DELETE", f"playlists/{playlist_id}/tracks", bodies)
+        return {"snapshot_id": r["snapshot_id"]}
 
     def recommend(self, seed_tracks: list) -> requests.models.Response:
         """Recommends similar music
@@ -193,6 +309,10 @@ class Playlist:
 
 
 if __name__ == "__main__":
+    from pick import pick
+
+    from database.db import Database
+
     pl = Playlist()
 
     if sys.argv[1] == "play":
@@ -201,8 +321,8 @@ if __name__ == "__main__":
             option_list.append(i[0])
 
         option, index = pick(option_list, "Select a Playlist: ")
-        pl.play_playlist(playlist_id=pl.get_my_playlists()[index][1])
-        time.sleep(1)
+        played = pl.play_playlist(playlist_id=pl.get_my_playlists()[index][1])
+        SESSION.wait_for_playback(context_uri=played["context_uri"])
 
         SESSION.status()
 
@@ -216,13 +336,13 @@ if __name__ == "__main__":
             option_list.append(i[0])
 
         option, index = pick(option_list, "Select Playlist to Deduplicate:")
-        dupes = pl.find_duplicates(p_lists[index][1])
-        pl.delete_tracks(track_list=dupes, playlist_id=p_lists[index][1])
+        snapshot_id, extras = pl.find_duplicate_positions(p_lists[index][1])
+        pl.delete_positions(p_lists[index][1], extras, snapshot_id)
 
     if sys.argv[1] == "add":
         pl.add_current_to_playlist("7JcJWgaDeQS1CUXDsBlJ5X")  # Terminal Tracks
         with Database("/Users/korwin/code/spotify/my_db.db") as db:
-            db.execute("CREATE TABLE IF NOT EXISTS spotify (artist, track, track_uri)")
+            db.migrate()
             db.write(table="spotify", data=SESSION.status())
             q = db.getLast(table="spotify", columns="track, artist")
             print(f"{q[0]} by {q[1]} added to database")
@@ -246,5 +366,5 @@ if __name__ == "__main__":
         r = pl.client(
             method="PUT", endpoint="me/player/play", json={"uris": [results[index][1]]}
         )
-        time.sleep(1.5)
+        SESSION.wait_for_playback(track_uri=results[index][1])
         SESSION.status()
@@ -0,0 +1,315 @@
+import math
+from collections import defaultdict, namedtuple
+
+NEIGHBOURS = 50  # most similar tracks kept per track
+MAX_PLAYLIST_TRACKS = 1000  # bigger playlists say little about similarity
+SEQUENCE_WEIGHT = 0.5  # weight of one play directly before or after another
+BATCH_ROWS = 2000  # similarity rows computed per sparse product
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS recommendations (
+        track_uri TEXT,
+        neighbour_uri TEXT,
+        score REAL,
+        PRIMARY KEY (track_uri, neighbour_uri)
+    ) WITHOUT ROWID""",
+    # what the stored neighbours were computed from: playlist id -> snapshot,
+    # "history" -> last history row id
+    """CREATE TABLE IF NOT EXISTS recommender_sources (
+        source TEXT PRIMARY KEY,
+        version TEXT
+    )""",
+    # the playlist tracks they were computed from, to find removed tracks
+    """CREATE TABLE IF NOT EXISTS recommender_members (
+        playlist_id TEXT,
+        uri TEXT,
+        PRIMARY KEY (playlist_id, uri)
+    ) WITHOUT ROWID""",
+)
+
+Recommendation = namedtuple("Recommendation", "uri name artist score")
+
+
+def has_numpy() -> bool:
+    try:
+        import numpy  # noqa: F401
+        import scipy.sparse  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class Recommender:
+    """Offline recommendations from the playlist mirror and listening history
+
+    Two tracks are similar when they share playlists (weighted down as the
+    playlist grows) or were played one after the other. Scores are cosine
+    similarities of those co-occurrence counts; the NEIGHBOURS best per
+    track are stored in SQLite so lookups are a single indexed query.
+
+    update() only recomputes the tracks a playlist whose snapshot changed
+    held before or after, tracks with new plays, and the tracks sharing a
+    playlist or a play with those, whose scores depend on their counts.
+    The math runs as sparse matrix products with
+    numpy/scipy when installed, and in plain Python otherwise.
+    """
+
+    def __init__(self, db, neighbours=NEIGHBOURS, vectorized=None):
+        self.db = db
+        self.neighbours = neighbours
+        self.vectorized = has_numpy() if vectorized is None else vectorized
+        for statement in SCHEMA:
+            self.db.execute(statement)
+
+    def _table(self, name) -> bool:
+        return bool(self.db.columns(name))
+
+    def _load(self) -> tuple:
+        """playlists and play sequence from the mirror and history
+
+        Returns:
+            tuple: {playlist_id: (snapshot_id, set of uris)},
+                list of consecutive (uri, uri) plays, last history row id
+        """
+        playlists = {}
+        if self._table("playlist_tracks"):
+            snapshots = dict(self.db.execute("SELECT id, snapshot_id FROM playlists"))
+            rows = self.db.execute(
+                "SELECT playlist_id, uri FROM playlist_tracks ORDER BY playlist_id"
+            )
+            for playlist_id, uri in rows:
+                if playlist_id not in playlists:
+                    playlists[playlist_id] = (snapshots.get(playlist_id), set())
+                playlists[playlist_id][1].add(uri)
+
+        pairs, last_id, previous = [], 0, None
+        if self._table("spotify"):
+            rows = self.db.execute("SELECT id, track_uri FROM spotify ORDER BY id")
+            for last_id, uri in rows:
+                if previous and uri and uri != previous:
+                    pairs.append((previous, uri))
+                previous = uri
+        return playlists, pairs, last_id
+
+    def _changed(self, playlists, last_id) -> set:
+        """tracks whose neighbours are out of date, None when all are"""
+        sources = dict(
+            self.db.execute("SELECT source, version FROM recommender_sources")
+        )
+        if not sources:
+            return None
+        stored = {k: v for k, v in sources.items() if k != "history"}
+        members = defaultdict(set)
+        for playlist_id, uri in self.db.execute(
+            "SELECT playlist_id, uri FROM recommender_members"
+        ):
+            members[playlist_id].add(uri)
+        if stored and not members:
+            return None  # computed before members were kept, start over
+
+        dirty = set()
+        for playlist_id in set(stored) | set(playlists):
+            snapshot_id, uris = playlists.get(playlist_id, (None, set()))
+            if playlist_id not in playlists or stored.get(playlist_id) != snapshot_id:
+                # removed tracks lose their neighbours, the rest get new ones
+                dirty |= uris | members[playlist_id]
+        seen = int(sources.get("history") or 0)
+        if last_id > seen:
+            # new plays, and the play before them, gained a neighbour
+            dirty.update(
+                row[0]
+                for row in self.db.execute(
+                    """SELECT track_uri FROM spotify WHERE id >= (
+                        SELECT coalesce(max(id), 0) FROM spotify WHERE id <= ?
+                    )""",
+                    (seen,),
+                )
+            )
+        return dirty
+
+    def update(self, full=False) -> int:
+        """recomputes the neighbours that the mirror or history changed
+
+        Args:
+            full (bool, optional): recompute every track. Defaults to False.
+
+        Returns:
+            int: number of tracks recomputed
+        """
+        playlists, pairs, last_id = self._load()
+        dirty = None if full else self._changed(playlists, last_id)
+
+        contexts = [
+            uris
+            for _, uris in playlists.values()
+            if 1 < len(uris) <= MAX_PLAYLIST_TRACKS
+        ]
+        tracks = sorted(
+            {uri for uris in contexts for uri in uris}
+            | {uri for pair in pairs for uri in pair}
+        )
+        if dirty is None:
+            dirty = set(tracks)
+            self.db.execute("DELETE FROM recommendations")
+        else:
+            dirty |= self._related(dirty, contexts, pairs)
+        targets = [uri for uri in tracks if uri in dirty]
+
+        if self.vectorized and targets:
+            rows = self._rows_numpy(tracks, contexts, pairs, targets)
+        else:
+            rows = self._rows_python(tracks, contexts, pairs, targets)
+        self.db.executemany(
+            "DELETE FROM recommendations WHERE track_uri = ?",
+            ((uri,) for uri in dirty),
+        )
+        self.db.executemany("INSERT INTO recommendations VALUES (?, ?, ?)", rows)
+
+        self.db.execute("DELETE FROM recommender_sources")
+        self.db.executemany(
+            "INSERT INTO recommender_sources VALUES (?, ?)",
+            [(pid, snapshot) for pid, (snapshot, _) in playlists.items()]
+            + [("history", str(last_id))],
+        )
+        self.db.execute("DELETE FROM recommender_members")
+        self.db.executemany(
+            "INSERT INTO recommender_members VALUES (?, ?)",
+            ((pid, uri) for pid, (_, uris) in playlists.items() for uri in uris),
+        )
+        self.db.commit()
+        return len(targets)
+
+    @staticmethod
+    def _related(uris, contexts, pairs) -> set:
+        """tracks sharing a playlist or a play with any of uris
+
+        Their scores are divided by the degree of those tracks, so they are
+        out of date whenever those tracks' playlists or plays change.
+        """
+        related = set()
+        for members in contexts:
+            if not members.isdisjoint(uris):
+                related |= members
+        for a, b in pairs:
+            if a in uris:
+                related.add(b)
+            if b in uris:
+                related.add(a)
+        return related
+
+    @staticmethod
+    def _weight(size: int) -> float:
+        return 1 / math.log2(1 + size)
+
+    def _rows_python(self, tracks, contexts, pairs, targets):
+        member = defaultdict(list)  # track -> [(weight, playlist tracks)]
+        degree = defaultdict(float)
+        for uris in contexts:
+            weight = self._weight(len(uris))
+            for uri in uris:
+                member[uri].append((weight, uris))
+                degree[uri] += weight
+        sequence = defaultdict(lambda: defaultdict(float))
+        for a, b in pairs:
+            sequence[a][b] += SEQUENCE_WEIGHT
+            sequence[b][a] += SEQUENCE_WEIGHT
+            degree[a] += SEQUENCE_WEIGHT
+            degree[b] += SEQUENCE_WEIGHT
+
+        for uri in targets:
+            counts = defaultdict(float, sequence.get(uri, {}))
+            for weight, uris in member.get(uri, ()):
+                for other in uris:
+                    counts[other] += weight
+            counts.pop(uri, None)
+            scores = (
+                (other, count / math.sqrt(degree[uri] * degree[other]))
+                for other, count in counts.items()
+            )
+            best = sorted(scores, key=lambda s: (-s[1], s[0]))[: self.neighbours]
+            yield from ((uri, other, score) for other, score in best)
+
+    def _rows_numpy(self, tracks, contexts, pairs, targets):
+        import numpy as np
+        from scipy import sparse
+
+        position = {uri: i for i, uri in enumerate(tracks)}
+        n = len(tracks)
+
+        # A: track x playlist incidence, W: playlist weights, S: sequences
+        rows = [position[uri] for uris in contexts for uri in uris]
+        cols = [c for c, uris in enumerate(contexts) for _ in uris]
+        a = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, cols)), shape=(n, len(contexts))
+        )
+        w = np.array([self._weight(len(uris)) for uris in contexts])
+        first = [position[x] for x, _ in pairs]
+        second = [position[y] for _, y in pairs]
+        s = sparse.csr_matrix(
+            (
+                np.full(2 * len(pairs), SEQUENCE_WEIGHT),
+                (first + second, second + first),
+            ),
+            shape=(n, n),
+        )
+
+        weights = sparse.csr_matrix(
+            (w, (range(len(w)), range(len(w)))), shape=(len(w), len(w))
+        )
+        degree = a @ w + np.asarray(s.sum(axis=1)).ravel()
+        index = np.array([position[uri] for uri in targets], dtype=int)
+        for batch in range(0, len(index), BATCH_ROWS):
+            rows = index[batch : batch + BATCH_ROWS]
+            counts = (a[rows] @ weights @ a.T + s[rows]).tocsr()
+            # columns follow the sorted uris, so a stable sort breaks ties by uri
+            counts.sort_indices()
+
+            for k, i in enumerate(rows):
+                start, end = counts.indptr[k], counts.indptr[k + 1]
+                others = counts.indices[start:end]
+                scores = counts.data[start:end] / np.sqrt(degree[i] * degree[others])
+                keep = others != i
+                others, scores = others[keep], scores[keep]
+                for j in np.argsort(-scores, kind="stable")[: self.neighbours]:
+                    yield tracks[i], tracks[others[j]], float(scores[j])
+
+    def similar(self, uris: list, limit: int = 20) -> list:
+        """tracks most similar to the seed tracks, best first
+
+        Args:
+            uris (list): seed track uris
+            limit (int, optional): most recommendations. Defaults to 20.
+
+        Returns:
+            list[Recommendation]: uri, name, artist and summed score
+        """
+        seeds = ",".join("?" * len(uris))
+        rows = self.db.execute(
+            f"""SELECT neighbour_uri, sum(score) AS total FROM recommendations
+            WHERE track_uri IN ({seeds}) AND neighbour_uri NOT IN ({seeds})
+            GROUP BY neighbour_uri ORDER BY total DESC, neighbour_uri LIMIT ?""",
+            (*uris, *uris, limit),
+        ).fetchall()
+        names = self._names([uri for uri, _ in rows])
+        return [
+            Recommendation(uri, *names.get(uri, (uri, "")), score)
+            for uri, score in rows
+        ]
+
+    def _names(self, uris) -> dict:
+        names = {}
+        marks = ",".join("?" * len(uris))
+        for table, name, artist, uri in (
+            ("spotify", "track", "artist", "track_uri"),
+            ("playlist_tracks", "name", "artist", "uri"),
+        ):
+            if uris and self._table(table):
+                names.update(
+                    (row[0], row[1:])
+                    for row in self.db.execute(
+                        f"SELECT {uri}, {name}, {artist} FROM {table}"
+                        f" WHERE {uri} IN ({marks}) GROUP BY {uri}",
+                        uris,
+                    )
+                )
+        return names
@@ -0,0 +1,93 @@
+import responses
+
+from playlists.dedupe import Deduper, normalize, normalize_title
+from playlists.playlists import Playlist
+
+BASE_URL = "https://api.spotify.com/v1/"
+
+
+def item(uri, name="Song", artist="Artist", duration=200000, isrc=None):
+    track = {
+        "uri": uri,
+        "name": name,
+        "duration_ms": duration,
+        "artists": [{"name": artist}],
+    }
+    if isrc:
+        track["external_ids"] = {"isrc": isrc}
+    return {"track": track}
+
+
+class TestDedupe:
+    def test_normalize_title(self):
+        assert normalize_title("Song - Remastered 2011") == "song"
+        assert normalize_title("Song (Single Version)") == "song"
+        assert normalize_title("Song [feat. Someone]") == "song"
+        assert normalize_title("Sóng!") == "song"
+        assert normalize_title("Song (Love Me)") == "song love me"
+        assert normalize_title("Song - 2011 Remaster") == "song"
+        assert normalize_title("Song - Radio Version") == "song"
+
+    def test_normalize_title_keeps_ordinary_words(self):
+        for title in (
+            "Heroes (Left Behind)",
+            "Song (Soft Focus)",
+            "Song - Monologue",
+            "Song (Conversion)",
+            "Song (With Myself)",
+            "Song - Live Version",
+            "Song (Acoustic Version)",
+        ):
+            assert (
+                normalize_title(title) != "song" and normalize_title(title) != "heroes"
+            )
+
+    def test_fuzzy_keeps_other_recordings(self):
+        items = [
+            item("spotify:track:a", name="Heroes"),
+            item("spotify:track:b", name="Heroes (Left Behind)", duration=201000),
+            item("spotify:track:c", name="Heroes - Live Version", duration=199000),
+        ]
+        assert list(Deduper(fuzzy=True).scan(items)) == []
+
+    def test_exact_only_matches_uri(self):
+        items = [item("spotify:track:a"), item("spotify:track:b")]
+        items.append(item("spotify:track:a"))
+        dupes = list(Deduper(fuzzy=False).scan(items, "p"))
+        assert [(d.uri, d.position, d.original) for d in dupes] == [
+            ("spotify:track:a", 2, ("p", 0, "spotify:track:a"))
+        ]
+
+    def test_fuzzy_matches_other_releases(self):
+        items = [
+            item("spotify:track:album", isrc="GB001"),
+            item("spotify:track:single", name="Song - Single Version", isrc="GB002"),
+            item("spotify:track:remaster", name="Song - Remastered", duration=201500),
+            item("spotify:track:isrc", name="Other Title", isrc="gb002"),
+            item("spotify:track:cover", artist="Someone Else"),
+            item("spotify:track:extended", duration=260000),
+        ]
+        dupes = list(Deduper().scan(items))
+        assert [d.position for d in dupes] == [1, 2, 3]
+        assert {d.original[2] for d in dupes} == {"spotify:track:album"}
+
+    def test_skips_missing_tracks(self):
+        items = [{"track": None}, item("spotify:track:a"), {"track": {"uri": None}}]
+        assert list(Deduper().scan(items)) == []
+
+    @responses.activate
+    def test_find_duplicates_across(self):
+        for playlist_id, uris in (("p1", "ab"), ("p2", "cab")):
+            responses.get(
+                BASE_URL + f"playlists/{playlist_id}",
+                json={"snapshot_id": playlist_id + "-snap"},
+            )
+            responses.get(
+                BASE_URL + f"playlists/{playlist_id}/tracks",
+                json={"items": [item(f"spotify:track:{u}", name=u) for u in uris]},
+            )
+
+        assert Playlist().find_duplicates_across(["p1", "p2"]) == [
+            ("p1", "p1-snap", []),
+            ("p2", "p2-snap", [("spotify:track:a", 1), ("spotify:track:b", 2)]),
+        ]
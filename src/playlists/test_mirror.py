@@ -0,0 +1,166 @@
+import pytest
+import requests
+import responses
+
+from database.db import Database
+from playlists.mirror import Mirror
+from playlists.playlists import Playlist
+
+BASE_URL = "https://api.spotify.com/v1/"
+
+
+def track(uri):
+    return {"track": {"uri": uri, "name": uri[-1], "artists": [{"name": "Artist"}]}}
+
+
+def library(snapshot_a, snapshot_b):
+    return {
+        "items": [
+            {"id": "a", "name": "A", "snapshot_id": snapshot_a, "tracks": {"total": 3}},
+            {"id": "b", "name": "B", "snapshot_id": snapshot_b, "tracks": {"total": 1}},
+        ],
+        "next": None,
+    }
+
+
+class TestMirror:
+    @pytest.fixture
+    def mirror(self):
+        with Database(":memory:") as db:
+            yield Mirror(db, Playlist())
+
+    @responses.activate
+    def test_sync_only_downloads_changed_playlists(self, mirror):
+        responses.get(BASE_URL + "me/playlists", json=library("a1", "b1"))
+        responses.get(
+            BASE_URL + "playlists/a/tracks",
+            json={
+                "items": [
+                    track("spotify:track:x"),
+                    track("spotify:track:y"),
+                    track("spotify:track:x"),
+                ],
+                "next": None,
+            },
+        )
+        responses.get(
+            BASE_URL + "playlists/b/tracks",
+            json={"items": [track("spotify:track:z")], "next": None},
+        )
+
+        assert mirror.sync() == {"playlists": 2, "refreshed": 2, "removed": 0}
+        assert mirror.playlists() == [("A", "a"), ("B", "b")]
+
+        responses.replace(
+            responses.GET, BASE_URL + "me/playlists", json=library("a1", "b2")
+        )
+        responses.calls.reset()
+
+        assert mirror.sync() == {"playlists": 2, "refreshed": 1, "removed": 0}
+        assert [c.request.url.split("?")[0] for c in responses.calls] == [
+            BASE_URL + "me/playlists",
+            BASE_URL + "playlists/b/tracks",
+        ]
+
+    @responses.activate
+    def test_sync_removes_deleted_playlists(self, mirror):
+        mirror.db.execute("INSERT INTO playlists VALUES ('gone', 'Gone', 's', 0, 0)")
+        responses.get(BASE_URL + "me/playlists", json={"items": [], "next": None})
+
+        assert mirror.sync()["removed"] == 1
+        assert mirror.playlists() == []
+
+    @responses.activate
+    def test_failed_listing_prunes_nothing(self, mirror):
+        mirror.db.execute("INSERT INTO playlists VALUES ('a', 'A', 's', 0, 0)")
+        responses.get(BASE_URL + "me/playlists", status=503)
+
+        with pytest.raises(requests.HTTPError):
+            mirror.sync()
+        assert mirror.playlists() == [("A", "a")]
+
+    @responses.activate
+    def test_failed_download_keeps_old_copy(self, mirror):
+        mirror.db.execute("INSERT INTO playlists VALUES ('a', 'A', 'a1', 1, 0)")
+        mirror.db.execute(
+            "INSERT INTO playlist_tracks (playlist_id, position, uri)"
+            " VALUES ('a', 0, 'spotify:track:x')"
+        )
+        responses.get(
+            BASE_URL + "playlists/a/tracks",
+            json={
+                "items": [track("spotify:track:y")],
+                "next": BASE_URL + "playlists/a/tracks?offset=1",
+            },
+        )
+        responses.get(BASE_URL + "playlists/a/tracks?offset=1", status=500)
+
+        with pytest.raises(requests.HTTPError):
+            mirror.sync_playlist("a", "a2")
+        assert mirror.snapshot_id("a") == "a1"
+        assert [t[1] for t in mirror.tracks("a")] == ["spotify:track:x"]
+
+    @responses.activate
+    def test_stores_albums_and_lead_artists(self, mirror):
+        responses.get(
+            BASE_URL + "playlists/a/tracks",
+            json={
+                "items": [
+                    {
+                        "track": {
+                            "uri": "spotify:track:x",
+                            "name": "X",
+                            "artists": [
+                                {
+                                    "name": "Tyler, The Creator",
+                                    "uri": "spotify:artist:t",
+                                },
+                                {"name": "Frank Ocean", "uri": "spotify:artist:f"},
+                            ],
+                            "album": {"name": "Flower Boy", "uri": "spotify:album:fb"},
+                        }
+                    }
+                ],
+                "next": None,
+            },
+        )
+
+        mirror.sync_playlist("a", "a1")
+        assert mirror.db.execute(
+            "SELECT artist, album, album_uri, lead_artist, lead_artist_uri"
+            " FROM playlist_tracks"
+        ).fetchall() == [
+            (
+                "Tyler, The Creator, Frank Ocean",
+                "Flower Boy",
+                "spotify:album:fb",
+                "Tyler, The Creator",
+                "spotify:artist:t",
+            )
+        ]
+
+    def test_older_mirror_is_downloaded_again(self):
+        with Database(":memory:") as db:
+            db.execute(
+                "CREATE TABLE playlists (id, name, snapshot_id, total, position)"
+            )
+            db.execute(
+                "CREATE TABLE playlist_tracks (playlist_id, position, uri, name, artist)"
+            )
+            db.execute("INSERT INTO playlists VALUES ('a', 'A', 'a1', 1, 0)")
+            mirror = Mirror(db, Playlist())
+
+            assert "album_uri" in db.column_types("playlist_tracks")
+            assert mirror.snapshot_id("a") is None
+
+    @responses.activate
+    def test_find_duplicate_positions(self, mirror):
+        mirror.db.execute("INSERT INTO playlists VALUES ('a', 'A', 'a1', 3, 0)")
+        mirror.db.executemany(
+            "INSERT INTO playlist_tracks (playlist_id, position, uri) VALUES ('a', ?, ?)",
+            [(0, "spotify:track:x"), (1, "spotify:track:y"), (2, "spotify:track:x")],
+        )
+        responses.get(BASE_URL + "playlists/a", json={"snapshot_id": "a1"})
+
+        assert mirror.find_duplicate_positions("a") == ("a1", [("spotify:track:x", 2)])
+        assert len(responses.calls) == 1
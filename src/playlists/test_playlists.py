@@ -1,6 +1,7 @@
-import playlists
+from playlists import playlists
 import responses
 import pytest
+import json
 import time
 
 PL_LIST = [("My Playlist", "123456")]
@@ -94,3 +95,52 @@ class TestPlaylists:
     def test_recommend(self, session):
         responses.get(BASE_URL + "recommendations", json={"abc": "123"})
         assert session.recommend(seed_tracks=["abc", "def"]) == {"abc": "123"}
+
+    @responses.activate
+    def test_add_tracks_in_chunks(self, session):
+        responses.post(
+            BASE_URL + "playlists/abc/tracks", json={"snapshot_id": "snap"}, status=201
+        )
+        uris = [f"spotify:track:{n}" for n in range(250)]
+
+        result = session.add_tracks(playlist_id="abc", uris=uris, position=0)
+
+        assert result == {"status": 201, "snapshot_id": "snap", "requests": 3}
+        bodies = [json.loads(c.request.body) for c in responses.calls]
+        assert [b["position"] for b in bodies] == [0, 100, 200]
+        assert bodies[2]["uris"][-1] == "spotify:track:249"
+
+    @responses.activate
+    def test_find_duplicate_positions(self, session):
+        responses.get(BASE_URL + "playlists/abc", json={"snapshot_id": "snap0"})
+        responses.get(
+            BASE_URL + "playlists/abc/tracks",
+            json={
+                "items": [
+                    {"track": {"uri": "spotify:track:a"}},
+                    {"track": {"uri": "spotify:track:b"}},
+                    {"track": None},
+                    {"track": {"uri": "spotify:track:a"}},
+                    {"track": {"uri": "spotify:track:a"}},
+                ]
+            },
+        )
+
+        assert session.find_duplicate_positions("abc") == (
+            "snap0",
+            [("spotify:track:a", 3), ("spotify:track:a", 4)],
+        )
+
+    @responses.activate
+    def test_delete_positions_chains_snapshots(self, session):
+        for n in range(1, 4):
+            responses.delete(
+                BASE_URL + "playlists/abc/tracks", json={"snapshot_id": f"snap{n}"}
+            )
+        positions = [("spotify:track:a", n) for n in range(1, 251)]
+
+        result = session.delete_positions("abc", positions, snapshot_id="snap0")
+
+        assert result == {"status": 200, "snapshot_id": "snap3", "requests": 3}
+        bodies = [json.loads(c.request.body) for c in responses.calls]
+        assert [b["snapshot_id"] for b in bodies] == ["snap0", "snap1", "snap2"]
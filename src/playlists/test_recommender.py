@@ -0,0 +1,107 @@
+import pytest
+
+from database.db import Database
+from playlists.mirror import Mirror
+from playlists.recommender import Recommender
+
+
+def store(db, playlist_id, snapshot_id, uris):
+    db.execute(
+        "INSERT OR REPLACE INTO playlists (id, name, snapshot_id) VALUES (?, ?, ?)",
+        (playlist_id, playlist_id, snapshot_id),
+    )
+    db.execute("DELETE FROM playlist_tracks WHERE playlist_id = ?", (playlist_id,))
+    db.executemany(
+        "INSERT INTO playlist_tracks (playlist_id, position, uri, name, artist)"
+        " VALUES (?, ?, ?, ?, ?)",
+        [(playlist_id, n, uri, uri.upper(), "Artist") for n, uri in enumerate(uris)],
+    )
+
+
+@pytest.fixture
+def db():
+    with Database(":memory:") as db:
+        db.migrate()
+        Mirror(db, pl=None)
+        store(db, "p1", "s1", ["a", "b", "c"])
+        store(db, "p2", "s1", ["a", "b"])
+        store(db, "p3", "s1", ["c", "d"])
+        yield db
+
+
+def neighbours(db) -> dict:
+    rows = db.execute("SELECT * FROM recommendations ORDER BY 1, 3 DESC, 2")
+    found = {}
+    for uri, other, score in rows:
+        found.setdefault(uri, []).append((other, pytest.approx(score)))
+    return found
+
+
+class TestRecommender:
+    def test_shared_playlists_rank_first(self, db):
+        assert Recommender(db, vectorized=False).update() == 4
+
+        recommendations = Recommender(db).similar(["a"])
+        assert [r.uri for r in recommendations] == ["b", "c"]
+        assert recommendations[0].name == "B"
+
+    def test_sequential_plays(self, db):
+        db.executemany(
+            "INSERT INTO spotify (artist, track, track_uri) VALUES (?, ?, ?)",
+            [("x", "D", "d"), ("x", "A", "a"), ("x", "A", "a")],
+        )
+        recommender = Recommender(db, vectorized=False)
+        recommender.update()
+        assert "d" in [r.uri for r in recommender.similar(["a"])]
+        assert [r.uri for r in recommender.similar(["a", "b"])] == ["c", "d"]
+
+    def test_incremental_update(self, db):
+        recommender = Recommender(db, vectorized=False)
+        recommender.update()
+        assert recommender.update() == 0
+
+        store(db, "p3", "s2", ["c", "d", "e"])
+        # c's degree changed, so a and b, which share p1 with it, move too
+        assert recommender.update() == 5
+        incremental = neighbours(db)
+        recommender.update(full=True)
+        assert neighbours(db) == incremental
+
+        db.executemany(
+            "INSERT INTO spotify (artist, track, track_uri) VALUES (?, ?, ?)",
+            [("x", "E", "e"), ("x", "A", "a")],
+        )
+        recommender.update()
+        incremental = neighbours(db)
+        recommender.update(full=True)
+        assert neighbours(db) == incremental
+
+    def test_removed_track_loses_neighbours(self, db):
+        recommender = Recommender(db, vectorized=False)
+        recommender.update()
+        store(db, "p1", "s2", ["b", "c"])
+        store(db, "p2", "s2", ["b"])
+
+        recommender.update()
+        assert recommender.similar(["a"]) == []
+        incremental = neighbours(db)
+        recommender.update(full=True)
+        assert neighbours(db) == incremental
+
+    def test_removed_playlist_rebuilds(self, db):
+        recommender = Recommender(db, vectorized=False)
+        recommender.update()
+        db.execute("DELETE FROM playlist_tracks WHERE playlist_id = 'p3'")
+        assert recommender.update() == 3
+        assert "d" not in neighbours(db)
+
+    def test_numpy_matches_python(self, db):
+        pytest.importorskip("scipy.sparse")
+        db.executemany(
+            "INSERT INTO spotify (artist, track, track_uri) VALUES (?, ?, ?)",
+            [("x", "D", "d"), ("x", "A", "a"), ("x", "B", "b")],
+        )
+        Recommender(db, vectorized=False).update(full=True)
+        expected = neighbours(db)
+        Recommender(db, vectorized=True).update(full=True)
+        assert neighbours(db) == expected
@@ -1,114 +1,568 @@
+import importlib
 import sys
-import time
+from collections import namedtuple
+from contextvars import ContextVar
+from functools import lru_cache
 
-from pick import pick
+from api.memo import MEMO
+from api.tracing import TRACER
+from daemon.client import run_remote
 
-from database.db import Database
-from next_track.next_track import CLISpotify
-from playlists.playlists import Playlist
-
-SESSION = CLISpotify()
 TT_PLAYLIST = "7JcJWgaDeQS1CUXDsBlJ5X"
 DB_PATH = "/Users/korwin/code/spotify/my_db.db"
-PL = Playlist()
+PAGE_WORKERS = 8  # concurrent page fetches for full-playlist reads
+RECOMMENDATIONS = 20  # tracks offered by recommend
+
+# every subcommand with the modules it needs; nothing else is imported for it.
+# fanout commands can run across several accounts with --accounts
+Command = namedtuple("Command", "func needs fanout", defaults=(False,))
+COMMANDS = {}
+
+# the account a command runs for under --accounts; None is the default login
+ACCOUNT = ContextVar("account", default=None)
+
+
+def command(name, needs=(), fanout=False):
+    """registers a subcommand and the modules it imports"""
+
+    def register(func):
+        COMMANDS[name] = Command(func, needs, fanout)
+        return func
+
+    return register
+
+
+def preload(name):
+    """imports the modules a subcommand needs, and only those"""
+    for module in COMMANDS[name].needs:
+        importlib.import_module(module)
+
+
+@lru_cache(maxsize=None)
+def default_session():
+    from next_track.next_track import CLISpotify
+
+    return CLISpotify(db_path=DB_PATH)
+
+
+@lru_cache(maxsize=None)
+def default_playlist():
+    from playlists.playlists import Playlist
+
+    return Playlist()
 
 
-def play() -> str:
-    """Finds a user's playlist to play
+def get_session():
+    account = ACCOUNT.get()
+    return account.session() if account else default_session()
+
+
+def get_playlist():
+    account = ACCOUNT.get()
+    return account.playlist() if account else default_playlist()
+
+
+def db_path() -> str:
+    account = ACCOUNT.get()
+    return account.db_path if account else DB_PATH
+
+
+def target_playlist() -> str:
+    """the playlist `add` saves to"""
+    account = ACCOUNT.get()
+    if account is None:
+        return TT_PLAYLIST
+    if not account.playlist_id:
+        raise ValueError(f"account {account.name!r} has no playlist to add to")
+    return account.playlist_id
+
+
+@command(
+    "play",
+    needs=(
+        "pick",
+        "api.aio",
+        "database.db",
+        "database.search",
+        "playlists.mirror",
+        "playlists.playlists",
+    ),
+)
+def play(*words) -> str:
+    """Finds a user's playlist to play: play [name]
+
+    Args:
+        words (str, optional): narrows the menu to playlists matching these
+            words; a single match plays straight away.
 
     Returns:
         str: the selected playlist name
     """
+    from pick import pick
+
+    from api.aio import run
+    from database.db import Database
+    from database.search import SearchIndex
+    from playlists.mirror import Mirror
+
+    PL = get_playlist()
+    with Database(db_path()) as db:
+        p_lists = Mirror(db, PL).playlists()
+        if words:
+            matches = SearchIndex(db).search(" ".join(words), kind="playlist")
+            p_lists = [(m.name, m.uri.split(":")[-1]) for m in matches] or p_lists
+        p_lists = p_lists or PL.get_my_playlists()
+
     option_list = []
-    for i in PL.get_my_playlists():
+    for i in p_lists:
         option_list.append(i[0])
 
-    option, index = pick(option_list, "Select a Playlist: ")
-    PL.play_playlist(playlist_id=PL.get_my_playlists()[index][1])
-    time.sleep(1)
-    SESSION.status()
+    if words and len(p_lists) == 1:
+        option, index = option_list[0], 0
+    else:
+        with TRACER.span("pick"):
+            option, index = pick(option_list, "Select a Playlist: ")
+    run(start_playlist(p_lists[index][1]))
+    with Database(db_path()) as db:
+        SearchIndex(db).played(f"spotify:playlist:{p_lists[index][1]}")
     return option
 
 
-def dedupe() -> tuple:
-    """finds and deletes duplicate tracks in a playlist
+async def start_playlist(playlist_id: str):
+    """plays a playlist, then shuffles and confirms playback concurrently"""
+    import asyncio
+
+    from api.aio import AsyncClient
+
+    pl, session = AsyncClient(get_playlist()), AsyncClient(get_session())
+    played = await pl.play_playlist(playlist_id=playlist_id, shuffle=False)
+    await asyncio.gather(
+        pl.shuffle(True),
+        session.wait_for_playback(context_uri=played["context_uri"]),
+    )
+    return await session.status()
+
+
+@command(
+    "dedupe",
+    needs=("pick", "database.db", "playlists.mirror", "playlists.playlists"),
+    fanout=True,
+)
+def dedupe(match="exact", playlist=None) -> tuple:
+    """finds and deletes duplicate tracks in a playlist: dedupe [exact|fuzzy]
+
+    Args:
+        match (str, optional): "fuzzy" also removes other releases of the same
+            song (single, album, remaster). Defaults to "exact".
+        playlist (str, optional): name or id of the playlist, instead of
+            picking one from a menu. Needed with --accounts.
 
     Returns:
         tuple: the list of tracks, the playlist selected
     """
+    from pick import pick
+
+    from database.db import Database
+    from playlists.mirror import Mirror
+
+    PL = get_playlist()
     option_list = []
 
-    p_lists = PL.get_my_playlists()
+    with Database(db_path()) as db:
+        mirror = Mirror(db, PL, workers=PAGE_WORKERS)
+        p_lists = mirror.playlists() or PL.get_my_playlists()
 
-    for i in p_lists:
-        # print(i[1])
-        option_list.append(i[0])
+        for i in p_lists:
+            # print(i[1])
+            option_list.append(i[0])
 
-    option, index = pick(option_list, "Select Playlist to Deduplicate:")
-    dupes = PL.find_duplicates(p_lists[index][1])
-    PL.delete_tracks(track_list=dupes, playlist_id=p_lists[index][1])
+        if playlist:
+            ids = [p[1] for p in p_lists]
+            index = ids.index(playlist) if playlist in ids else None
+            if index is None and playlist in option_list:
+                index = option_list.index(playlist)
+            if index is None:
+                raise ValueError(f"no playlist {playlist!r}")
+            option = option_list[index]
+        elif ACCOUNT.get() is not None:
+            raise ValueError("dedupe needs --playlist when run for accounts")
+        else:
+            with TRACER.span("pick"):
+                option, index = pick(option_list, "Select Playlist to Deduplicate:")
+        if match == "fuzzy":
+            snapshot_id, extras = PL.find_duplicate_positions(
+                p_lists[index][1], workers=PAGE_WORKERS, fuzzy=True
+            )
+        else:
+            snapshot_id, extras = mirror.find_duplicate_positions(p_lists[index][1])
+        PL.delete_positions(p_lists[index][1], extras, snapshot_id)
+    dupes = list(dict.fromkeys(uri.split(":")[2] for uri, _ in extras))
     return (dupes, option)
 
 
+@command("add", needs=("api.aio", "database.db", "playlists.playlists"), fanout=True)
 def add() -> tuple:
     """Adds the current track to a playlist
 
     Returns:
         tuple: the track, the artist
     """
-    PL.add_current_to_playlist(TT_PLAYLIST)  # Terminal Tracks
-    with Database(DB_PATH) as db:
-        db.execute("CREATE TABLE IF NOT EXISTS spotify (artist, track, track_uri)")
-        db.write(table="spotify", data=SESSION.status())
+    import asyncio
+
+    from api.aio import AsyncClient, run
+    from database.db import Database
+
+    async def add_and_status():
+        pl, session = AsyncClient(get_playlist()), AsyncClient(get_session())
+        _, status = await asyncio.gather(
+            pl.add_current_to_playlist(target_playlist()),  # Terminal Tracks
+            session.status(),
+        )
+        return status
+
+    status = run(add_and_status())
+    with Database(db_path()) as db:
+        db.migrate()
+        db.write(table="spotify", data=status)
         q = db.getLast(table="spotify", columns="track, artist")
         print(f"{q[0]} by {q[1]} added to database")
     return (q[0], q[1])
 
 
-def recommend() -> str:
+@command("record", needs=("database.db", "next_track.recorder"))
+def record() -> int:
+    """Records listening history until interrupted
+
+    Returns:
+        int: number of plays recorded
+    """
+    import signal
+    import threading
+
+    from database.db import Database
+    from next_track.recorder import Recorder
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    with Database(db_path()) as db:
+        db.migrate()
+        recorder = Recorder(db, get_session())
+        try:
+            recorder.run(stop)
+        except KeyboardInterrupt:
+            pass
+    print(f"{recorder.recorded} plays recorded in {recorder.polls} polls")
+    return recorder.recorded
+
+
+@command("search", needs=("database.db", "database.search"))
+def search(*words, kind=None) -> list:
+    """Searches saved and played items locally: search words [--kind track]
+
+    Args:
+        words (str): what to look for, the last word may be partial
+        kind (str, optional): playlist, album, artist or track only
+
+    Returns:
+        list: the matches, most played first
+    """
+    from database.db import Database
+    from database.search import SearchIndex
+
+    with Database(db_path()) as db:
+        matches = SearchIndex(db).search(" ".join(words), kind=kind)
+    for m in matches:
+        by = f" by {m.artist}" if m.artist else ""
+        print(f"{m.kind:>8}  {m.name}{by}  ({m.plays} plays)  {m.uri}")
+    return matches
+
+
+@command("current", needs=("playlists.playlists",), fanout=True)
+def current() -> str:
+    """Prints the uri of the currently playing track
+
+    Returns:
+        str: spotify track uri
+    """
+    uri = get_playlist().get_current_track()
+    print(uri)
+    return uri
+
+
+@command(
+    "sync",
+    needs=(
+        "database.db",
+        "database.search",
+        "playlists.mirror",
+        "playlists.playlists",
+        "playlists.recommender",
+    ),
+    fanout=True,
+)
+def sync() -> dict:
+    """Refreshes the local playlist mirror, search index and recommendations
+
+    Returns:
+        dict: number of playlists seen, refreshed and removed, items indexed
+            and tracks whose recommendations were recomputed
+    """
+    from api.scheduler import BULK, priority
+    from database.db import Database
+    from database.search import SearchIndex
+    from playlists.mirror import Mirror
+    from playlists.recommender import Recommender
+
+    with Database(db_path()) as db, priority(BULK):
+        result = Mirror(db, get_playlist(), workers=PAGE_WORKERS).sync()
+        db.migrate()
+        result["indexed"] = SearchIndex(db).rebuild()
+        result["recommended"] = Recommender(db).update()
+    print(
+        f"{result['playlists']} playlists, {result['refreshed']} refreshed, "
+        f"{result['removed']} removed, {result['indexed']} items searchable"
+    )
+    return result
+
+
+@command("export", needs=("database.db", "database.export"), fanout=True)
+def export(fmt="csv", fname=None, since=None) -> int:
+    """Exports the listening history: export [format] [file] [--since DATE]
+
+    Args:
+        fmt (str, optional): csv, ndjson or parquet. Defaults to "csv".
+        fname (str, optional): output file. Defaults to history.<fmt>.
+        since (str, optional): only plays at or after this ISO date
+
+    Returns:
+        int: number of rows exported
+    """
+    from database.db import Database
+    from database.export import export as export_table
+
+    fname = fname or f"history.{fmt}"
+    if ACCOUNT.get() is not None:
+        fname = f"{ACCOUNT.get().name}-{fname}"
+    with Database(db_path()) as db:
+        db.migrate()
+        count = export_table(db, fname, fmt=fmt, since=since)
+    print(f"{count} rows exported to {fname}")
+    return count
+
+
+@command(
+    "recommend",
+    needs=("pick", "database.db", "playlists.playlists", "playlists.recommender"),
+)
+def recommend(source="blend") -> str:
     """Gets a reccomended track based on the currently playing track
 
+    Args:
+        source (str, optional): "local" for the offline recommender, "remote"
+            for the API, or "blend" to fill up local results from the API.
+            Local falls back to the API when it knows nothing about the
+            track. Defaults to "blend".
+
     Returns:
         str: the selected recommendation
     """
+    from pick import pick
+
+    from api.shaping import track
+    from database.db import Database
+    from playlists.recommender import Recommender
+
+    PL = get_playlist()
+    SESSION = get_session()
     current = PL.get_current_track()
     # print(current)
 
     results = list()
-    rec = PL.recommend(current.split(":")[2])
-    # for i in rec.json()["tracks"]:
-    for i in rec["tracks"]:
-        results.append((i["name"], i["uri"]))
+    if source != "remote":
+        with Database(db_path()) as db:
+            local = Recommender(db).similar([current], limit=RECOMMENDATIONS)
+        results = [(f"{r.name} - {r.artist}", r.uri) for r in local]
+    if (
+        source == "remote"
+        or not results
+        or (source == "blend" and len(results) < RECOMMENDATIONS)
+    ):
+        rec = PL.recommend(current.split(":")[2])
+        # for i in rec.json()["tracks"]:
+        known = {uri for _, uri in results}
+        for t in map(track, rec["tracks"]):
+            if t.uri not in known:
+                results.append((t.name, t.uri))
+        results = results[:RECOMMENDATIONS]
 
     options = []
     for i in results:
         options.append(i[0])
-    option, index = pick(options, "For you to browse")
+    with TRACER.span("pick"):
+        option, index = pick(options, "For you to browse")
     PL.client(
         method="PUT", endpoint="me/player/play", json={"uris": [results[index][1]]}
     )
-    time.sleep(1.5)
+    SESSION.wait_for_playback(track_uri=results[index][1])
     SESSION.status()
     return option
 
 
-if __name__ == "__main__":
-    # pl = Playlist()
+@command("next", needs=("next_track.next_track",))
+def next_track() -> str:
+    """Skips to the next track"""
+    return get_session().next_track()
+
+
+@command("pause", needs=("next_track.next_track",))
+def pause() -> str:
+    """Pauses playback"""
+    return get_session().pause_track()
+
+
+@command("status", needs=("next_track.next_track",), fanout=True)
+def status():
+    """Shows what is playing and where"""
+    return get_session().status()
+
+
+@command("daemon", needs=("daemon.server",))
+def run_daemon(action=None):
+    """Serves next/pause/current/status from a background process: daemon [stop]"""
+    if action == "stop":
+        if not run_remote(["stop"]):
+            print("no daemon running")
+        return
+
+    from daemon.server import serve
 
-    if sys.argv[1] == "play":
-        play()
+    serve()
 
-    if sys.argv[1] == "dedupe":
-        dedupe()
 
-    if sys.argv[1] == "add":
-        add()
+@command("help")
+def usage():
+    """Lists the available commands"""
+    for name, cmd in COMMANDS.items():
+        print(f"{name:>10}  {cmd.func.__doc__.strip().splitlines()[0]}")
 
-    if sys.argv[1] == "current":
-        print(PL.get_current_track())
 
-    if sys.argv[1] == "recommend":
-        recommend()
+def parse_args(argv) -> tuple:
+    """splits command line arguments into positional and --flag value pairs
 
-    if sys.argv[1] == "next":
-        CLISpotify().next_track()
+    Returns:
+        tuple: list of positional arguments, dict of keyword arguments
+    """
+    args, kwargs = [], {}
+    argv = iter(argv)
+    for arg in argv:
+        if arg.startswith("--"):
+            kwargs[arg[2:].replace("-", "_")] = next(argv, None)
+        else:
+            args.append(arg)
+    return args, kwargs
+
+
+def trace_options(argv) -> tuple:
+    """pulls the tracing flags out of the command line
+
+    --trace prints a timing waterfall of the command to stderr and
+    --trace-json FILE writes its spans as OpenTelemetry JSON.
+
+    Returns:
+        tuple: remaining arguments, whether to print, file to export to
+    """
+    argv = list(argv)
+    waterfall = "--trace" in argv
+    if waterfall:
+        argv.remove("--trace")
+    path = None
+    if "--trace-json" in argv:
+        i = argv.index("--trace-json")
+        path = argv[i + 1] if i + 1 < len(argv) else "trace.json"
+        del argv[i : i + 2]
+    return argv, waterfall, path
+
+
+def fanout_options(argv) -> tuple:
+    """pulls the multi-account flags out of the command line
+
+    --accounts a,b (or all) runs the command for those accounts from the
+    registry and --workers N sets how many run at once.
+
+    Returns:
+        tuple: remaining arguments, account names or None, workers or None
+    """
+    argv = list(argv)
+    found = {}
+    for flag in ("--accounts", "--workers"):
+        if flag in argv:
+            i = argv.index(flag)
+            found[flag] = argv[i + 1] if i + 1 < len(argv) else None
+            del argv[i : i + 2]
+    workers = found.get("--workers")
+    return argv, found.get("--accounts"), int(workers) if workers else None
+
+
+def run_accounts(name, args, kwargs, names, workers=None) -> list:
+    """runs a command once per account, concurrently, and prints a summary
+
+    Returns:
+        list[accounts.fanout.Result]: one per account
+    """
+    from accounts.fanout import WORKERS, fan_out, summary
+    from accounts.registry import load_accounts, select
+
+    func = COMMANDS[name].func
+
+    def run(account):
+        token = ACCOUNT.set(account)
+        try:
+            with account.transport().memo.scope():
+                return func(*args, **kwargs)
+        finally:
+            ACCOUNT.reset(token)
+
+    results = fan_out(select(load_accounts(), names), run, workers=workers or WORKERS)
+    for result in results:
+        for line in result.output.splitlines():
+            print(f"{result.account}: {line}")
+    print(summary(results))
+    return results
+
+
+def main(argv):
+    argv, waterfall, trace_path = trace_options(argv)
+    argv, accounts, workers = fanout_options(argv)
+    # a traced command runs here rather than in the daemon, so it can be timed
+    if not (waterfall or trace_path or accounts) and run_remote(argv):
+        return None
+
+    name = argv[0] if argv else "help"
+    if name not in COMMANDS:
+        print(f"unknown command {name!r}")
+        name, argv = "help", []
+    if accounts and not COMMANDS[name].fanout:
+        print(f"{name} can't run for several accounts")
+        return None
+    if waterfall or trace_path:
+        TRACER.enable()
+    try:
+        # identical GETs made while the command runs are only sent once
+        with TRACER.span(name), MEMO.scope():
+            with TRACER.span("import"):
+                preload(name)
+            args, kwargs = parse_args(argv[1:])
+            if accounts:
+                return run_accounts(name, args, kwargs, accounts, workers)
+            return COMMANDS[name].func(*args, **kwargs)
+    finally:
+        if waterfall:
+            print(TRACER.waterfall(), file=sys.stderr)
+        if trace_path:
+            TRACER.export(trace_path)
+        TRACER.disable()
+        TRACER.clear()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import subprocess
+import sys
+
+import pytest
+import responses
+
+import runner
+
+BASE_URL = "https://api.spotify.com/v1/"
+
+# import-time budget per command in milliseconds, generous enough for slow CI
+# machines while still catching a heavy import sneaking onto a fast path
+BUDGETS = {
+    "help": 40,
+    "next": 400,
+    "pause": 400,
+    "status": 400,
+    "current": 400,
+    "export": 150,
+}
+# modules a command must never pay for
+FORBIDDEN = {
+    "help": ("requests", "spotipy", "pick", "sqlite3"),
+    "next": ("spotipy", "pick", "sqlite3", "database.db"),
+    "pause": ("spotipy", "pick", "sqlite3", "database.db"),
+    "status": ("spotipy", "pick", "sqlite3", "database.db"),
+    "current": ("spotipy", "pick", "sqlite3", "database.db"),
+    "export": ("requests", "spotipy", "pick"),
+}
+
+
+def import_times(code: str) -> dict:
+    """self import time in microseconds of every module `code` imports"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line.split(":", 1)[1].split("|")
+        times[name.strip()] = int(self_us)
+    return times
+
+
+@pytest.fixture(scope="module")
+def interpreter_baseline():
+    return set(import_times("pass"))
+
+
+class TestStartup:
+    def test_every_command_is_registered(self):
+        assert set(BUDGETS) <= set(runner.COMMANDS)
+
+    @pytest.mark.parametrize("name", sorted(BUDGETS))
+    def test_import_budget(self, name, interpreter_baseline):
+        times = import_times(f"import runner; runner.preload({name!r})")
+        ours = {m: t for m, t in times.items() if m not in interpreter_baseline}
+
+        assert not [m for m in FORBIDDEN[name] if m in ours]
+        assert sum(ours.values()) / 1000 < BUDGETS[name]
+
+    def test_parse_args(self):
+        assert runner.parse_args(["ndjson", "--since", "2024-01-01", "out"]) == (
+            ["ndjson", "out"],
+            {"since": "2024-01-01"},
+        )
+
+    def test_unknown_command_shows_help(self, capsys):
+        runner.main(["dance", "--fast"])
+        out = capsys.readouterr().out
+        assert "unknown command 'dance'" in out
+        assert "next" in out
+
+
+class TestCommands:
+    @responses.activate
+    def test_start_playlist(self):
+        responses.put(BASE_URL + "me/player/play", status=204)
+        responses.put(BASE_URL + "me/player/shuffle", status=204)
+        responses.get(
+            BASE_URL + "me/player",
+            json={
+                "is_playing": True,
+                "context": {"uri": "spotify:playlist:abc"},
+                "item": {"name": "Gary", "artists": [{"name": "George"}], "uri": "u"},
+                "device": {"name": "device"},
+            },
+        )
+
+        assert asyncio.run(runner.start_playlist("abc")) == ["George", "Gary", "u"]
+        assert [c.request.method for c in responses.calls][:1] == ["PUT"]
+
+    @responses.activate
+    def test_trace_prints_waterfall(self, capsys, tmp_path):
+        responses.get(BASE_URL + "me/player", json={"is_playing": False})
+        path = tmp_path / "trace.json"
+
+        runner.main(["status", "--trace", "--trace-json", str(path)])
+
+        err = capsys.readouterr().err
+        assert "status" in err and "GET me/player" in err
+        spans = json.loads(path.read_text())["resourceSpans"][0]["scopeSpans"][0]
+        assert "GET me/player" in [s["name"] for s in spans["spans"]]
+
+    @responses.activate
+    def test_fan_out_uses_each_accounts_token(self, capsys, monkeypatch, tmp_path):
+        from accounts import registry
+        from api.auth import TokenProvider
+
+        path = tmp_path / "accounts.json"
+        path.write_text(json.dumps([{"name": "ana"}, {"name": "bo"}]))
+        monkeypatch.setattr(registry, "ACCOUNTS_PATH", str(path))
+        monkeypatch.setattr(registry, "_backend", False)
+        monkeypatch.setattr(TokenProvider, "get_token", lambda self: self.cache_path)
+        responses.get(BASE_URL + "me/player", json={"item": {"uri": "spotify:t:1"}})
+
+        results = runner.main(["current", "--accounts", "all", "--workers", "2"])
+
+        assert [(r.account, r.value) for r in results] == [
+            ("ana", "spotify:t:1"),
+            ("bo", "spotify:t:1"),
+        ]
+        tokens = {c.request.headers["Authorization"] for c in responses.calls}
+        assert tokens == {"Bearer .cache-ana", "Bearer .cache-bo"}
+        out = capsys.readouterr().out
+        assert "ana: spotify:t:1" in out and "2 accounts, 0 failed" in out
+
+    def test_fan_out_only_for_account_commands(self, capsys):
+        assert runner.main(["play", "--accounts", "all"]) is None
+        assert "can't run for several accounts" in capsys.readouterr().out